@@ -0,0 +1,166 @@
+import time
+import random
+import argparse
+from datetime import datetime
+
+from ollama_bench import (
+    CsvSink, MultiSink, OllamaClient, SCENARIO_FIELDS, add_pool_arguments, get_embed_metrics, log, print_config,
+    print_connection_stats, print_summary_table, run_scenario,
+)
+from ollama_bench.residency import add_keep_alive_argument, load_model
+from ollama_bench.store import add_store_arguments, open_run
+from ollama_bench.live import add_live_arguments, start_live
+from ollama_bench.telemetry import add_telemetry_arguments, start_telemetry
+
+# --- KONFIGURASI DEFAULT ---
+DEFAULT_MODEL_EMBED = "qwen3-embedding:4b"
+DEFAULT_OLLAMA_API = "http://localhost:11434/api"
+REQUEST_TIMEOUT_S = 300
+
+MODEL_EMBED = DEFAULT_MODEL_EMBED
+OLLAMA_API = DEFAULT_OLLAMA_API
+CLIENT = None
+OUTPUT_FILE = f"embed_benchmark_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
+
+# Level Concurrency, jumlah input per request /api/embed, dan panjang input (token perkiraan)
+USER_LEVELS = [1, 4, 8]
+BATCH_SIZES = [1, 8, 32, 128]
+INPUT_LENGTHS = [16, 128, 512]
+
+# Kenaikan tokens/sec minimal saat batch diperbesar agar dianggap masih memory-bound
+BATCH_GAIN_THRESHOLD = 1.2
+
+WORDS = ("invoice shipment contract server latency customer policy backup network storage audit ticket "
+         "release budget forecast warehouse supplier payment account security cluster region report").split()
+
+def make_inputs(batch, length, seed):
+    """Teks acak dengan ~length token (sekitar 0.75 kata per token); berbeda per user."""
+    rng = random.Random(seed)
+    n_words = max(1, int(length * 0.75))
+    return [" ".join(rng.choice(WORDS) for _ in range(n_words)) for _ in range(batch)]
+
+def make_task(batch, length):
+    """Task run_scenario untuk satu kombinasi batch x panjang input."""
+    def task_embed(user_id):
+        inputs = make_inputs(batch, length, seed=user_id)
+        try:
+            return get_embed_metrics(CLIENT.embed(MODEL_EMBED, inputs))
+        except Exception as e: log(f"Err {user_id}: {e}")
+        return None
+    return task_embed
+
+def embeds_per_second(stat, batch):
+    """Embedding per detik di sisi sistem (request sukses x batch / wall time)."""
+    return stat['successes'] * batch / stat['wall_time'] if stat['wall_time'] > 0 else 0.0
+
+def classify_regime(rows):
+    """Tentukan memory-bound vs compute-bound dari kenaikan tokens/sec saat batch diperbesar.
+
+    rows: list (batch, sys_throughput) untuk satu panjang input dan concurrency, urut batch.
+    Selama batch lebih besar masih menaikkan tokens/sec, bobot model yang dibaca sekali per
+    forward pass belum teramortisasi (memory-bound); saat kenaikan berhenti, compute jenuh.
+    Kembalikan (label per batch, batch terakhir yang masih menaikkan throughput).
+    """
+    labels = ["baseline"]
+    saturated_at = None
+    for (_, prev_tps), (batch, tps) in zip(rows, rows[1:]):
+        growing = prev_tps > 0 and tps / prev_tps >= BATCH_GAIN_THRESHOLD
+        labels.append("memory-bound" if growing else "compute-bound")
+        if not growing and saturated_at is None:
+            saturated_at = rows[len(labels) - 2][0]
+    return labels, saturated_at
+
+def print_regime_table(all_stats):
+    """Tabel embeddings/sec dan tokens/sec per batch, dikelompokkan per concurrency dan panjang input."""
+    width = 100
+    print("\n" + "=" * width)
+    print(f"{'EMBEDDING THROUGHPUT - BATCH SCALING':^{width}}")
+    print("=" * width)
+    print(f"{'Users':<6} | {'Input Len':<9} | {'Batch':<6} | {'Emb/s':<10} | {'Tok/s':<10} | {'p95 Lat(s)':<10} | {'Regime'}")
+    print("-" * width)
+    groups = {}
+    for stat in all_stats:
+        groups.setdefault((stat['users'], stat['input_len']), []).append(stat)
+    for (users, length), stats in sorted(groups.items()):
+        stats.sort(key=lambda s: s['batch'])
+        labels, saturated_at = classify_regime([(s['batch'], s['sys_throughput']) for s in stats])
+        for stat, label in zip(stats, labels):
+            print(f"{users:<6} | {length:<9} | {stat['batch']:<6} | {stat['embeds_per_s']:<10.1f} | "
+                  f"{stat['sys_throughput']:<10.1f} | {stat['lat_p95']:<10.2f} | {label}")
+        note = f"saturates at batch {saturated_at}" if saturated_at is not None else "still scaling at the largest batch"
+        print(f"{'':<6} | {'':<9} | {note}")
+        print("-" * width)
+    print(f" memory-bound = a larger batch still raises tokens/sec by >= {BATCH_GAIN_THRESHOLD:.1f}x (weight reads are amortised);")
+    print(" compute-bound = tokens/sec stopped growing, so bigger batches only add latency.\n")
+
+def run_config(start_time, args):
+    return {
+        "Date Running Test": start_time,
+        "Model Embed": MODEL_EMBED,
+        "API Endpoint": OLLAMA_API,
+        "Concurrency": args.users,
+        "Batch Sizes": args.batch_sizes,
+        "Input Lengths": f"{args.input_lengths} tokens (approx.)",
+    }
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark Embedding Suite for Ollama")
+    parser.add_argument("-m", "--model", default=DEFAULT_MODEL_EMBED, help="Embedding model name (default: %(default)s)")
+    parser.add_argument("--url", default=DEFAULT_OLLAMA_API, help="Ollama API URL (default: %(default)s)")
+    parser.add_argument("-u", "--users", type=int, nargs="+", default=USER_LEVELS, help="Concurrency levels (default: %(default)s)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES,
+                        help="Inputs per /api/embed request (default: %(default)s)")
+    parser.add_argument("--input-lengths", type=int, nargs="+", default=INPUT_LENGTHS,
+                        help="Approximate tokens per input (default: %(default)s)")
+    add_pool_arguments(parser, default_size=max(USER_LEVELS))
+    add_keep_alive_argument(parser, default="30m")
+    add_telemetry_arguments(parser)
+    add_live_arguments(parser)
+    add_store_arguments(parser)
+    return parser.parse_args()
+
+def main():
+    global MODEL_EMBED, OLLAMA_API, CLIENT
+    args = parse_arguments()
+    MODEL_EMBED = args.model
+    OLLAMA_API = args.url
+    CLIENT = OllamaClient(OLLAMA_API, timeout=REQUEST_TIMEOUT_S, pool_size=max(args.pool_size, max(args.users)),
+                          pool_per_host=args.pool_per_host, keep_alive=args.keep_alive)
+    run = open_run(args, "benchmark-embed-suite-ollama", CLIENT, MODEL_EMBED)
+    sink = MultiSink(CsvSink(OUTPUT_FILE, SCENARIO_FIELDS), run)
+
+    start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    print_config("BENCHMARK EMBEDDING SUITE - CONFIGURATION", run_config(start_time, args))
+    print("")
+
+    log("Status: Warming up model...")
+    try:
+        log(f"Model {MODEL_EMBED} loaded in {load_model(CLIENT, MODEL_EMBED, args.keep_alive, embed=True):.2f}s")
+    except Exception as e: log(f"Load {MODEL_EMBED} failed: {e}")
+
+    telemetry = start_telemetry(args, OLLAMA_API)
+    live = start_live(args, sum(args.users) * len(args.input_lengths) * len(args.batch_sizes))
+    all_stats = []
+    for users in args.users:
+        for length in args.input_lengths:
+            for batch in args.batch_sizes:
+                # Nama skenario membawa batch dan panjang input agar CSV tetap memakai SCENARIO_FIELDS
+                stat = run_scenario(f"EMBED_B{batch}_L{length}", make_task(batch, length), users, sink, telemetry, live)
+                stat.update(batch=batch, input_len=length, embeds_per_s=embeds_per_second(stat, batch))
+                log(f"   > Embeddings/sec       : {stat['embeds_per_s']:.1f}")
+                all_stats.append(stat)
+                time.sleep(1)
+    if telemetry:
+        telemetry.stop()
+    if live:
+        live.stop()
+
+    print_summary_table(all_stats, "BENCHMARK EMBEDDING SUITE", run_config(start_time, args),
+                        extra_columns=[("Emb/s", "embeds_per_s"), ("Embed(s)", "embed_time")])
+    print_regime_table(all_stats)
+    if run:
+        log(f"Run {run.run_id} appended to result store {args.store}")
+    print_connection_stats(CLIENT.connection_stats())
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,19 @@
-import requests
+import sys
 import time
 import statistics
-import csv
 import argparse
 from datetime import datetime
 
+from ollama_bench import (
+    STALL_THRESHOLD_S, CsvSink, OllamaClient, add_pool_arguments, bootstrap_ci, calculate_tps, coefficient_of_variation,
+    collect_stream, print_connection_stats, reject_outliers, stream_stats,
+)
+from ollama_bench.residency import (
+    RELOAD_THRESHOLD_S, add_residency_arguments, loaded_models, measure_cold_start, plan_model_order, unload_model,
+)
+from ollama_bench.store import add_store_arguments, open_run
+from ollama_bench.tuner import DEFAULT_SPACE, add_tune_arguments, parse_space, run_tuning, save_tuning
+
 # --- KONFIGURASI ---
 MODELS_TO_TEST = [
     "gpt-oss:20b",
@@ -16,6 +25,15 @@ MODELS_TO_TEST = [
 
 OLLAMA_API_URL = "http://localhost:11434/api/generate"
 
+# Target coefficient of variation untuk mode --until-stable
+TARGET_CV = 0.05
+MAX_TRIALS = 10
+
+CSV_FIELDS = [
+    "model", "scenario", "trial", "tps", "tokens", "load_time",
+    "ttft", "itl_p50", "itl_p95", "itl_p99", "itl_max", "stalls",
+]
+
 # --- SKENARIO TEST ---
 TEST_SCENARIOS = {
     "Creative Writing": """
@@ -39,122 +57,334 @@ TEST_SCENARIOS = {
     """
 }
 
-def run_inference(model, prompt, scenario_name="Unknown", api_url=OLLAMA_API_URL):
+def run_inference(client, model, prompt, scenario_name="Unknown"):
     """Mengirim request ke Ollama."""
     print(f"   > Testing: {scenario_name}...", end="\r")
     
     payload = {
         "model": model,
         "prompt": prompt,
-        "stream": False,
         "options": {"temperature": 0.7, "num_predict": -1}
     }
 
     try:
-        start_time = time.time()
-        response = requests.post(api_url, json=payload)
-        response.raise_for_status()
-        end_time = time.time()
-        return response.json(), (end_time - start_time)
+        start_time = time.perf_counter()
+        data = client.generate(payload)
+        end_time = time.perf_counter()
+        return data, (end_time - start_time)
     except Exception as e:
         print(f"\n   [ERROR] {scenario_name}: {e}")
         return None, 0
 
-def calculate_tps(data):
-    if not data: return 0, 0
-    eval_count = data.get('eval_count', 0)
-    eval_duration_ns = data.get('eval_duration', 0)
-    if eval_duration_ns > 0:
-        return eval_count / (eval_duration_ns / 1e9), eval_count
-    return 0, 0
+def run_inference_stream(client, model, prompt, scenario_name="Unknown", stall_threshold=STALL_THRESHOLD_S):
+    """Mengirim request streaming ke Ollama dan mencatat waktu tiap token."""
+    print(f"   > Testing (stream): {scenario_name}...", end="\r")
+
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "options": {"temperature": 0.7, "num_predict": -1}
+    }
+
+    try:
+        start_time = time.perf_counter()
+        final, token_times = collect_stream(client.generate_stream(payload))
+        end_time = time.perf_counter()
+    except Exception as e:
+        print(f"\n   [ERROR] {scenario_name}: {e}")
+        return None, None, 0
+
+    return final, stream_stats(start_time, token_times, stall_threshold), (end_time - start_time)
+
+def run_once(client, model, scenario, prompt, trial, args):
+    """Satu percobaan skenario; kembalikan data run atau None jika gagal."""
+    latency = None
+    if args.stream:
+        data, latency, _ = run_inference_stream(client, model, prompt, scenario,
+                                                stall_threshold=args.stall_threshold)
+    else:
+        data, _ = run_inference(client, model, prompt, scenario)
+
+    tps, tokens = calculate_tps(data)
+    if tps <= 0:
+        return None
+    run_data = {
+        "model": model,
+        "scenario": scenario,
+        "trial": trial,
+        "tps": tps,
+        "tokens": tokens,
+        # Waktu load model terpisah dari inferensi; > RELOAD_THRESHOLD_S berarti model sempat ter-evict
+        "load_time": data.get("load_duration", 0) / 1e9,
+    }
+    if latency:
+        run_data.update(latency)
+        print(f"   > {scenario:<20} #{trial:<2}: {tps:.2f} t/s | TTFT {latency['ttft']:.2f}s | "
+              f"ITL p95 {latency['itl_p95'] * 1000:.1f} ms | stalls {latency['stalls']}")
+    else:
+        print(f"   > {scenario:<20} #{trial:<2}: {tps:.2f} t/s")
+    return run_data
+
+def run_trials(client, model, scenario, prompt, args):
+    """Warmup lalu ulangi skenario sampai --repeat (atau sampai stabil dengan --until-stable)."""
+    for _ in range(args.warmup):
+        run_inference(client, model, prompt, f"{scenario} (warmup)")
+
+    runs = []
+    attempts = 0
+    max_attempts = max(args.repeat, args.max_repeat if args.until_stable else 0)
+    while attempts < max_attempts:
+        attempts += 1
+        run_data = run_once(client, model, scenario, prompt, attempts, args)
+        if run_data:
+            runs.append(run_data)
+        if attempts < args.repeat:
+            continue
+        if not args.until_stable:
+            break
+        speeds = reject_outliers([r['tps'] for r in runs])
+        if len(speeds) >= 2 and coefficient_of_variation(speeds) <= args.target_cv:
+            break
+    return runs
+
+def summarize_speeds(speeds_by_scenario, confidence):
+    """Mean, CI bootstrap dan CV dari sampel t/s (setelah outlier dibuang) per skenario."""
+    groups = [reject_outliers(v) for v in speeds_by_scenario.values() if v]
+    flat = [x for g in groups for x in g]
+    if not flat:
+        return None
+    ci_lo, ci_hi = bootstrap_ci(groups, confidence)
+    scenario_cvs = [coefficient_of_variation(g) for g in groups if len(g) > 1]
+    return {
+        "avg": statistics.mean(statistics.mean(g) for g in groups),
+        "min": min(flat),
+        "max": max(flat),
+        "ci_lo": ci_lo,
+        "ci_hi": ci_hi,
+        "cv": statistics.mean(scenario_cvs) if scenario_cvs else 0.0,
+        "samples": len(flat),
+        "min_group": min(len(g) for g in groups),
+        "rejected": sum(len(v) for v in speeds_by_scenario.values()) - len(flat),
+    }
 
 def print_detailed_table(all_runs):
     """Menampilkan tabel breakdown per skenario."""
     print("\n" + "="*85)
-    print(f"{'MODEL':<20} | {'SCENARIO':<20} | {'SPEED (T/s)':<12} | {'TOKENS':<8}")
+    print(f"{'MODEL':<20} | {'SCENARIO':<20} | {'TRIAL':<5} | {'SPEED (T/s)':<12} | {'TOKENS':<8}")
     print("="*85)
     
     for run in all_runs:
-        print(f"{run['model']:<20} | {run['scenario']:<20} | {run['tps']:<12.2f} | {run['tokens']:<8}")
+        print(f"{run['model']:<20} | {run['scenario']:<20} | {run['trial']:<5} | {run['tps']:<12.2f} | {run['tokens']:<8}")
     print("="*85)
 
-def print_summary_table(model_stats):
-    """Menampilkan tabel rata-rata akhir."""
-    print("\n" + "="*65)
-    print(f"{'MODEL SUMMARY':<20} | {'AVG T/s':<10} | {'MIN T/s':<10} | {'MAX T/s':<10}")
-    print("="*65)
+def print_latency_table(all_runs):
+    """Menampilkan tabel TTFT dan inter-token latency (mode streaming)."""
+    print("\n" + "="*105)
+    print(f"{'MODEL':<20} | {'SCENARIO':<20} | {'TTFT (s)':<9} | {'ITL p50':<9} | {'ITL p95':<9} | {'ITL p99':<9} | {'STALLS':<6}")
+    print("="*105)
+
+    for run in all_runs:
+        print(f"{run['model']:<20} | {run['scenario']:<20} | {run['ttft']:<9.3f} | "
+              f"{run['itl_p50'] * 1000:<6.1f} ms | {run['itl_p95'] * 1000:<6.1f} ms | {run['itl_p99'] * 1000:<6.1f} ms | {run['stalls']:<6}")
+    print("="*105)
+
+def print_summary_table(model_stats, confidence=0.95):
+    """Menampilkan tabel rata-rata akhir beserta confidence interval."""
+    ci_label = f"{confidence * 100:.0f}% CI"
+    print("\n" + "="*105)
+    print(f"{'MODEL SUMMARY':<20} | {'AVG T/s':<10} | {ci_label:<17} | {'CV %':<6} | {'MIN T/s':<10} | {'MAX T/s':<10} | {'N':<4} | {'OUTLIERS':<8}")
+    print("="*105)
     
     sorted_stats = sorted(model_stats, key=lambda x: x['avg'], reverse=True)
     for stat in sorted_stats:
-        print(f"{stat['model']:<20} | {stat['avg']:<10.2f} | {stat['min']:<10.2f} | {stat['max']:<10.2f}")
-    print("="*65)
+        ci = f"{stat['ci_lo']:.2f} - {stat['ci_hi']:.2f}"
+        print(f"{stat['model']:<20} | {stat['avg']:<10.2f} | {ci:<17} | {stat['cv'] * 100:<6.1f} | "
+              f"{stat['min']:<10.2f} | {stat['max']:<10.2f} | {stat['samples']:<4} | {stat['rejected']:<8}")
+    print("="*105)
+    print_ranking(sorted_stats)
 
-def save_to_csv(all_runs):
+def print_ranking(sorted_stats):
+    """Umumkan pemenang hanya jika CI model tercepat tidak overlap dengan model lain."""
+    if len(sorted_stats) < 2:
+        return
+    if any(s['min_group'] < 2 for s in sorted_stats):
+        print(" RANKING: belum bisa menentukan pemenang - butuh minimal 2 trial per skenario (--repeat 2 atau lebih).")
+        return
+    top = sorted_stats[0]
+    tied = [s['model'] for s in sorted_stats[1:] if s['ci_hi'] >= top['ci_lo']]
+    if tied:
+        print(f" RANKING: tidak ada pemenang yang jelas - CI {top['model']} overlap dengan {', '.join(tied)}.")
+        print("          Tambah --repeat atau gunakan --until-stable untuk mempersempit interval.")
+    else:
+        print(f" RANKING: {top['model']} tercepat (CI tidak overlap dengan {sorted_stats[1]['model']}).")
+
+def first_request(client, model, args):
+    """Request pertama per model: cold start terukur (--cold-start) atau warmup biasa."""
+    if args.cold_start:
+        print(f"   > Cold start: unloading {model}...", end="\r")
+        try:
+            return measure_cold_start(client, model, "Hi", args.keep_alive)
+        except Exception as e:
+            print(f"\n   [ERROR] Cold start: {e}")
+            return None
+    data, secs = run_inference(client, model, "Hi", "Warmup")
+    if data is None:
+        return None
+    load_time = data.get("load_duration", 0) / 1e9
+    return {"model": model, "cold": False, "cold_wall": secs, "load_time": load_time,
+            "inference_time": max(0.0, data.get("total_duration", 0) / 1e9 - load_time)}
+
+def print_residency_table(residency, all_runs):
+    """Waktu load model dipisahkan dari inferensi, plus reload yang terjadi di tengah run."""
+    print("\n" + "="*105)
+    print(f"{'MODEL':<20} | {'FIRST REQ':<9} | {'LOAD (s)':<9} | {'INFER (s)':<9} | {'TOTAL (s)':<9} | "
+          f"{'RELOADS':<7} | {'RELOAD TIME (s)':<15}")
+    print("="*105)
+    for r in residency:
+        reloads = [run['load_time'] for run in all_runs
+                   if run['model'] == r['model'] and run['load_time'] > RELOAD_THRESHOLD_S]
+        kind = "cold" if r['cold'] else "warmup"
+        print(f"{r['model']:<20} | {kind:<9} | {r['load_time']:<9.2f} | {r['inference_time']:<9.2f} | "
+              f"{r['cold_wall']:<9.2f} | {len(reloads):<7} | {sum(reloads):<15.2f}")
+    print("="*105)
+    print(f" RELOADS = measured trials with load_duration > {RELOAD_THRESHOLD_S}s (model was evicted and loaded again);")
+    print("           use --keep-alive to pin models. T/s never includes load time.")
+
+def save_to_csv(all_runs, run=None):
     filename = f"benchmark_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    with open(filename, 'w', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=["model", "scenario", "tps", "tokens"])
-        writer.writeheader()
-        writer.writerows(all_runs)
+    CsvSink(filename, CSV_FIELDS).write_rows(all_runs)
     print(f"\n[INFO] Hasil lengkap disimpan ke file: {filename}")
+    if run:
+        # Satu trial = satu sample di result store
+        run.write_rows(all_runs)
+        print(f"[INFO] Run {run.run_id} ditambahkan ke result store")
+
+def tune(args):
+    """Mode --tune: cari opsi tercepat tiap model dengan prompt Coding Task."""
+    try:
+        space = parse_space(args.space)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    # Space default bisa sampai 108 config; grid penuh terlalu lama, jadi halving kecuali diminta lain
+    args.search = args.search or ("grid" if space else "halving")
+    # Satu koneksi per request bersamaan pada level parallel tertinggi
+    pool_size = max(args.pool_size, max(space.get("parallel", DEFAULT_SPACE["parallel"])))
+    client = OllamaClient(args.url, timeout=None, pool_size=pool_size, pool_per_host=args.pool_per_host,
+                          keep_alive=args.keep_alive)
+    print(f"--- TUNING STARTED ({len(args.models)} Models) ---")
+    print(f"API URL: {args.url}")
+    print(f"Space: {', '.join(f'{k}={v}' for k, v in space.items()) if space else 'hardware defaults per model'}")
+    print(f"Search: {args.search}, rounds: {args.tune_rounds}" + (f", eta: {args.eta}" if args.search == "halving" else ""))
+    print(f"Cache: {args.tune_cache}")
+    rows = []
+    try:
+        rows = run_tuning(client, args.models, TEST_SCENARIOS["Coding Task"], space, args.search,
+                          args.tune_rounds, args.eta, args.tune_cache, unload_after=args.unload_after)
+    except KeyboardInterrupt:
+        print(f"\n[INFO] Dihentikan; jalankan perintah yang sama untuk melanjutkan dari {args.tune_cache}")
+    except OSError as e:
+        # requests.RequestException turunan OSError: server tidak terjangkau, ronde yang selesai tetap di cache
+        print(f"\n[ERROR] Koneksi ke server gagal ({e}); jalankan ulang untuk melanjutkan dari {args.tune_cache}")
+    if rows:
+        print(f"\n[INFO] Hasil tuning disimpan ke file: {save_tuning(rows)}")
+    print_connection_stats(client.connection_stats())
 
 def main():
     parser = argparse.ArgumentParser(description="Benchmark Ollama Models")
     parser.add_argument("--models", nargs='+', default=MODELS_TO_TEST, help="List of models to test")
     parser.add_argument("--url", default=OLLAMA_API_URL, help="Ollama API URL")
+    parser.add_argument("--stream", action="store_true", help="Use streaming mode to measure TTFT and inter-token latency")
+    parser.add_argument("--stall-threshold", type=float, default=STALL_THRESHOLD_S,
+                        help="Inter-token gap (seconds) counted as a stall in streaming mode (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=1, help="Measured trials per scenario (default: %(default)s)")
+    parser.add_argument("--warmup", type=int, default=0, help="Discarded warmup trials per scenario (default: %(default)s)")
+    parser.add_argument("--until-stable", action="store_true",
+                        help="Keep adding trials until tokens/sec CV <= --target-cv or --max-repeat is reached")
+    parser.add_argument("--target-cv", type=float, default=TARGET_CV, help="Target coefficient of variation (default: %(default)s)")
+    parser.add_argument("--max-repeat", type=int, default=MAX_TRIALS, help="Upper bound on trials with --until-stable (default: %(default)s)")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Bootstrap confidence level (default: %(default)s)")
+    add_pool_arguments(parser, default_size=1)
+    add_residency_arguments(parser)
+    add_store_arguments(parser)
+    add_tune_arguments(parser)
     
     args = parser.parse_args()
     
-    models_to_test = args.models
     api_url = args.url
+    if args.tune:
+        tune(args)
+        return
+    # Tanpa timeout: num_predict=-1 bisa menghasilkan jawaban yang sangat panjang
+    client = OllamaClient(api_url, timeout=None, pool_size=args.pool_size, pool_per_host=args.pool_per_host,
+                          keep_alive=args.keep_alive)
+    models_to_test = args.models
+    if not args.keep_order:
+        # Model yang sudah resident dijalankan dulu supaya tidak perlu dimuat ulang setelah ter-evict
+        try:
+            models_to_test = plan_model_order(args.models, loaded_models(client))
+        except Exception as e:
+            print(f"[WARN] /api/ps tidak tersedia, urutan model tidak diubah: {e}")
 
     print(f"--- BENCHMARK STARTED ({len(models_to_test)} Models) ---")
     print(f"API URL: {api_url}")
+    print(f"Mode: {'streaming' if args.stream else 'non-streaming'}")
+    trials = f"{args.repeat}" + (f" (until CV <= {args.target_cv}, max {args.max_repeat})" if args.until_stable else "")
+    print(f"Trials per scenario: {trials}, warmup: {args.warmup}")
+    print(f"Residency: keep_alive={args.keep_alive if args.keep_alive is not None else 'server default'}"
+          f"{', cold start' if args.cold_start else ''}{', unload after each model' if args.unload_after else ''}")
     print(f"Models: {models_to_test}\n")
+    run = open_run(args, "benchmark-ollama", client, models=models_to_test)
     
     all_runs_data = [] # Untuk tabel detail
     model_stats = []   # Untuk tabel summary
+    residency = []     # Load time vs inferensi per model
 
     for model in models_to_test:
         print(f"[{model.upper()}] Processing...")
         
-        # Warmup
-        run_inference(model, "Hi", "Warmup", api_url=api_url)
+        # Warmup / cold start (load time dicatat terpisah dari hasil trial)
+        first = first_request(client, model, args)
+        if first:
+            residency.append(first)
+            print(f"   > {'Cold start' if first['cold'] else 'Warmup':<20}    : load {first['load_time']:.2f}s + "
+                  f"inference {first['inference_time']:.2f}s")
         
-        current_model_speeds = []
+        speeds_by_scenario = {}
         
         for scenario, prompt in TEST_SCENARIOS.items():
-            data, _ = run_inference(model, prompt, scenario, api_url=api_url)
-            
-            if data:
-                tps, tokens = calculate_tps(data)
-                if tps > 0:
-                    # Simpan data per run
-                    run_data = {
-                        "model": model,
-                        "scenario": scenario,
-                        "tps": tps,
-                        "tokens": tokens
-                    }
-                    all_runs_data.append(run_data)
-                    current_model_speeds.append(tps)
-                    print(f"   > {scenario:<20} : {tps:.2f} t/s")
+            runs = run_trials(client, model, scenario, prompt, args)
+            all_runs_data.extend(runs)
+            speeds = [r['tps'] for r in runs]
+            speeds_by_scenario[scenario] = speeds
+            if len(speeds) > 1:
+                kept = reject_outliers(speeds)
+                lo, hi = bootstrap_ci([kept], args.confidence)
+                print(f"   = {scenario:<20} : {statistics.mean(kept):.2f} t/s "
+                      f"(CI {lo:.2f}-{hi:.2f}, CV {coefficient_of_variation(kept) * 100:.1f}%, n={len(kept)})")
 
         # Hitung statistik rata-rata model ini
-        if current_model_speeds:
-            model_stats.append({
-                "model": model,
-                "avg": statistics.mean(current_model_speeds),
-                "min": min(current_model_speeds),
-                "max": max(current_model_speeds)
-            })
+        summary = summarize_speeds(speeds_by_scenario, args.confidence)
+        if summary:
+            summary["model"] = model
+            model_stats.append(summary)
+        if args.unload_after:
+            try:
+                unload_model(client, model)
+            except Exception as e:
+                print(f"   [WARN] Unload {model} gagal: {e}")
         print("") # Spasi antar model
 
     # --- TAMPILKAN HASIL ---
     print_detailed_table(all_runs_data)
-    print_summary_table(model_stats)
+    if args.stream:
+        print_latency_table(all_runs_data)
+    print_residency_table(residency, all_runs_data)
+    print_summary_table(model_stats, args.confidence)
     
     # Opsional: Simpan ke CSV
-    save_to_csv(all_runs_data)
+    save_to_csv(all_runs_data, run)
+    print_connection_stats(client.connection_stats())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,176 @@
+import time
+import uuid
+import argparse
+import statistics
+from datetime import datetime
+
+from ollama_bench import (
+    CsvSink, MultiSink, OllamaClient, add_pool_arguments, collect_stream, get_metrics, log, print_config,
+    print_connection_stats, stream_stats,
+)
+from ollama_bench.prompts import filler_text
+from ollama_bench.residency import add_keep_alive_argument, load_model
+from ollama_bench.store import add_store_arguments, open_run
+
+# --- KONFIGURASI DEFAULT ---
+DEFAULT_MODEL = "qwen3:30b"
+DEFAULT_OLLAMA_API = "http://localhost:11434/api"
+# Prefill 32k token di hardware lambat bisa memakan beberapa menit
+REQUEST_TIMEOUT_S = 600
+OUTPUT_FILE = f"prefill_benchmark_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
+
+# num_ctx yang dites; prompt mengisi PROMPT_FILL dari konteks, sisanya untuk jawaban
+CONTEXT_LENGTHS = [512, 1024, 2048, 4096, 8192, 16384, 32768]
+PROMPT_FILL = 0.85
+# Jawaban pendek: yang diukur adalah prefill, bukan decode
+NUM_PREDICT = 32
+
+COLD_QUESTION = "\n\nQuestion: What is the main topic of this document? Answer in one sentence."
+WARM_QUESTION = "\n\nQuestion: Which teams are mentioned in this document? Answer in one sentence."
+
+CSV_FIELDS = [
+    "time", "model", "num_ctx", "trial", "prompt_tokens", "ttft", "prefill_time", "prefill_tps", "decode_tps",
+    "warm_prompt_tokens", "warm_ttft", "warm_prefill_time", "cache_saving",
+]
+
+def stream_request(client, model, prompt, num_ctx):
+    """Request streaming; metrik get_metrics ditambah TTFT yang diukur di client."""
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "options": {"num_ctx": num_ctx, "num_predict": NUM_PREDICT, "temperature": 0},
+    }
+    start = time.perf_counter()
+    final, token_times = collect_stream(client.generate_stream(payload))
+    m = get_metrics(final)
+    m["ttft"] = stream_stats(start, token_times)["ttft"]
+    return m
+
+def measure_level(client, model, num_ctx, trial):
+    """Satu dokumen baru (cold prefill) lalu pertanyaan kedua dengan prefix yang sama (warm, KV cache)."""
+    # Header unik agar prefix tidak pernah cocok dengan cache dari trial/level sebelumnya
+    document = f"Document {uuid.uuid4().hex}:\n" + filler_text(int(num_ctx * PROMPT_FILL) - NUM_PREDICT, seed=trial)
+    cold = stream_request(client, model, document + COLD_QUESTION, num_ctx)
+    warm = stream_request(client, model, document + WARM_QUESTION, num_ctx)
+    return {
+        "time": datetime.now().strftime('%H:%M:%S'),
+        "model": model,
+        "scenario": f"PREFILL_{num_ctx}",
+        "num_ctx": num_ctx,
+        "trial": trial,
+        "prompt_tokens": cold["tokens_in"],
+        "ttft": cold["ttft"],
+        "prefill_time": cold["prompt_eval_time"],
+        "prefill_tps": cold["prompt_tps"],
+        "decode_tps": cold["gen_tps"],
+        "warm_prompt_tokens": warm["tokens_in"],
+        "warm_ttft": warm["ttft"],
+        "warm_prefill_time": warm["prompt_eval_time"],
+        # Porsi waktu prefill yang dihemat karena prefix dokumen sudah ada di KV cache
+        "cache_saving": 1 - warm["prompt_eval_time"] / cold["prompt_eval_time"] if cold["prompt_eval_time"] > 0 else 0.0,
+    }
+
+def summarize_level(rows):
+    """Median per level num_ctx (tahan terhadap satu trial yang lambat)."""
+    keys = ["prompt_tokens", "ttft", "prefill_time", "prefill_tps", "decode_tps",
+            "warm_prompt_tokens", "warm_ttft", "warm_prefill_time", "cache_saving"]
+    summary = {k: statistics.median(r[k] for r in rows) for k in keys}
+    summary["num_ctx"] = rows[0]["num_ctx"]
+    summary["trials"] = len(rows)
+    return summary
+
+def bar(value, peak, width=30):
+    return "#" * max(1, round(width * value / peak)) if peak > 0 else ""
+
+def print_prefill_table(levels, budget):
+    width = 120
+    print("\n" + "=" * width)
+    print(f"{'PREFILL SCALING - CONTEXT LENGTH SWEEP (median)':^{width}}")
+    print("=" * width)
+    print(f"{'num_ctx':<8} | {'Prompt Tok':<10} | {'Prefill T/s':<11} | {'Prefill(s)':<10} | {'TTFT(s)':<8} | "
+          f"{'Warm Tok':<8} | {'Warm TTFT':<9} | {'Cache Saving':<12} | {'Decode T/s':<10} | {'Budget'}")
+    print("-" * width)
+    for s in levels:
+        verdict = "-" if budget is None else ("OK" if s["ttft"] <= budget else "OVER")
+        print(f"{s['num_ctx']:<8} | {s['prompt_tokens']:<10.0f} | {s['prefill_tps']:<11.1f} | {s['prefill_time']:<10.2f} | "
+              f"{s['ttft']:<8.2f} | {s['warm_prompt_tokens']:<8.0f} | {s['warm_ttft']:<9.2f} | "
+              f"{s['cache_saving']:<12.1%} | {s['decode_tps']:<10.1f} | {verdict}")
+    print("=" * width)
+    print(" Warm = same document with a new question; Warm Tok = prompt tokens Ollama still had to evaluate.")
+
+    # Grafik ASCII: prefill t/s dan TTFT terhadap ukuran prompt
+    peak_tps = max(s["prefill_tps"] for s in levels)
+    peak_ttft = max(s["ttft"] for s in levels)
+    print(f"\n {'Prefill T/s vs prompt size':<45} {'TTFT vs prompt size'}")
+    for s in levels:
+        print(f" {s['prompt_tokens']:>7.0f} tok {bar(s['prefill_tps'], peak_tps):<31} "
+              f" {s['prompt_tokens']:>7.0f} tok {bar(s['ttft'], peak_ttft):<31} {s['ttft']:.2f}s")
+    print("")
+
+def run_config(start_time, args):
+    return {
+        "Date Running Test": start_time,
+        "Model": args.model,
+        "API Endpoint": args.url,
+        "Context Lengths": args.contexts,
+        "Prompt Fill": f"{PROMPT_FILL:.0%} of num_ctx, num_predict {NUM_PREDICT}",
+        "Trials per Level": args.repeat,
+        "TTFT Budget": f"{args.ttft_budget}s" if args.ttft_budget is not None else "-",
+    }
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Prefill Scaling Benchmark for Ollama")
+    parser.add_argument("-m", "--model", default=DEFAULT_MODEL, help="Model name (default: %(default)s)")
+    parser.add_argument("--url", default=DEFAULT_OLLAMA_API, help="Ollama API URL (default: %(default)s)")
+    parser.add_argument("--contexts", type=int, nargs="+", default=CONTEXT_LENGTHS,
+                        help="num_ctx values to sweep; the prompt fills ~85%% of each (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="Trials per context length (default: %(default)s)")
+    parser.add_argument("--ttft-budget", type=float, default=None, help="Mark levels whose median TTFT exceeds this many seconds")
+    add_pool_arguments(parser, default_size=1)
+    add_keep_alive_argument(parser, default="30m")
+    add_store_arguments(parser)
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+    client = OllamaClient(args.url, timeout=REQUEST_TIMEOUT_S, pool_size=args.pool_size,
+                          pool_per_host=args.pool_per_host, keep_alive=args.keep_alive)
+    run = open_run(args, "benchmark-prefill-ollama", client, args.model)
+    sink = MultiSink(CsvSink(OUTPUT_FILE, CSV_FIELDS), run)
+
+    start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    print_config("PREFILL SCALING BENCHMARK - CONFIGURATION", run_config(start_time, args))
+    print("")
+
+    # Load model dulu supaya load_duration tidak ikut masuk ke TTFT level pertama
+    try:
+        log(f"Model {args.model} loaded in {load_model(client, args.model, args.keep_alive):.2f}s")
+    except Exception as e: log(f"Load {args.model} failed: {e}")
+
+    levels = []
+    for num_ctx in sorted(args.contexts):
+        log(f"--- num_ctx {num_ctx} ---")
+        rows = []
+        for trial in range(1, args.repeat + 1):
+            try:
+                row = measure_level(client, args.model, num_ctx, trial)
+            except Exception as e:
+                log(f"Err num_ctx {num_ctx} #{trial}: {e}")
+                continue
+            sink.write(row)
+            rows.append(row)
+            print(f"   > #{trial}: {row['prompt_tokens']} tok | prefill {row['prefill_tps']:.1f} t/s | "
+                  f"TTFT {row['ttft']:.2f}s | warm TTFT {row['warm_ttft']:.2f}s ({row['cache_saving'] * 100:.0f}% saved)")
+        if not rows:
+            # Konteks lebih besar hampir pasti gagal juga (OOM / timeout)
+            log(f"All trials failed at num_ctx {num_ctx}; stopping the sweep.")
+            break
+        levels.append(summarize_level(rows))
+
+    if levels:
+        print_prefill_table(levels, args.ttft_budget)
+    log(f"Results saved to {OUTPUT_FILE}" + (f" and run {run.run_id} of {args.store}" if run else ""))
+    print_connection_stats(client.connection_stats())
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,49 @@
-import requests
 import time
-import concurrent.futures
-import statistics
-import csv
-import os
 import argparse
 from datetime import datetime
 
+from ollama_bench import (
+    CsvSink, MultiSink, OllamaClient, SCENARIO_FIELDS, add_pool_arguments, get_metrics, log, print_config,
+    print_connection_stats, print_summary_table, run_scenario,
+)
+from ollama_bench import conversation, rag
+from ollama_bench.residency import add_keep_alive_argument, load_model
+from ollama_bench.live import add_live_arguments, start_live
+from ollama_bench.store import add_store_arguments, open_run
+from ollama_bench.telemetry import add_telemetry_arguments, start_telemetry
+from ollama_bench.sweep import add_sweep_arguments, print_sweep_summary, sweep_concurrency
+
 # --- KONFIGURASI DEFAULT ---
 # Ganti dengan model teks murni Anda (misal: qwen2.5:32b, llama3.1:70b, atau enterprise-main)
 DEFAULT_MODEL_TEXT = "qwen3:30b"
 DEFAULT_MODEL_EMBED = "qwen3-embedding:4b"
 DEFAULT_OLLAMA_API = "http://localhost:11434/api"
+REQUEST_TIMEOUT_S = 60
 
 # Variables that will be updated by args
 MODEL_TEXT = DEFAULT_MODEL_TEXT
 MODEL_EMBED = DEFAULT_MODEL_EMBED
 OLLAMA_API = DEFAULT_OLLAMA_API
+CLIENT = None
+RAG_INDEX = None
 OUTPUT_FILE = f"text_benchmark_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
+TURNS_FILE = f"text_turns_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
 
 # Level Concurrency yang akan dites
 USER_LEVELS = [1, 8, 16, 32] 
+# Batas atas untuk --sweep (pencarian concurrency otomatis)
+MAX_SWEEP_USERS = 128
+
+# --- RAG ---
+RAG_DOCS = 1000       # Jumlah chunk korpus sintetis
+RAG_TOP_K = 4         # Chunk yang dimasukkan ke prompt
+EMBED_BATCH = 32      # Input per request /api/embed saat ingest
+RAG_QUERIES = rag.build_queries(64)
+
+# --- MULTI-TURN CHAT ---
+CHAT_TURNS = 6        # Turn per sesi (history bertambah tiap turn)
+TURN_FIELDS = ['time', 'users', 'turn', 'sessions', 'context_tokens', 'prompt_tokens', 'prefill_time',
+               'ttft_p50', 'ttft_p95', 'decode_tps']
 
 # --- PROMPTS ---
 PROMPTS = {
@@ -29,228 +52,162 @@ PROMPTS = {
     "LONG_SUMMARIZE": "Summarize the following text: " + ("This is a long dummy context about enterprise architecture. " * 200) # Simulasi input panjang
 }
 
-def log(msg):
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
-
-def get_metrics(res_json):
-    """Ekstrak metrik performa."""
-    try:
-        eval_count = res_json.get('eval_count', 0)
-        eval_dur = res_json.get('eval_duration', 0) # ns
-        prompt_eval_count = res_json.get('prompt_eval_count', 0)
-        prompt_eval_dur = res_json.get('prompt_eval_duration', 0) # ns
-        
-        # Kecepatan Generate (Menulis)
-        gen_tps = 0
-        if eval_dur > 0:
-            gen_tps = eval_count / (eval_dur / 1e9)
-            
-        # Kecepatan Membaca (Prompt Processing)
-        prompt_tps = 0
-        if prompt_eval_dur > 0:
-            prompt_tps = prompt_eval_count / (prompt_eval_dur / 1e9)
-            
-        return {
-            "gen_tps": gen_tps,
-            "prompt_tps": prompt_tps,
-            "latency": res_json.get('total_duration', 0) / 1e9,
-            "tokens_out": eval_count
-        }
-    except:
-        return None
-
 def task_chat(user_id):
     """Skenario 1: Chat Ringan"""
-    payload = {"model": MODEL_TEXT, "prompt": PROMPTS["CHAT_SHORT"], "stream": False}
+    payload = {"model": MODEL_TEXT, "prompt": PROMPTS["CHAT_SHORT"]}
     try:
-        res = requests.post(f"{OLLAMA_API}/generate", json=payload, timeout=60)
-        if res.status_code == 200: return get_metrics(res.json())
+        return get_metrics(CLIENT.generate(payload))
     except Exception as e: log(f"Err {user_id}: {e}")
     return None
 
 def task_coding(user_id):
     """Skenario 2: Coding (Logika Berat)"""
-    payload = {"model": MODEL_TEXT, "prompt": PROMPTS["CODING_HARD"], "stream": False, "options": {"num_predict": 512}}
+    payload = {"model": MODEL_TEXT, "prompt": PROMPTS["CODING_HARD"], "options": {"num_predict": 512}}
     try:
-        res = requests.post(f"{OLLAMA_API}/generate", json=payload, timeout=60)
-        if res.status_code == 200: return get_metrics(res.json())
+        return get_metrics(CLIENT.generate(payload))
     except Exception as e: log(f"Err {user_id}: {e}")
     return None
 
-def task_rag_sim(user_id):
-    """Skenario 3: RAG Text Pipeline"""
-    # 1. Embed
-    start = time.time()
-    requests.post(f"{OLLAMA_API}/embeddings", json={"model": MODEL_EMBED, "prompt": "Database query simulation"})
-    embed_dur = time.time() - start
-    
-    # 2. Generate
-    payload = {"model": MODEL_TEXT, "prompt": "Based on this context, answer usage policy.", "stream": False}
+def task_rag(user_id):
+    """Skenario 3: RAG Pipeline (embed query -> top-k search -> generate dengan konteks)"""
+    question = RAG_QUERIES[user_id % len(RAG_QUERIES)]
     try:
-        res = requests.post(f"{OLLAMA_API}/generate", json=payload, timeout=60)
-        if res.status_code == 200:
-            m = get_metrics(res.json())
-            m['embed_latency'] = embed_dur
-            return m
+        return rag.rag_query(CLIENT, RAG_INDEX, MODEL_EMBED, MODEL_TEXT, question, RAG_TOP_K)
     except Exception as e: log(f"Err {user_id}: {e}")
     return None
 
-def run_scenario(name, func, concurrency):
-    log(f"--- RUNNING: {name} ({concurrency} Users) ---")
-    results = []
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
-        futures = [executor.submit(func, i) for i in range(concurrency)]
-        for f in concurrent.futures.as_completed(futures):
-            if f.result(): results.append(f.result())
-            
-    if not results:
-        return {
-            "scenario": name,
-            "users": concurrency,
-            "success": 0,
-            "fail": concurrency,
-            "avg_tps": 0.0,
-            "sys_throughput": 0.0
-        }
-
-    # Agregasi
-    success_count = len(results)
-    fail_count = concurrency - success_count
-
-    avg_gen_tps = statistics.mean([r['gen_tps'] for r in results])
-    avg_prompt_tps = statistics.mean([r['prompt_tps'] for r in results])
-    avg_lat = statistics.mean([r['latency'] for r in results])
-    
-    # Kalkulasi Throughput
-    model_speeds = [r['gen_tps'] for r in results]
-    min_tps = min(model_speeds) if model_speeds else 0
-    max_tps = max(model_speeds) if model_speeds else 0
-
-    # Total token yang diproduksi seluruh sistem per detik
-    total_tokens = sum([r['tokens_out'] for r in results])
-    max_duration = max([r['latency'] for r in results])
-    sys_throughput = total_tokens / max_duration
+def task_multi_turn(user_id):
+    """Skenario 4: Sesi chat multi-turn lewat /api/chat, jawaban assistant diteruskan ke turn berikutnya"""
+    try:
+        rows = conversation.run_conversation(CLIENT, MODEL_TEXT, CHAT_TURNS, user_id, {"num_predict": 256})
+        return conversation.summarize_session(rows)
+    except Exception as e: log(f"Err {user_id}: {e}")
+    return None
 
-    print(f"   > Success/Fail     : {success_count}/{fail_count}")
-    print(f"   > Avg Speed (User) : {avg_gen_tps:.2f} t/s")
-    print(f"   > Prompt Reading   : {avg_prompt_tps:.2f} t/s")
-    print(f"   > System Throughput: {sys_throughput:.2f} t/s")
-    print("-" * 50)
-    
-    # Save CSV
-    write_header = not os.path.exists(OUTPUT_FILE)
-    with open(OUTPUT_FILE, 'a', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=['time', 'scenario', 'users', 'successes', 'failures', 'avg_tps', 'min_tps', 'max_tps', 'prompt_tps', 'sys_throughput', 'latency', 'total_tokens'])
-        if write_header: writer.writeheader()
-        writer.writerow({
-            'time': datetime.now().strftime('%H:%M:%S'),
-            'scenario': name,
-            'users': concurrency,
-            'successes': success_count,
-            'failures': fail_count,
-            'avg_tps': avg_gen_tps,
-            "min_tps": min_tps,
-            "max_tps": max_tps,
-            'prompt_tps': avg_prompt_tps,
-            'sys_throughput': sys_throughput,
-            'latency': avg_lat,
-            "total_tokens": total_tokens
-        })
+def report_turns(stat, turn_sink):
+    """Tabel dan CSV per turn untuk skenario multi-turn."""
+    if stat['scenario'] != "CHAT_MULTI_TURN" or not stat['results']:
+        return
+    turns = conversation.per_turn_stats(stat['results'])
+    conversation.print_turn_table(stat['scenario'], stat['users'], turns)
+    turn_sink.write_rows([dict(t, time=stat['time'], users=stat['users']) for t in turns])
+
+def build_rag_index(args):
+    """Ingest korpus sintetis sekali sebelum skenario; None jika numpy/embedding tidak tersedia."""
+    global RAG_INDEX
+    if rag.np is None:
+        log("RAG_FLOW skipped: numpy is not installed (pip install numpy)")
+        return None
+    log(f"Status: Embedding {args.rag_docs} chunks with {MODEL_EMBED} (batch {args.embed_batch})...")
+    try:
+        RAG_INDEX, ingest = rag.embed_corpus(CLIENT, MODEL_EMBED, rag.build_corpus(args.rag_docs), args.embed_batch)
+    except Exception as e:
+        log(f"RAG_FLOW skipped: ingest failed: {e}")
+        return None
+    log(f"Ingest: {ingest['docs']} chunks in {ingest['seconds']:.2f}s ({ingest['docs_per_s']:.1f} chunks/s, "
+        f"{ingest['tokens_per_s']:.0f} tokens/s, dim {ingest['dim']})")
+    return ingest
 
+def run_config(start_time, args):
     return {
-        "scenario": name,
-        "users": concurrency,
-        "success": success_count,
-        "fail": fail_count,
-        "avg_tps": avg_gen_tps,
-        "sys_throughput": sys_throughput
+        "Date Running Test": start_time,
+        "Model Text": MODEL_TEXT,
+        "Model Embed": MODEL_EMBED,
+        "RAG": f"{args.rag_docs} chunks, top-{args.rag_top_k}, embed batch {args.embed_batch}",
+        "Multi-turn Chat": f"{args.turns} turns per session" if args.multi_turn else "off (--multi-turn)",
+        "API Endpoint": OLLAMA_API,
+        "Concurrency": (f"adaptive sweep up to {args.max_users} users (SLO p95: {args.slo_p95 or '-'}s, max status: {args.max_status})"
+                        if args.sweep else USER_LEVELS),
     }
 
-def print_summary_table(all_stats, start_time):
-    # Print Configuration Block
-    print("\n" + "=" * 85)
-    print(f"{'BENCHMARK TEXT SUITE - CONFIGURATION':^85}")
-    print("=" * 85)
-    print(f" Date Running Test: {start_time}")
-    print(f" Model Text       : {MODEL_TEXT}")
-    print(f" Model Embed      : {MODEL_EMBED}")
-    print(f" API Endpoint     : {OLLAMA_API}")
-    print(f" Concurrency      : {USER_LEVELS}")
-    print("=" * 85)
-
-    print("\n" + "="*85)
-    print(f"{'FINAL SUMMARY REPORT':^85}")
-    print("="*85)
-    print(f"{'Scenario':<25} | {'Users':<6} | {'Pass':<5} | {'Fail':<5} | {'Avg TPS':<10} | {'Sys T/s':<10} | {'Status':<10}")
-    print("-" * 85)
-    
-    for stat in all_stats:
-        if not stat: continue
-        
-        # Color codes
-        GREEN = "\033[92m"
-        YELLOW = "\033[93m"
-        RED = "\033[91m"
-        RESET = "\033[0m"
-        
-        fail = stat['fail']
-        users = stat['users']
-        
-        status = f"{GREEN}PASS{RESET}"
-        if fail > 0:
-            status = f"{YELLOW}WARN{RESET}"
-        if fail > (users * 0.2) and users > 1: # >20% failures
-            status = f"{RED}FAIL{RESET}"
-        if fail == users:
-            status = f"{RED}CRITICAL{RESET}"
-            
-        print(f"{stat['scenario']:<25} | {stat['users']:<6} | {stat['success']:<5} | {stat['fail']:<5} | {stat['avg_tps']:<10.2f} | {stat['sys_throughput']:<10.2f} | {status}")
-    print("="*85 + "\n")
-
 def parse_arguments():
     parser = argparse.ArgumentParser(description="Benchmark Text Suite for Ollama")
     parser.add_argument("-m", "--model", default=DEFAULT_MODEL_TEXT, help="Text model name (default: %(default)s)")
     parser.add_argument("--embed-model", default=DEFAULT_MODEL_EMBED, help="Embedding model name (default: %(default)s)")
     parser.add_argument("--url", default=DEFAULT_OLLAMA_API, help="Ollama API URL (default: %(default)s)")
+    add_pool_arguments(parser, default_size=max(USER_LEVELS))
+    add_sweep_arguments(parser, default_max=MAX_SWEEP_USERS)
+    parser.add_argument("--rag-docs", type=int, default=RAG_DOCS, help="RAG: chunks in the synthetic corpus (default: %(default)s)")
+    parser.add_argument("--rag-top-k", type=int, default=RAG_TOP_K, help="RAG: chunks retrieved per query (default: %(default)s)")
+    parser.add_argument("--embed-batch", type=int, default=EMBED_BATCH, help="RAG: inputs per /api/embed call during ingest (default: %(default)s)")
+    parser.add_argument("--multi-turn", action="store_true",
+                        help="Also run the CHAT_MULTI_TURN scenario (multi-turn /api/chat sessions)")
+    parser.add_argument("--turns", type=int, default=CHAT_TURNS, help="Multi-turn chat: turns per session (default: %(default)s)")
+    add_keep_alive_argument(parser, default="30m")
+    add_telemetry_arguments(parser)
+    add_live_arguments(parser)
+    add_store_arguments(parser)
     return parser.parse_args()
 
 def main():
-    global MODEL_TEXT, MODEL_EMBED, OLLAMA_API
+    global MODEL_TEXT, MODEL_EMBED, OLLAMA_API, CLIENT, RAG_TOP_K, CHAT_TURNS
     args = parse_arguments()
     MODEL_TEXT = args.model
+    RAG_TOP_K = args.rag_top_k
+    CHAT_TURNS = args.turns
     MODEL_EMBED = args.embed_model
     OLLAMA_API = args.url
+    pool_size = max(args.pool_size, args.max_users) if args.sweep else args.pool_size
+    CLIENT = OllamaClient(OLLAMA_API, timeout=REQUEST_TIMEOUT_S, pool_size=pool_size, pool_per_host=args.pool_per_host,
+                          keep_alive=args.keep_alive)
+    run = open_run(args, "benchmark-text-suite-ollama", CLIENT, MODEL_TEXT, [MODEL_TEXT, MODEL_EMBED])
+    sink = MultiSink(CsvSink(OUTPUT_FILE, SCENARIO_FIELDS), run)
+    turn_sink = CsvSink(TURNS_FILE, TURN_FIELDS)
 
     # Detailed Header
     start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    print("=" * 60)
-    print(f"{'BENCHMARK TEXT SUITE - CONFIGURATION':^60}")
-    print("=" * 60)
-    print(f" Date Running Test: {start_time}")
-    print(f" Model Text   : {MODEL_TEXT}")
-    print(f" Model Embed  : {MODEL_EMBED}")
-    print(f" API Endpoint : {OLLAMA_API}")
-    print(f" Concurrency  : {USER_LEVELS}")
-    print("=" * 60)
+    print_config("BENCHMARK TEXT SUITE - CONFIGURATION", run_config(start_time, args))
     print("")
     
     # Warmup
     log("Status: Warming up models...")
+    # Muat model teks dan embedding di awal; load time dicatat terpisah dari skenario
+    for model, embed in ((MODEL_TEXT, False), (MODEL_EMBED, True)):
+        try:
+            log(f"Model {model} loaded in {load_model(CLIENT, model, args.keep_alive, embed):.2f}s (keep_alive={args.keep_alive})")
+        except Exception as e: log(f"Load {model} failed: {e}")
     task_chat(0)
     
+    scenarios = [("CHAT_LIGHT", task_chat), ("CODING_HEAVY", task_coding)]
+    # Opt-in: tiap user menjalankan --turns request, jauh lebih lama dari skenario lain
+    if args.multi_turn:
+        scenarios.append(("CHAT_MULTI_TURN", task_multi_turn))
+    if build_rag_index(args):
+        scenarios.append(("RAG_FLOW", task_rag))
+
+    telemetry = start_telemetry(args, OLLAMA_API)
+    # Sweep tidak tahu jumlah level di depan: hanya ETA per batch
+    live = start_live(args, None if args.sweep else sum(USER_LEVELS) * len(scenarios))
     all_stats = []
-    for users in USER_LEVELS:
-        all_stats.append(run_scenario("CHAT_LIGHT", task_chat, users))
-        time.sleep(2)
-        
-        all_stats.append(run_scenario("CODING_HEAVY", task_coding, users))
-        time.sleep(2)
-        
-        all_stats.append(run_scenario("RAG_FLOW", task_rag_sim, users))
-        time.sleep(2)
-
-    print_summary_table(all_stats, start_time)
+    if args.sweep:
+        # Cari concurrency maksimum per skenario, bukan USER_LEVELS tetap
+        sweeps = []
+        for name, func in scenarios:
+            sweeps.append(sweep_concurrency(name, func, sink, max_users=args.max_users, max_status=args.max_status,
+                                            slo_p95=args.slo_p95, cooldown=2, telemetry=telemetry, live=live))
+            all_stats.extend(sweeps[-1]['runs'])
+            for stat in sweeps[-1]['runs']:
+                report_turns(stat, turn_sink)
+    else:
+        for users in USER_LEVELS:
+            for name, func in scenarios:
+                stat = run_scenario(name, func, users, sink, telemetry, live)
+                report_turns(stat, turn_sink)
+                all_stats.append(stat)
+                time.sleep(2)
+    if telemetry:
+        telemetry.stop()
+    if live:
+        live.stop()
+
+    print_summary_table(all_stats, "BENCHMARK TEXT SUITE", run_config(start_time, args),
+                        extra_columns=[("Prompt T/s", "prompt_tps"), ("Embed(s)", "embed_time"),
+                                       ("Prefill(s)", "prompt_eval_time"), ("Decode(s)", "eval_time")])
+    if args.sweep:
+        print_sweep_summary(sweeps)
+    if run:
+        log(f"Run {run.run_id} appended to result store {args.store}")
+    print_connection_stats(CLIENT.connection_stats())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
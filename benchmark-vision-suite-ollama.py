@@ -1,24 +1,41 @@
-import requests
 import time
-import concurrent.futures
-import statistics
-import csv
-import os
 import argparse
+import statistics
 from datetime import datetime
 
+from ollama_bench import (
+    CsvSink, MultiSink, OllamaClient, SCENARIO_FIELDS, add_pool_arguments, get_metrics, log, print_config,
+    print_connection_stats, print_summary_table, run_scenario,
+)
+from ollama_bench.images import FORMATS, ImageCache, available_formats, parse_resolution
+from ollama_bench.residency import add_keep_alive_argument, load_model
+from ollama_bench.store import add_store_arguments, open_run
+from ollama_bench.live import add_live_arguments, start_live
+from ollama_bench.telemetry import add_telemetry_arguments, start_telemetry
+from ollama_bench.sweep import add_sweep_arguments, print_sweep_summary, sweep_concurrency
+
 # --- KONFIGURASI DEFAULT ---
 # Pastikan nama model sesuai dengan yang berhasil tadi
 DEFAULT_MODEL_VISION = "qwen3-vl:30b"
 DEFAULT_OLLAMA_API = "http://localhost:11434/api"
+# Timeout diperpanjang ke 300s agar antrian 12 user tidak putus
+REQUEST_TIMEOUT_S = 300
 
 MODEL_VISION = DEFAULT_MODEL_VISION
 OLLAMA_API = DEFAULT_OLLAMA_API
+CLIENT = None
 OUTPUT_FILE = f"vision_benchmark_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
 
 # Level Concurrency
 # Kita tes beban bertahap dari 1 sampai 12 user
 USER_LEVELS = [1, 4, 8, 12]
+# Batas atas untuk --sweep (pencarian concurrency otomatis)
+MAX_SWEEP_USERS = 64
+
+# Matriks --matrix: resolusi x jumlah gambar per request x format
+MATRIX_RESOLUTIONS = ["512", "720p", "1080p"]
+MATRIX_IMAGE_COUNTS = [1, 2, 4]
+MATRIX_PROMPT = "Read all text in these images and summarize the chart."
 
 # --- SAFE IMAGE (JPEG 32x32) ---
 # Menggunakan teknik chunking agar string tidak rusak saat copy-paste
@@ -38,197 +55,196 @@ img_parts = [
 ]
 TEST_IMAGE_B64 = "".join(img_parts)
 
-def log(msg):
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
-
-def get_vision_metrics(res_json):
-    """Ekstrak metrik khusus vision."""
-    try:
-        eval_count = res_json.get('eval_count', 0)
-        eval_dur_ns = res_json.get('eval_duration', 0)
-        # Prompt eval duration = Waktu memproses gambar (Vision Encoder)
-        image_process_dur_ns = res_json.get('prompt_eval_duration', 0)
-        total_dur_ns = res_json.get('total_duration', 0)
-        
-        gen_tps = 0
-        if eval_dur_ns > 0:
-            gen_tps = eval_count / (eval_dur_ns / 1e9)
-            
-        return {
-            "gen_tps": gen_tps,
-            "image_process_time": image_process_dur_ns / 1e9,
-            "total_latency": total_dur_ns / 1e9,
-            "tokens_out": eval_count
-        }
-    except:
-        return None
-
 def task_vqa_standard(user_id):
     """Skenario: Visual QA"""
     payload = {
         "model": MODEL_VISION,
         "prompt": "Describe this image.",
         "images": [TEST_IMAGE_B64],
-        "stream": False,
         "options": {"num_predict": 64}
     }
     try:
-        # Timeout diperpanjang ke 300s agar antrian 12 user tidak putus
-        res = requests.post(f"{OLLAMA_API}/generate", json=payload, timeout=300)
-        if res.status_code == 200: return get_vision_metrics(res.json())
-        else: log(f"Err {user_id}: HTTP {res.status_code}")
+        # prompt_eval_time = waktu Vision Encoder memproses gambar
+        return get_metrics(CLIENT.generate(payload))
     except Exception as e: log(f"Err {user_id}: {e}")
     return None
 
-def run_scenario(name, func, concurrency):
-    log(f"--- RUNNING VISION TEST: {name} ({concurrency} Users) ---")
-    results = []
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
-        futures = [executor.submit(func, i) for i in range(concurrency)]
-        for f in concurrent.futures.as_completed(futures):
-            if f.result(): results.append(f.result())
-            
-    if not results:
-        log("No results captured.")
-        return {
-            "scenario": name,
-            "users": concurrency,
-            "success": 0,
-            "fail": concurrency,
-            "avg_tps": 0.0,
-            "avg_img_proc": 0.0,
-            "sys_throughput": 0.0
+def make_matrix_task(images):
+    """Task untuk satu sel matriks; `images` sudah berupa base64 jadi (encode tidak ikut terukur)."""
+    def task(user_id):
+        payload = {
+            "model": MODEL_VISION,
+            "prompt": MATRIX_PROMPT,
+            "images": images,
+            "options": {"num_predict": 64},
         }
-
-    # Agregasi
-    success_count = len(results)
-    fail_count = concurrency - success_count
-
-    avg_gen_tps = statistics.mean([r['gen_tps'] for r in results])
-    avg_img_time = statistics.mean([r['image_process_time'] for r in results])
-    avg_latency = statistics.mean([r['total_latency'] for r in results])
-    
-    model_speeds = [r['gen_tps'] for r in results]
-    min_tps = min(model_speeds) if model_speeds else 0
-    max_tps = max(model_speeds) if model_speeds else 0
-
-    total_tokens = sum([r['tokens_out'] for r in results])
-    max_duration = max([r['total_latency'] for r in results])
-    sys_throughput = total_tokens / max_duration if max_duration > 0 else 0
-
-    print(f"   > Success/Fail         : {success_count}/{fail_count}")
-    print(f"   > Avg Gen Speed (User) : {avg_gen_tps:.2f} t/s")
-    print(f"   > Avg Image Proc Time  : {avg_img_time:.2f} s")
-    print(f"   > Avg Total Latency    : {avg_latency:.2f} s")
-    print(f"   > System Throughput    : {sys_throughput:.2f} t/s")
-    print("-" * 60)
-    
-    # Save CSV
-    write_header = not os.path.exists(OUTPUT_FILE)
-    with open(OUTPUT_FILE, 'a', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=['time', 'scenario', 'users', 'successes', 'failures', 'avg_tps', 'min_tps', 'max_tps', 'img_proc_time', 'latency', 'sys_throughput', 'total_tokens'])
-        if write_header: writer.writeheader()
-        writer.writerow({
-            'time': datetime.now().strftime('%H:%M:%S'),
-            'scenario': name,
-            'users': concurrency,
-            'successes': success_count,
-            'failures': fail_count,
-            'avg_tps': avg_gen_tps,
-            "min_tps": min_tps,
-            "max_tps": max_tps,
-            'img_proc_time': avg_img_time,
-            'latency': avg_latency,
-            'sys_throughput': sys_throughput,
-            "total_tokens": total_tokens
-        })
-
-    return {
-        "scenario": name,
-        "users": concurrency,
-        "success": success_count,
-        "fail": fail_count,
-        "avg_tps": avg_gen_tps,
-        "avg_img_proc": avg_img_time,
-        "sys_throughput": sys_throughput
+        try:
+            return get_metrics(CLIENT.generate(payload))
+        except Exception as e: log(f"Err {user_id}: {e}")
+        return None
+    return task
+
+def build_matrix(args, cache):
+    """Daftar sel matriks dengan payload yang sudah di-encode sebelum pengukuran dimulai."""
+    formats = available_formats(args.formats)
+    for fmt in set(args.formats) - set(formats):
+        log(f"Format {fmt.upper()} skipped: Pillow is not installed (pip install pillow)")
+    cells = []
+    start = time.perf_counter()
+    for res in args.resolutions:
+        width, height = parse_resolution(res)
+        for fmt in formats:
+            for count in args.images_per_request:
+                images = cache.images(width, height, fmt, count)
+                cells.append({
+                    "name": f"VQA_{fmt.upper()}_{width}x{height}_x{count}",
+                    "format": fmt,
+                    "resolution": f"{width}x{height}",
+                    "images": count,
+                    "pixels": width * height * count,
+                    "payload_kb": sum(len(img) for img in images) / 1024,
+                    "task": make_matrix_task(images),
+                })
+    log(f"Pre-encoded {len(cache.payloads)} images for {len(cells)} cells in {time.perf_counter() - start:.2f}s")
+    return cells
+
+def fit_line(xs, ys):
+    """Regresi linear sederhana -> (slope, intercept); None kalau x tidak bervariasi."""
+    mean_x, mean_y = statistics.mean(xs), statistics.mean(ys)
+    var = sum((x - mean_x) ** 2 for x in xs)
+    if var == 0:
+        return None
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var
+    return slope, mean_y - slope * mean_x
+
+def print_matrix_table(cells):
+    width = 124
+    print("\n" + "=" * width)
+    print(f"{'VISION MATRIX - ENCODER TIME vs PIXEL COUNT (median per cell)':^{width}}")
+    print("=" * width)
+    print(f"{'Scenario':<26} | {'Format':<6} | {'Resolution':<10} | {'Imgs':<4} | {'MPix/req':<8} | {'Payload KB':<10} | "
+          f"{'Prompt Tok':<10} | {'Encoder(s)':<10} | {'ms/MPix':<8} | {'Decode T/s':<10}")
+    print("-" * width)
+    points = {}
+    for c in cells:
+        results = c["results"]
+        if not results:
+            print(f"{c['name']:<26} | {c['format']:<6} | {c['resolution']:<10} | {c['images']:<4} | {'-':<8} | all requests failed")
+            continue
+        mpix = c["pixels"] / 1e6
+        encoder = statistics.median(r["prompt_eval_time"] for r in results)
+        points.setdefault(c["format"], []).append((mpix, encoder))
+        print(f"{c['name']:<26} | {c['format']:<6} | {c['resolution']:<10} | {c['images']:<4} | {mpix:<8.2f} | "
+              f"{c['payload_kb']:<10.0f} | {statistics.median(r['tokens_in'] for r in results):<10.0f} | {encoder:<10.3f} | "
+              f"{encoder * 1000 / mpix:<8.0f} | {statistics.median(r['gen_tps'] for r in results):<10.2f}")
+    print("=" * width)
+    # Garis tren per format: biaya tetap (intercept) + biaya per megapiksel (slope)
+    for fmt, pts in points.items():
+        fit = fit_line([p[0] for p in pts], [p[1] for p in pts])
+        if fit:
+            print(f" {fmt.upper():<5} encoder ~ {fit[1] * 1000:.0f} ms + {fit[0] * 1000:.0f} ms per megapixel")
+    print(" Encoder(s) = prompt_eval_duration (image encoding + short text prompt); payloads were encoded before timing.\n")
+
+def run_config(start_time, args):
+    config = {
+        "Date Running Test": start_time,
+        "Model Vision": MODEL_VISION,
+        "API Endpoint": OLLAMA_API,
     }
-
-def print_summary_table(all_stats, start_time):
-    # Print Configuration Block
-    print("\n" + "=" * 95)
-    print(f"{'BENCHMARK VISION SUITE - CONFIGURATION':^95}")
-    print("=" * 95)
-    print(f" Date Running Test: {start_time}")
-    print(f" Model Vision     : {MODEL_VISION}")
-    print(f" API Endpoint     : {OLLAMA_API}")
-    print(f" Concurrency      : {USER_LEVELS}")
-    print("=" * 95)
-
-    print("\n" + "="*95)
-    print(f"{'FINAL VISION SUMMARY REPORT':^95}")
-    print("="*95)
-    print(f"{'Scenario':<20} | {'Users':<6} | {'Pass':<5} | {'Fail':<5} | {'Avg TPS':<8} | {'Img Proc(s)':<12} | {'Sys T/s':<8} | {'Status':<10}")
-    print("-" * 95)
-    
-    for stat in all_stats:
-        if not stat: continue
-        
-        # Color codes
-        GREEN = "\033[92m"
-        YELLOW = "\033[93m"
-        RED = "\033[91m"
-        RESET = "\033[0m"
-        
-        fail = stat['fail']
-        users = stat['users']
-        
-        status = f"{GREEN}PASS{RESET}"
-        if fail > 0:
-            status = f"{YELLOW}WARN{RESET}"
-        if fail > (users * 0.2) and users > 1:
-            status = f"{RED}FAIL{RESET}"
-        if fail == users:
-            status = f"{RED}CRITICAL{RESET}"
-            
-        print(f"{stat['scenario']:<20} | {stat['users']:<6} | {stat['success']:<5} | {stat['fail']:<5} | {stat['avg_tps']:<8.2f} | {stat['avg_img_proc']:<12.2f} | {stat['sys_throughput']:<8.2f} | {status}")
-    print("="*95 + "\n")
+    if args.matrix:
+        config["Matrix"] = (f"{args.resolutions} x {args.images_per_request} images x {args.formats}, "
+                            f"{args.matrix_users} users, {args.repeat} runs per cell")
+    else:
+        config["Concurrency"] = (f"adaptive sweep up to {args.max_users} users (SLO p95: {args.slo_p95 or '-'}s, max status: {args.max_status})"
+                                 if args.sweep else USER_LEVELS)
+    return config
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description="Benchmark Vision Suite for Ollama")
     parser.add_argument("-m", "--model", default=DEFAULT_MODEL_VISION, help="Vision model name (default: %(default)s)")
     parser.add_argument("--url", default=DEFAULT_OLLAMA_API, help="Ollama API URL (default: %(default)s)")
+    add_pool_arguments(parser, default_size=max(USER_LEVELS))
+    add_sweep_arguments(parser, default_max=MAX_SWEEP_USERS)
+    add_keep_alive_argument(parser, default="30m")
+    add_telemetry_arguments(parser)
+    add_live_arguments(parser)
+    add_store_arguments(parser)
+    matrix = parser.add_argument_group("scenario matrix")
+    matrix.add_argument("--matrix", action="store_true",
+                        help="Run the resolution x images-per-request x format matrix instead of the concurrency levels")
+    matrix.add_argument("--resolutions", nargs="+", default=MATRIX_RESOLUTIONS,
+                        help="Presets (256, 512, 720p, 1080p, 1440p, 4k) or WxH (default: %(default)s)")
+    matrix.add_argument("--images-per-request", type=int, nargs="+", default=MATRIX_IMAGE_COUNTS,
+                        help="Images attached to each request (default: %(default)s)")
+    matrix.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS,
+                        help="Image encodings; JPEG needs Pillow (default: %(default)s)")
+    matrix.add_argument("--matrix-users", type=int, default=1,
+                        help="Concurrent requests per cell; 1 isolates the encoder (default: %(default)s)")
+    matrix.add_argument("--repeat", type=int, default=3, help="Runs per matrix cell (default: %(default)s)")
     return parser.parse_args()
 
 def main():
-    global MODEL_VISION, OLLAMA_API
+    global MODEL_VISION, OLLAMA_API, CLIENT
     args = parse_arguments()
     MODEL_VISION = args.model
     OLLAMA_API = args.url
+    pool_size = max(args.pool_size, args.max_users) if args.sweep else args.pool_size
+    CLIENT = OllamaClient(OLLAMA_API, timeout=REQUEST_TIMEOUT_S, pool_size=pool_size, pool_per_host=args.pool_per_host,
+                          keep_alive=args.keep_alive)
+    run = open_run(args, "benchmark-vision-suite-ollama", CLIENT, MODEL_VISION)
+    sink = MultiSink(CsvSink(OUTPUT_FILE, SCENARIO_FIELDS), run)
 
     # Detailed Header
     start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    print("=" * 60)
-    print(f"{'BENCHMARK VISION SUITE - CONFIGURATION':^60}")
-    print("=" * 60)
-    print(f" Date Running Test: {start_time}")
-    print(f" Model Vision : {MODEL_VISION}")
-    print(f" API Endpoint : {OLLAMA_API}")
-    print(f" Concurrency  : {USER_LEVELS}")
-    print("=" * 60)
+    print_config("BENCHMARK VISION SUITE - CONFIGURATION", run_config(start_time, args))
     print("")
 
     # Warmup
     print("Warming up VRAM...")
+    try:
+        log(f"Model {MODEL_VISION} loaded in {load_model(CLIENT, MODEL_VISION, args.keep_alive):.2f}s (keep_alive={args.keep_alive})")
+    except Exception as e: log(f"Load {MODEL_VISION} failed: {e}")
     task_vqa_standard(0) 
     time.sleep(2)
     
+    telemetry = start_telemetry(args, OLLAMA_API)
+    live = start_live(args, None if args.sweep else sum(USER_LEVELS))
     all_stats = []
-    for users in USER_LEVELS:
-        all_stats.append(run_scenario("VQA_STANDARD", task_vqa_standard, users))
-        time.sleep(3)
-
-    print_summary_table(all_stats, start_time)
+    if args.matrix:
+        cells = build_matrix(args, ImageCache())
+        if live:
+            live.plan(len(cells) * args.repeat * args.matrix_users)
+        for cell in cells:
+            cell["results"] = []
+            for _ in range(args.repeat):
+                stat = run_scenario(cell["name"], cell["task"], args.matrix_users, sink, telemetry, live)
+                cell["results"].extend(stat["results"])
+                all_stats.append(stat)
+                time.sleep(1)
+    elif args.sweep:
+        # Cari concurrency maksimum, bukan USER_LEVELS tetap
+        sweeps = [sweep_concurrency("VQA_STANDARD", task_vqa_standard, sink, max_users=args.max_users,
+                                    max_status=args.max_status, slo_p95=args.slo_p95, cooldown=3,
+                                    telemetry=telemetry, live=live)]
+        all_stats.extend(sweeps[0]['runs'])
+    else:
+        for users in USER_LEVELS:
+            all_stats.append(run_scenario("VQA_STANDARD", task_vqa_standard, users, sink, telemetry, live))
+            time.sleep(3)
+    if telemetry:
+        telemetry.stop()
+    if live:
+        live.stop()
+
+    print_summary_table(all_stats, "BENCHMARK VISION SUITE", run_config(start_time, args),
+                        extra_columns=[("Img Proc(s)", "prompt_eval_time")])
+    if args.matrix:
+        print_matrix_table(cells)
+    elif args.sweep:
+        print_sweep_summary(sweeps)
+    if run:
+        log(f"Run {run.run_id} appended to result store {args.store}")
+    print_connection_stats(CLIENT.connection_stats())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
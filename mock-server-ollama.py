@@ -0,0 +1,56 @@
+import argparse
+
+from ollama_bench.mock_server import MockOllama, MockOllamaServer
+
+# Server tiruan Ollama untuk menguji harness benchmark tanpa GPU / model asli.
+# Contoh: python mock-server-ollama.py --port 11435 --token-rate 40 --parallel 4
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Mock Ollama server for hardware-free benchmark runs")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=11434, help="Port (default: %(default)s)")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="Decode tokens/sec per request slot (default: %(default)s)")
+    parser.add_argument("--prefill-rate", type=float, default=1000.0, help="Prompt tokens/sec (default: %(default)s)")
+    parser.add_argument("--embed-rate", type=float, default=5000.0, help="Embedding input tokens/sec (default: %(default)s)")
+    parser.add_argument("--parallel", type=int, default=4, help="Parallel slots per model, like OLLAMA_NUM_PARALLEL (default: %(default)s)")
+    parser.add_argument("--max-queue", type=int, default=512, help="Waiting requests before HTTP 503, like OLLAMA_MAX_QUEUE (default: %(default)s)")
+    parser.add_argument("--max-loaded", type=int, default=2, help="Resident models, like OLLAMA_MAX_LOADED_MODELS (default: %(default)s)")
+    parser.add_argument("--load-time", type=float, default=2.0, help="Seconds to load a model that is not resident (default: %(default)s)")
+    parser.add_argument("--default-tokens", type=int, default=128, help="Tokens generated when num_predict is unset or -1 (default: %(default)s)")
+    parser.add_argument("--image-tokens", type=int, default=256, help="Prompt tokens charged per image (default: %(default)s)")
+    parser.add_argument("--contention", type=float, default=0.0,
+                        help="Per-slot slowdown per extra active request: rate / (1 + c*(active-1)) (default: %(default)s)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Probability of an injected HTTP 500 (default: %(default)s)")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Per-token probability of a decode stall (default: %(default)s)")
+    parser.add_argument("--stall-time", type=float, default=1.0, help="Stall length in seconds (default: %(default)s)")
+    parser.add_argument("--embed-dim", type=int, default=384, help="Embedding dimension (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for failure/stall injection")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every HTTP request")
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+    mock = MockOllama(
+        token_rate=args.token_rate, prefill_rate=args.prefill_rate, embed_rate=args.embed_rate,
+        parallel=args.parallel, max_queue=args.max_queue, max_loaded=args.max_loaded,
+        load_time=args.load_time, default_tokens=args.default_tokens, image_tokens=args.image_tokens,
+        contention=args.contention, fail_rate=args.fail_rate, stall_rate=args.stall_rate,
+        stall_time=args.stall_time, embed_dim=args.embed_dim, seed=args.seed, verbose=args.verbose,
+    )
+    server = MockOllamaServer((args.host, args.port), mock)
+    print(f"--- MOCK OLLAMA SERVER ---")
+    print(f" Listening        : http://{args.host}:{args.port}/api")
+    print(f" Decode rate      : {args.token_rate} t/s per slot x {args.parallel} slots")
+    print(f" Prefill rate     : {args.prefill_rate} t/s")
+    print(f" Load time        : {args.load_time}s (max loaded: {args.max_loaded})")
+    print(f" Fail rate        : {args.fail_rate}")
+    print("--------------------------")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping mock server.")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""Shared building blocks for the Ollama benchmark scripts.
+
+client  - OllamaClient / AsyncOllamaClient for the REST API
+metrics - metric extraction from Ollama responses (get_metrics, stream_stats)
+stats   - client-side batch window and latency histogram
+runner  - closed-loop scenario runner and console reports
+sink    - CSV result sink (MultiSink to also feed the result store)
+loadgen - asyncio load generator (burst and open-loop)
+"""
+from .client import AsyncOllamaClient, OllamaClient, OllamaError, add_pool_arguments, api_base, print_connection_stats
+from .metrics import STALL_THRESHOLD_S, calculate_tps, collect_stream, get_embed_metrics, get_metrics, stream_stats
+from .runner import SCENARIO_FIELDS, log, print_config, print_summary_table, run_scenario, scenario_status
+from .sink import CsvSink, MultiSink
+from .stats import (
+    PERCENTILES, BatchStats, LatencyHistogram, bootstrap_ci, coefficient_of_variation, reject_outliers, timed,
+)
+
+__all__ = [
+    "AsyncOllamaClient", "OllamaClient", "OllamaError", "add_pool_arguments", "api_base", "print_connection_stats",
+    "STALL_THRESHOLD_S", "calculate_tps", "collect_stream", "get_embed_metrics", "get_metrics",
+    "stream_stats",
+    "SCENARIO_FIELDS", "log", "print_config", "print_summary_table", "run_scenario", "scenario_status",
+    "CsvSink", "MultiSink",
+    "PERCENTILES", "BatchStats", "LatencyHistogram", "bootstrap_ci", "coefficient_of_variation",
+    "reject_outliers", "timed",
+]
@@ -0,0 +1,128 @@
+"""Client-side load balancing over several Ollama replicas.
+
+EndpointPool opens one pooled AsyncOllamaClient per backend and picks a
+backend for every request with one of the policies below. The load
+generator treats it like a single client; each result is tagged with the
+backend that served it, so the report can break throughput and latency
+down per replica and show how evenly the policy spread the load.
+
+    round-robin      backends in turn
+    random           uniform random choice
+    least-in-flight  backend with the fewest outstanding requests (ties in turn)
+    p2c              power of two choices: the less busy of two random backends
+"""
+import random
+import statistics
+
+from .client import AsyncOllamaClient, api_base, connection_summary
+from .metrics import percentile
+
+POLICIES = ["round-robin", "random", "least-in-flight", "p2c"]
+
+
+class Backend:
+    def __init__(self, url, client):
+        self.name = api_base(url)
+        self.client = client
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+
+class EndpointPool:
+    """Pengganti AsyncOllamaClient untuk beberapa endpoint; pakai ``async with``."""
+
+    def __init__(self, urls, policy="round-robin", timeout=None, limit=100, limit_per_host=0, seed=None):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown policy '{policy}' (choose from {', '.join(POLICIES)})")
+        if not urls:
+            raise ValueError("at least one endpoint is required")
+        kwargs = {"limit": limit, "limit_per_host": limit_per_host}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        self.backends = [Backend(url, AsyncOllamaClient(url, **kwargs)) for url in urls]
+        self.policy = policy
+        self.rng = random.Random(seed)
+        self.next = 0
+
+    async def __aenter__(self):
+        for backend in self.backends:
+            await backend.client.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        for backend in self.backends:
+            await backend.client.__aexit__(*exc)
+
+    def _in_turn(self):
+        """Urutan backend mulai dari giliran berikutnya (round-robin / pemecah seri)."""
+        start, self.next = self.next, (self.next + 1) % len(self.backends)
+        return self.backends[start:] + self.backends[:start]
+
+    def pick(self):
+        if self.policy == "random":
+            return self.rng.choice(self.backends)
+        if self.policy == "least-in-flight":
+            return min(self._in_turn(), key=lambda b: b.in_flight)
+        if self.policy == "p2c" and len(self.backends) > 1:
+            a, b = self.rng.sample(self.backends, 2)
+            return a if a.in_flight <= b.in_flight else b
+        return self._in_turn()[0]
+
+    def acquire(self):
+        # Event loop asyncio berjalan di satu thread: counter in-flight tidak perlu lock
+        backend = self.pick()
+        backend.in_flight += 1
+        backend.peak_in_flight = max(backend.peak_in_flight, backend.in_flight)
+        return backend
+
+    def release(self, backend):
+        backend.in_flight -= 1
+
+    def connection_stats(self):
+        per_backend = [b.client.connection_stats() for b in self.backends]
+        stats = connection_summary(sum(s["requests"] for s in per_backend),
+                                   sum(s["new_connections"] for s in per_backend))
+        stats["backends"] = {b.name: {"peak_in_flight": b.peak_in_flight} for b in self.backends}
+        return stats
+
+
+def imbalance(counts):
+    """(max/mean, koefisien variasi) jumlah request per backend; 1.0 / 0.0 = rata sempurna."""
+    if not counts or not sum(counts):
+        return 1.0, 0.0
+    mean = statistics.mean(counts)
+    cv = statistics.pstdev(counts) / mean if len(counts) > 1 else 0.0
+    return max(counts) / mean, cv
+
+
+def print_backend_table(results, policy, wall_time, backends=None):
+    """Throughput dan latency per backend, plus seberapa rata policy membagi beban.
+
+    wall_time: jendela batch bersama, sehingga Tok/s semua backend dijumlah = throughput agregat.
+    backends: dict dari EndpointPool.connection_stats()['backends'] (puncak in-flight), opsional.
+    """
+    names = list(backends or {})
+    names += sorted({r['backend'] for r in results if r.get('backend')} - set(names))
+    width = 104
+    print("\n" + "=" * width)
+    print(f" BACKENDS ({len(names)}, policy {policy})")
+    print("=" * width)
+    print(f"{'Backend':<36} | {'Requests':<8} | {'Share':<6} | {'Fail':<5} | {'Tok/s':<9} | {'Avg t/s':<8} | "
+          f"{'p50 (s)':<7} | {'p95 (s)':<7} | Peak")
+    print("-" * width)
+    counts = []
+    for name in names:
+        rows = [r for r in results if r.get('backend') == name]
+        ok = [r for r in rows if r['success']]
+        latencies = [r['duration'] for r in ok]
+        tokens = sum(r.get('tokens', 0) for r in ok)
+        counts.append(len(rows))
+        peak = (backends or {}).get(name, {}).get("peak_in_flight", "-")
+        print(f"{name[-36:]:<36} | {len(rows):<8} | {len(rows) / len(results) if results else 0.0:<6.1%} | "
+              f"{len(rows) - len(ok):<5} | {tokens / wall_time if wall_time > 0 else 0.0:<9.1f} | "
+              f"{statistics.mean(r['tps'] for r in ok) if ok else 0.0:<8.1f} | "
+              f"{percentile(latencies, 50):<7.2f} | {percentile(latencies, 95):<7.2f} | {peak}")
+    print("-" * width)
+    ratio, cv = imbalance(counts)
+    print(f" Load imbalance : max/mean {ratio:.2f} (1.00 = even), CV {cv:.2f} of requests per backend")
+    print("=" * width)
@@ -0,0 +1,232 @@
+"""HTTP clients for the Ollama REST API.
+
+OllamaClient is the blocking client used by the suites (one request per
+worker thread); AsyncOllamaClient is the aiohttp-based client used by the
+load generator. Both take the API base (``http://host:11434/api``) and also
+accept a full endpoint URL such as ``.../api/generate``.
+
+Both clients keep a pool of keep-alive connections, so the TCP handshake is
+paid once per connection instead of once per request, and both can report
+how many requests reused an existing connection (connection_stats()).
+"""
+import json
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+DEFAULT_API = "http://localhost:11434/api"
+DEFAULT_TIMEOUT_S = 300
+
+ENDPOINTS = ("generate", "chat", "embed", "embeddings")
+
+# Jumlah host berbeda yang pool-nya disimpan oleh satu OllamaClient
+POOL_HOSTS = 10
+
+
+class OllamaError(RuntimeError):
+    """Error reported by the server: non-200 status or an 'error' field in the body."""
+
+
+def api_base(url):
+    """Normalisasi URL: terima '.../api' maupun '.../api/generate'."""
+    url = url.rstrip("/")
+    for endpoint in ENDPOINTS:
+        if url.endswith("/" + endpoint):
+            return url[:-len(endpoint) - 1]
+    return url
+
+
+def add_pool_arguments(parser, default_size):
+    """Tambahkan opsi --pool-size / --pool-per-host ke argparse parser sebuah script."""
+    parser.add_argument("--pool-size", type=int, default=default_size,
+                        help="Max pooled keep-alive connections (default: %(default)s)")
+    parser.add_argument("--pool-per-host", type=int, default=0,
+                        help="Max connections per host; requests wait for a free one (default: same as --pool-size)")
+
+
+def connection_summary(requests_sent, new_connections):
+    reused = max(0, requests_sent - new_connections)
+    return {
+        "requests": requests_sent,
+        "new_connections": new_connections,
+        "reused_connections": reused,
+        "reuse_ratio": reused / requests_sent if requests_sent else 0.0,
+    }
+
+
+def print_connection_stats(stats):
+    """Cetak hasil connection_stats() dari OllamaClient / AsyncOllamaClient."""
+    print(f" Connection Pool  : {stats['requests']} requests, {stats['new_connections']} new connections, "
+          f"{stats['reused_connections']} reused ({stats['reuse_ratio'] * 100:.1f}%)")
+
+
+def _check_chunk(chunk):
+    if chunk.get("error"):
+        raise OllamaError(chunk["error"])
+    return chunk
+
+
+class OllamaClient:
+    """Blocking client (requests) for /api/generate, /api/chat and the embedding endpoints.
+
+    pool_size is the number of keep-alive connections kept per host; set it to
+    at least the number of worker threads. pool_per_host, when given, is a hard
+    cap: extra threads wait for a free connection instead of opening a new one.
+    keep_alive, when given, is sent with every request that does not set its
+    own, so models stay pinned in memory for the whole benchmark.
+    """
+
+    def __init__(self, base_url=DEFAULT_API, timeout=DEFAULT_TIMEOUT_S, pool_size=32, pool_per_host=0,
+                 keep_alive=None):
+        self.base_url = api_base(base_url)
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.adapter = HTTPAdapter(
+            pool_connections=POOL_HOSTS,
+            pool_maxsize=pool_per_host or pool_size,
+            pool_block=bool(pool_per_host),
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+    def connection_stats(self):
+        """Jumlah request vs koneksi TCP baru di semua host pool milik client ini."""
+        pools = self.adapter.poolmanager.pools
+        sent = new = 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None: continue
+            sent += pool.num_requests
+            new += pool.num_connections
+        return connection_summary(sent, new)
+
+    def close(self):
+        self.session.close()
+
+    def url(self, endpoint):
+        return f"{self.base_url}/{endpoint}"
+
+    def _post(self, endpoint, payload, stream=False):
+        if self.keep_alive is not None and "keep_alive" not in payload:
+            payload = dict(payload, keep_alive=self.keep_alive)
+        res = self.session.post(self.url(endpoint), json=payload, timeout=self.timeout, stream=stream)
+        if res.status_code != 200:
+            body = res.text[:200]
+            res.close()
+            raise OllamaError(f"HTTP {res.status_code}: {body}")
+        return res
+
+    def _stream(self, endpoint, payload):
+        with self._post(endpoint, dict(payload, stream=True), stream=True) as res:
+            # Setiap baris NDJSON berisi satu potongan token
+            for line in res.iter_lines():
+                if not line: continue
+                chunk = _check_chunk(json.loads(line))
+                yield chunk
+                if chunk.get("done"):
+                    return
+
+    def get(self, endpoint):
+        res = self.session.get(self.url(endpoint), timeout=self.timeout)
+        if res.status_code != 200:
+            raise OllamaError(f"HTTP {res.status_code}: {res.text[:200]}")
+        return res.json()
+
+    def generate(self, payload):
+        return _check_chunk(self._post("generate", dict(payload, stream=False)).json())
+
+    def generate_stream(self, payload):
+        """Generator potongan NDJSON dari /api/generate; potongan terakhir punya done=True."""
+        return self._stream("generate", payload)
+
+    def chat(self, payload):
+        return _check_chunk(self._post("chat", dict(payload, stream=False)).json())
+
+    def chat_stream(self, payload):
+        return self._stream("chat", payload)
+
+    def embed(self, model, inputs, **extra):
+        """Batch embedding lewat /api/embed (inputs: string atau list of string)."""
+        return _check_chunk(self._post("embed", dict(extra, model=model, input=inputs)).json())
+
+    def embeddings(self, model, prompt):
+        """Endpoint lama /api/embeddings (satu prompt per request)."""
+        return _check_chunk(self._post("embeddings", {"model": model, "prompt": prompt}).json())
+
+    def show(self, model):
+        """Detail model dari /api/show (model_info berisi arsitektur dan jumlah layer)."""
+        return _check_chunk(self._post("show", {"model": model}).json())
+
+
+class AsyncOllamaClient:
+    """aiohttp client for the load generator; use as ``async with AsyncOllamaClient(...)``.
+
+    ``limit`` caps open connections (0 = unlimited, used by open-loop runs so
+    the client never queues requests on its own); ``limit_per_host`` caps
+    connections to a single host (0 = same as ``limit``).
+    """
+
+    def __init__(self, base_url=DEFAULT_API, timeout=DEFAULT_TIMEOUT_S, limit=100, limit_per_host=0):
+        if aiohttp is None:
+            raise ImportError("AsyncOllamaClient requires aiohttp: pip install aiohttp")
+        self.base_url = api_base(base_url)
+        self.timeout = timeout
+        self.limit = limit
+        self.limit_per_host = limit_per_host or limit
+        self.session = None
+        self.requests_sent = 0
+        self.new_connections = 0
+
+    def url(self, endpoint):
+        return f"{self.base_url}/{endpoint}"
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        trace.on_connection_create_end.append(self._on_connection_create)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=[trace])
+        return self
+
+    async def _on_request_start(self, session, ctx, params):
+        self.requests_sent += 1
+
+    async def _on_connection_create(self, session, ctx, params):
+        self.new_connections += 1
+
+    def connection_stats(self):
+        return connection_summary(self.requests_sent, self.new_connections)
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    async def _post_json(self, endpoint, payload):
+        async with self.session.post(self.url(endpoint), json=payload) as res:
+            if res.status != 200:
+                raise OllamaError(f"HTTP {res.status}: {(await res.text())[:200]}")
+            return _check_chunk(await res.json(content_type=None))
+
+    async def generate(self, payload):
+        return await self._post_json("generate", dict(payload, stream=False))
+
+    async def chat(self, payload):
+        return await self._post_json("chat", dict(payload, stream=False))
+
+    async def generate_stream(self, payload):
+        async with self.session.post(self.url("generate"), json=dict(payload, stream=True)) as res:
+            if res.status != 200:
+                raise OllamaError(f"HTTP {res.status}: {(await res.text())[:200]}")
+            async for line in res.content:
+                line = line.strip()
+                if not line: continue
+                chunk = _check_chunk(json.loads(line))
+                yield chunk
+                if chunk.get("done"):
+                    return
@@ -0,0 +1,174 @@
+"""Regression gate: compare a candidate run against a baseline run.
+
+Runs come from the result store (run id) or from a CSV file. Scenarios are
+matched on (scenario, users), plus the model for multi-model runs. For
+each metric the candidate is a regression when it is worse than the
+baseline by more than the threshold *and*, when both sides have enough
+samples, a Mann-Whitney U test says the difference is significant. Single
+aggregate values (old CSVs, one row per level) fall back to the threshold.
+"""
+import csv
+import statistics
+
+from .residency import model_name
+from .stats import mann_whitney_u
+from .store import sample_values, to_number
+
+HIGHER, LOWER = "higher", "lower"
+
+# (metrik, sumber, arah yang lebih baik)
+COMPARE_METRICS = [
+    ("gen_tps", "samples", HIGHER),
+    ("latency", "samples", LOWER),
+    ("ttft", "samples", LOWER),
+    ("sys_throughput", "scenarios", HIGHER),
+    ("lat_p95", "scenarios", LOWER),
+    ("failures", "scenarios", LOWER),
+]
+DEFAULT_THRESHOLD = 0.05
+DEFAULT_ALPHA = 0.05
+# Minimal sampel per sisi sebelum uji statistik dipakai
+MIN_SAMPLES = 3
+
+
+def load_csv(path):
+    """CSV hasil -> (baris skenario, sample per request) dengan format yang sama seperti di store."""
+    with open(path, newline="") as f:
+        rows = [{k: to_number(v) for k, v in row.items()} for row in csv.DictReader(f)]
+    scenarios, samples = [], []
+    for row in rows:
+        if "img_proc_time" in row:
+            row["prompt_eval_time"] = row.pop("img_proc_time")
+        if "users" in row:
+            scenarios.append(row)
+        else:
+            sample = sample_values(row)
+            sample.update(model=row.get("model"), scenario=row.get("scenario"), users=None)
+            samples.append(sample)
+    return scenarios, samples
+
+
+def load_run(spec, store=None):
+    """Run dari id di result store atau dari path CSV; kembalikan (label, baris skenario, samples)."""
+    if str(spec).isdigit():
+        if store is None:
+            raise ValueError(f"run id {spec} needs a result store")
+        scenarios, samples = store.run_rows(int(spec))
+        if not scenarios and not samples:
+            raise ValueError(f"run {spec} not found or empty in {store.path}")
+        return f"run {spec}", scenarios, samples
+    scenarios, samples = load_csv(spec)
+    return spec, scenarios, samples
+
+
+def row_model(row):
+    """Nama model baris yang dinormalisasi; None jika baris tidak mencatat model."""
+    return model_name(row["model"]) if row.get("model") else None
+
+
+def group_run(scenarios, samples, with_model):
+    """{kunci: {'scenarios': [baris], 'samples': [sample]}}; kunci = (model?, skenario, users)."""
+    groups = {}
+
+    def key(row):
+        base = (row.get("scenario"), row.get("users") or None)
+        return (row_model(row),) + base if with_model else base
+
+    for row in scenarios:
+        groups.setdefault(key(row), {"scenarios": [], "samples": []})["scenarios"].append(row)
+    for row in samples:
+        groups.setdefault(key(row), {"scenarios": [], "samples": []})["samples"].append(row)
+    return groups
+
+
+def sort_key(key):
+    """Urutkan skenario menurut nama lalu users secara numerik (8 sebelum 16)."""
+    return tuple((0, part, "") if isinstance(part, (int, float)) else (1, 0, str(part)) for part in key)
+
+
+def compare_values(base, cand, better, threshold, alpha):
+    """Bandingkan dua kumpulan nilai; kembalikan dict hasil atau None jika data tidak cukup."""
+    if not base or not cand:
+        return None
+    center = statistics.median if len(base) >= MIN_SAMPLES and len(cand) >= MIN_SAMPLES else statistics.mean
+    b, c = center(base), center(cand)
+    if b == 0:
+        change = 0.0 if c == 0 else float("inf") * (1 if c > 0 else -1)
+    else:
+        change = (c - b) / abs(b)
+    worse = change < -threshold if better == HIGHER else change > threshold
+    better_change = change > threshold if better == HIGHER else change < -threshold
+    p_value = None
+    if len(base) >= MIN_SAMPLES and len(cand) >= MIN_SAMPLES:
+        _, p_value = mann_whitney_u(base, cand)
+    significant = p_value is None or p_value < alpha
+    if worse and significant:
+        verdict = "REGRESSION"
+    elif better_change and significant:
+        verdict = "IMPROVED"
+    elif worse or better_change:
+        verdict = "NOISE"  # melewati threshold tapi tidak signifikan
+    else:
+        verdict = "OK"
+    return {"baseline": b, "candidate": c, "change": change, "n_base": len(base), "n_cand": len(cand),
+            "p_value": p_value, "verdict": verdict}
+
+
+def compare_runs(baseline, candidate, threshold=DEFAULT_THRESHOLD, alpha=DEFAULT_ALPHA, metrics=None,
+                 scenario=None):
+    """Bandingkan dua run hasil load_run; kembalikan list baris perbandingan per skenario/users/metrik."""
+    _, base_rows, base_samples = baseline
+    _, cand_rows, cand_samples = candidate
+    models = {row_model(r) for r in base_rows + base_samples}
+    with_model = len(models) > 1
+    base = group_run(base_rows, base_samples, with_model)
+    cand = group_run(cand_rows, cand_samples, with_model)
+    wanted = [m for m in COMPARE_METRICS if metrics is None or m[0] in metrics]
+    results = []
+    for key in sorted(set(base) & set(cand), key=sort_key):
+        if scenario and key[-2] != scenario:
+            continue
+        for metric, source, better in wanted:
+            values = [[row.get(metric) for row in side[key][source]] for side in (base, cand)]
+            values = [[float(v) for v in vs if isinstance(v, (int, float))] for vs in values]
+            result = compare_values(values[0], values[1], better, threshold, alpha)
+            if result:
+                result.update(key=key, metric=metric, better=better)
+                results.append(result)
+    return results, sorted(set(base) ^ set(cand), key=sort_key)
+
+
+def format_key(key):
+    *model, scenario, users = key
+    label = f"{scenario} @ {users}u" if users else str(scenario)
+    return f"{model[0] or '-'} {label}" if model else label
+
+
+def print_comparison(results, unmatched, baseline_label, candidate_label, threshold, alpha):
+    width = 118
+    print("\n" + "=" * width)
+    print(f"{'REGRESSION GATE':^{width}}")
+    print("=" * width)
+    print(f" Baseline  : {baseline_label}")
+    print(f" Candidate : {candidate_label}")
+    print(f" Rule      : worse by more than {threshold:.0%} and p < {alpha} (Mann-Whitney U, n >= {MIN_SAMPLES} per side)")
+    print("-" * width)
+    print(f"{'Scenario':<32} | {'Metric':<14} | {'Baseline':<10} | {'Candidate':<10} | {'Change':<8} | "
+          f"{'n (b/c)':<9} | {'p-value':<8} | {'Verdict'}")
+    print("-" * width)
+    colors = {"REGRESSION": "\033[91m", "IMPROVED": "\033[92m", "NOISE": "\033[93m"}
+    for r in results:
+        p = f"{r['p_value']:.3f}" if r['p_value'] is not None else "-"
+        verdict = r['verdict']
+        colored = f"{colors[verdict]}{verdict}\033[0m" if verdict in colors else verdict
+        n = f"{r['n_base']}/{r['n_cand']}"
+        print(f"{format_key(r['key'])[:32]:<32} | {r['metric']:<14} | {r['baseline']:<10.3f} | {r['candidate']:<10.3f} | "
+              f"{r['change']:<+8.1%} | {n:<9} | {p:<8} | {colored}")
+    print("=" * width)
+    if unmatched:
+        print(f" Not compared (only in one run): {', '.join(format_key(k) for k in unmatched[:10])}"
+              + (" ..." if len(unmatched) > 10 else ""))
+    print(" NOISE = beyond the threshold but not statistically significant; '-' p-value = too few samples, threshold only.")
+    regressions = [r for r in results if r['verdict'] == "REGRESSION"]
+    print(f"\n RESULT: {'FAIL' if regressions else 'PASS'} - {len(regressions)} regression(s) in {len(results)} comparisons\n")
+    return regressions
@@ -0,0 +1,108 @@
+"""Multi-turn /api/chat sessions with a growing history.
+
+Each virtual user opens a conversation and asks follow-up questions; the
+assistant's streamed reply is appended to the history before the next turn,
+so every turn sends the whole conversation again. Per-turn TTFT and decode
+speed show how latency degrades as the context grows.
+"""
+import statistics
+import time
+
+from .metrics import collect_stream, get_metrics, percentile, stream_stats
+from .prompts import CHARS_PER_TOKEN
+
+ROLES = ["IT manager", "backend developer", "security officer", "finance analyst", "support lead", "data engineer"]
+OPENING = ("I work as a {role} (ticket #{user_id}). We are migrating our on-premise file servers to the cloud. "
+           "What should we plan first?")
+FOLLOW_UPS = [
+    "How should we handle permissions and access control during the migration?",
+    "What is a realistic timeline for 40 TB of data over a 1 Gbps link?",
+    "Which risks should we put in the project risk register?",
+    "How do we keep downtime for users under one hour?",
+    "What should the rollback plan look like if the cutover fails?",
+    "How do we verify that no files were lost or corrupted?",
+    "Which costs usually surprise teams after such a migration?",
+    "Summarize the whole plan as a short checklist.",
+]
+
+
+def user_turns(turns, user_id):
+    """Pesan user untuk satu sesi; pembuka unik per user agar prefix cache tidak dibagi antar user."""
+    opening = OPENING.format(role=ROLES[user_id % len(ROLES)], user_id=user_id)
+    follow_ups = [FOLLOW_UPS[(user_id + i) % len(FOLLOW_UPS)] for i in range(max(0, turns - 1))]
+    return [opening] + follow_ups
+
+
+def run_conversation(client, model, turns, user_id=0, options=None):
+    """Jalankan satu sesi chat streaming; kembalikan metrik per turn (get_metrics + turn, ttft, context_tokens)."""
+    messages = []
+    rows = []
+    for turn, question in enumerate(user_turns(turns, user_id), 1):
+        messages.append({"role": "user", "content": question})
+        payload = {"model": model, "messages": messages}
+        if options:
+            payload["options"] = options
+        reply = []
+        start = time.perf_counter()
+        final, token_times = collect_stream(client.chat_stream(payload), reply)
+        m = get_metrics(final)
+        m["turn"] = turn
+        m["ttft"] = stream_stats(start, token_times)["ttft"]
+        # Perkiraan ukuran history yang dikirim (prompt_eval_count hanya menghitung token di luar cache)
+        m["context_tokens"] = sum(len(msg["content"]) for msg in messages) // CHARS_PER_TOKEN
+        rows.append(m)
+        messages.append({"role": "assistant", "content": "".join(reply)})
+    return rows
+
+
+def summarize_session(rows):
+    """Ringkas satu sesi menjadi dict ala get_metrics untuk run_scenario; detail per turn di 'turns'."""
+    return {
+        "gen_tps": statistics.mean(r["gen_tps"] for r in rows),
+        "prompt_tps": statistics.mean(r["prompt_tps"] for r in rows),
+        "prompt_eval_time": statistics.mean(r["prompt_eval_time"] for r in rows),
+        "eval_time": statistics.mean(r["eval_time"] for r in rows),
+        "load_time": max(r["load_time"] for r in rows),
+        "latency": sum(r["latency"] for r in rows),
+        "tokens_out": sum(r["tokens_out"] for r in rows),
+        "tokens_in": sum(r["tokens_in"] for r in rows),
+        "turns": rows,
+    }
+
+
+def per_turn_stats(results):
+    """Gabungkan turn ke-N dari semua sesi yang sukses: TTFT p50/p95, decode t/s, ukuran konteks."""
+    by_turn = {}
+    for session in results:
+        for row in session.get("turns", []):
+            by_turn.setdefault(row["turn"], []).append(row)
+    stats = []
+    for turn in sorted(by_turn):
+        rows = by_turn[turn]
+        ttfts = [r["ttft"] for r in rows]
+        stats.append({
+            "turn": turn,
+            "sessions": len(rows),
+            "context_tokens": statistics.mean(r["context_tokens"] for r in rows),
+            "prompt_tokens": statistics.mean(r["tokens_in"] for r in rows),
+            "prefill_time": statistics.mean(r["prompt_eval_time"] for r in rows),
+            "ttft_p50": percentile(ttfts, 50),
+            "ttft_p95": percentile(ttfts, 95),
+            "decode_tps": statistics.mean(r["gen_tps"] for r in rows),
+        })
+    return stats
+
+
+def print_turn_table(name, users, stats):
+    width = 100
+    print("\n" + "=" * width)
+    print(f"{f'{name} ({users} Users) - PER TURN':^{width}}")
+    print("=" * width)
+    print(f"{'Turn':<5} | {'Sessions':<8} | {'Context~':<9} | {'Evaluated':<9} | {'Prefill(s)':<10} | "
+          f"{'TTFT p50':<9} | {'TTFT p95':<9} | {'Decode T/s':<10}")
+    print("-" * width)
+    for s in stats:
+        print(f"{s['turn']:<5} | {s['sessions']:<8} | {s['context_tokens']:<9.0f} | {s['prompt_tokens']:<9.0f} | "
+              f"{s['prefill_time']:<10.2f} | {s['ttft_p50']:<9.2f} | {s['ttft_p95']:<9.2f} | {s['decode_tps']:<10.2f}")
+    print("=" * width)
+    print(" Context~ = estimated history tokens sent; Evaluated = prompt tokens not served from the KV cache.\n")
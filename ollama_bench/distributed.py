@@ -0,0 +1,264 @@
+"""Coordinator/worker mode for load tests bigger than one client machine.
+
+Workers connect to the coordinator over TCP and exchange JSON lines:
+
+    worker -> coordinator   {"type": "hello", "host", "pid"}
+    coordinator -> worker   {"type": "spec", "worker", "workers", "coordinator_time", "start_at", "spec"}
+    worker -> coordinator   {"type": "sample", "result"}     one per finished request, as it finishes
+    worker -> coordinator   {"type": "done", ...} or {"type": "error", "error"}
+
+Once every expected worker has said hello, all of them receive the same
+scenario spec and a common start time on the coordinator's clock. Each
+worker estimates its clock offset from ``coordinator_time`` (error bounded
+by the one-way network delay) and starts at the same instant. A worker
+takes an even share of the users (burst) or of the arrival rate (open
+loop). Sample times are sent relative to the common start, so the
+coordinator can merge raw samples into one timeline. Percentiles are
+computed on the merged samples, not averaged per worker.
+"""
+import asyncio
+import json
+import os
+import socket
+import time
+
+from .loadgen import QUEUE_SAMPLE_INTERVAL_S, arrival_schedule, run_load_test, run_open_loop
+from .metrics import percentile
+
+DEFAULT_PORT = 7766
+START_DELAY_S = 3.0
+# Batas waktu menunggu semua worker terhubung
+CONNECT_TIMEOUT_S = 120.0
+
+
+def parse_address(address, default_host="127.0.0.1"):
+    """'host:port', ':port' atau 'port' -> (host, port)."""
+    host, _, port = str(address).rpartition(":")
+    return host or default_host, int(port)
+
+
+def split_evenly(total, parts):
+    """Bagi `total` ke `parts` bagian yang selisihnya paling banyak satu."""
+    base, extra = divmod(total, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+def encode(message):
+    return (json.dumps(message) + "\n").encode()
+
+
+async def read_message(reader):
+    line = await reader.readline()
+    return json.loads(line) if line else None
+
+
+async def run_worker(address, verbose=False):
+    """Sambung ke coordinator, jalankan bagian load test milik worker ini dan kirim hasilnya balik."""
+    host, port = parse_address(address)
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(encode({"type": "hello", "host": socket.gethostname(), "pid": os.getpid()}))
+    await writer.drain()
+    message = await read_message(reader)
+    if message is None or message.get("type") != "spec":
+        raise ConnectionError((message or {}).get("error") or "coordinator closed the connection")
+    # Selisih jam coordinator - jam lokal; galat <= latensi satu arah jaringan
+    offset = message["coordinator_time"] - time.time()
+    spec, index, count = message["spec"], message["worker"], message["workers"]
+    print(f"   [Worker {index}] joined {count}-worker run (clock offset {offset * 1000:+.1f} ms)")
+
+    delay = message["start_at"] - offset - time.time()
+    if delay > 0:
+        await asyncio.sleep(delay)
+    start = time.perf_counter()
+    start_error = time.time() + offset - message["start_at"]
+
+    def on_result(result):
+        result = dict(result, end_time=result["end_time"] - start, user_id=f"{index}.{result['user_id']}",
+                      worker=index)
+        writer.write(encode({"type": "sample", "result": result}))
+
+    done = {"type": "done", "start_error": start_error}
+    try:
+        if spec["mode"] == "open":
+            seed = None if spec.get("seed") is None else spec["seed"] + index
+            offsets = arrival_schedule(spec["arrival"], spec["rate"] / count, spec["duration"],
+                                       spec["step_rate"] / count, spec["step_interval"], seed)
+            results, open_start, issue_end, samples, conn_stats = await run_open_loop(
+                spec["model"], spec["url"], offsets, spec["prompt"], verbose=verbose, pool_size=spec["pool_size"],
+                pool_per_host=spec["pool_per_host"], on_result=on_result, policy=spec.get("policy"), seed=seed)
+            shift = open_start - start
+            done.update(issue_end=issue_end + shift, in_flight=[(t + shift, n) for t, n in samples])
+        else:
+            users = split_evenly(spec["users"], count)[index]
+            results, _, conn_stats = await run_load_test(
+                spec["model"], spec["url"], users, spec["prompt"], verbose=verbose,
+                pool_size=spec["pool_size"], pool_per_host=spec["pool_per_host"], on_result=on_result,
+                policy=spec.get("policy"))
+        done.update(requests=len(results), conn=conn_stats)
+        writer.write(encode(done))
+    except Exception as e:
+        writer.write(encode({"type": "error", "error": str(e) or type(e).__name__}))
+        raise
+    finally:
+        await writer.drain()
+        writer.close()
+    print(f"   [Worker {index}] finished {len(results)} requests")
+    return len(results)
+
+
+async def run_coordinator(spec, workers, listen=("0.0.0.0", DEFAULT_PORT), start_delay=START_DELAY_S,
+                          connect_timeout=CONNECT_TIMEOUT_S, on_listening=None, verbose=False):
+    """Tunggu `workers` worker, mulai serentak dan kumpulkan sampel mentahnya.
+
+    on_listening(port) dipanggil setelah socket siap (mis. untuk menjalankan worker lokal).
+    Mengembalikan list state per worker: host, results, done (pesan akhir) dan error.
+    """
+    state = []
+    handlers = {}  # task handler -> writer, untuk menutup koneksi jika start batal
+    ready = asyncio.Event()
+    aborted = asyncio.Event()
+    finished = asyncio.Event()
+    clock = {}
+
+    async def wait_ready(reader):
+        """Tunggu start; False jika worker memutus koneksi sebelum semua worker lengkap."""
+        # Worker tidak mengirim apa pun sebelum menerima spec, jadi read yang selesai = EOF
+        eof = asyncio.ensure_future(reader.read(1))
+        started = asyncio.ensure_future(ready.wait())
+        try:
+            await asyncio.wait({eof, started}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            eof.cancel()
+            started.cancel()
+            # Read yang dibatalkan harus benar-benar selesai sebelum reader dipakai lagi
+            await asyncio.gather(eof, started, return_exceptions=True)
+        return ready.is_set()
+
+    async def handle(reader, writer):
+        handlers[asyncio.current_task()] = writer
+        worker = None
+        try:
+            hello = await read_message(reader)
+            if hello is None:
+                return
+            if len(state) >= workers:
+                writer.write(encode({"type": "error", "error": f"coordinator already has {workers} workers"}))
+                await writer.drain()
+                return
+            worker = {"index": len(state), "host": hello.get("host"), "pid": hello.get("pid"),
+                      "results": [], "done": None, "error": None}
+            state.append(worker)
+            print(f"   Worker {worker['index']} connected: {worker['host']} (pid {worker['pid']}) "
+                  f"[{len(state)}/{workers}]")
+            if len(state) == workers:
+                clock["start_at"] = time.time() + start_delay
+                ready.set()
+            elif not await wait_ready(reader):
+                state.remove(worker)
+                worker = None
+                if not aborted.is_set():
+                    print(f"   Worker disconnected before the start [{len(state)}/{workers}]")
+                return
+            # Index final ditentukan saat start: worker yang keluar lebih awal sudah dibuang
+            worker["index"] = state.index(worker)
+            writer.write(encode({"type": "spec", "worker": worker["index"], "workers": workers,
+                                 "coordinator_time": time.time(), "start_at": clock["start_at"], "spec": spec}))
+            await writer.drain()
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    worker["error"] = "connection lost before the worker finished"
+                    break
+                if message["type"] == "sample":
+                    result = message["result"]
+                    worker["results"].append(result)
+                    if verbose:
+                        status = "SUKSES" if result['success'] else "GAGAL"
+                        print(f"   [User {result['user_id']}] Selesai. Status: {status} ({result['duration']:.2f}s)")
+                elif message["type"] == "done":
+                    worker["done"] = message
+                    break
+                elif message["type"] == "error":
+                    worker["error"] = message["error"]
+                    break
+        except (ConnectionError, ValueError) as e:
+            if worker is not None:
+                worker["error"] = str(e) or type(e).__name__
+        finally:
+            handlers.pop(asyncio.current_task(), None)
+            writer.close()
+            if ready.is_set() and sum(1 for w in state if w["done"] or w["error"]) == workers:
+                finished.set()
+
+    host, port = listen
+    server = await asyncio.start_server(handle, host, port)
+    port = server.sockets[0].getsockname()[1]
+    print(f"   Coordinator listening on {host}:{port}, waiting for {workers} workers...")
+    if on_listening is not None:
+        on_listening(port)
+    try:
+        try:
+            await asyncio.wait_for(ready.wait(), connect_timeout)
+        except asyncio.TimeoutError:
+            # Handler worker yang sudah terhubung masih menunggu start; tanpa ditutup,
+            # wait_closed() (Python 3.12+) ikut menunggu koneksi mereka selamanya
+            connected = len(state)
+            aborted.set()
+            for writer in list(handlers.values()):
+                writer.close()
+            await asyncio.gather(*list(handlers), return_exceptions=True)
+            raise TimeoutError(f"only {connected} of {workers} workers connected within {connect_timeout:.0f}s")
+        print(f"   All workers connected; load starts in {start_delay:.1f}s\n")
+        await finished.wait()
+    finally:
+        server.close()
+        await server.wait_closed()
+    return state
+
+
+def merge_results(state):
+    """Semua sampel mentah dari semua worker dalam satu list (end_time relatif terhadap start bersama)."""
+    return [r for worker in state for r in worker["results"]]
+
+
+def merge_in_flight(state, interval=QUEUE_SAMPLE_INTERVAL_S):
+    """Jumlahkan sampel in-flight semua worker per slot waktu (t dibulatkan ke interval)."""
+    slots = {}
+    for worker in state:
+        last = {}
+        for t, n in (worker["done"] or {}).get("in_flight", []):
+            last[round(t / interval)] = n
+        for slot, n in last.items():
+            slots[slot] = slots.get(slot, 0) + n
+    return [(slot * interval, n) for slot, n in sorted(slots.items())]
+
+
+def print_worker_table(state):
+    """Ringkasan per worker: jika satu client jauh lebih lambat atau telat kirim, dia bottleneck-nya."""
+    width = 112
+    print("\n" + "=" * width)
+    print(f" WORKERS ({len(state)})")
+    print("=" * width)
+    print(f"{'#':<3} | {'Host':<20} | {'Requests':<8} | {'Fail':<5} | {'Tok/s':<9} | {'p50 (s)':<8} | "
+          f"{'p95 (s)':<8} | {'Send lag max':<12} | {'Start skew':<10} | Status")
+    print("-" * width)
+    for worker in state:
+        results = worker["results"]
+        ok = [r for r in results if r['success']]
+        latencies = [r['duration'] for r in ok]
+        wall = max((r['end_time'] for r in results), default=0.0)
+        tokens = sum(r.get('tokens', 0) for r in ok)
+        lag = max((r.get('send_lag', 0.0) for r in results), default=0.0)
+        skew = (worker["done"] or {}).get("start_error")
+        skew = f"{skew * 1000:+.1f} ms" if skew is not None else "-"
+        status = f"LOST: {worker['error']}" if worker["error"] else "OK"
+        if worker["done"] and worker["done"].get("requests") not in (None, len(results)):
+            status = f"MISSING {worker['done']['requests'] - len(results)} samples"
+        print(f"{worker['index']:<3} | {(worker['host'] or '-')[:20]:<20} | {len(results):<8} | "
+              f"{len(results) - len(ok):<5} | {tokens / wall if wall > 0 else 0.0:<9.1f} | "
+              f"{percentile(latencies, 50):<8.2f} | {percentile(latencies, 95):<8.2f} | "
+              f"{lag * 1000:<9.1f} ms | {skew:<10} | {status}")
+    print("=" * width)
+    lost = [w for w in state if w["error"]]
+    if lost:
+        print(f"[WARN] {len(lost)} worker(s) did not finish; the merged report only covers the samples received.")
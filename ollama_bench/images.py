@@ -0,0 +1,120 @@
+"""Locally generated test images for the vision suite.
+
+Images look like a document screenshot (header bar, text lines, a chart
+block) so compressed sizes are realistic. PNG is encoded with the standard
+library; JPEG needs Pillow and is skipped when it is not installed.
+Payloads are encoded to base64 once and cached, so encoding cost never
+shows up in request timings.
+"""
+import base64
+import io
+import random
+import struct
+import zlib
+
+try:
+    from PIL import Image
+except ImportError:  # JPEG dilewati tanpa Pillow
+    Image = None
+
+RESOLUTIONS = {
+    "256": (256, 256),
+    "512": (512, 512),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4k": (3840, 2160),
+}
+FORMATS = ["jpeg", "png"]
+JPEG_QUALITY = 85
+
+
+def parse_resolution(text):
+    """'1080p' atau '1600x900' -> (width, height)."""
+    if text in RESOLUTIONS:
+        return RESOLUTIONS[text]
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height)
+
+
+def synthetic_rgb(width, height, seed=0):
+    """Piksel RGB mentah berbentuk screenshot dokumen; dibangun per baris agar cepat di Python murni."""
+    rng = random.Random(seed)
+    white = bytes((250, 250, 248))
+    header = bytes((40 + seed * 37 % 120, 90, 160))
+    # Template baris "teks": potongan kata gelap di atas latar putih
+    text_rows = []
+    for _ in range(8):
+        row = bytearray(white * width)
+        x = rng.randint(16, 48)
+        while x < width - 32:
+            word = rng.randint(12, 60)
+            end = min(x + word, width - 32)
+            row[x * 3:end * 3] = bytes((30, 30, 35)) * (end - x)
+            x = end + rng.randint(6, 14)
+        text_rows.append(bytes(row))
+    chart_row = bytearray(white * width)
+    for x in range(width // 2, width - 32):
+        chart_row[x * 3:x * 3 + 3] = bytes((rng.randint(60, 220), rng.randint(60, 220), 200))
+    blank = white * width
+
+    header_h = max(8, height // 12)
+    line_h = max(4, height // 60)
+    chart_top, chart_bottom = int(height * 0.6), int(height * 0.85)
+    rows = []
+    for y in range(height):
+        if y < header_h:
+            rows.append(header * width)
+        elif chart_top <= y < chart_bottom:
+            rows.append(bytes(chart_row))
+        elif (y // line_h) % 2 == 0:
+            rows.append(text_rows[(y // (line_h * 2) + seed) % len(text_rows)])
+        else:
+            rows.append(blank)
+    return b"".join(rows)
+
+
+def encode_png(width, height, rgb):
+    """PNG RGB 8-bit tanpa dependensi (filter 0 per baris, zlib)."""
+    stride = width * 3
+    raw = b"".join(b"\x00" + rgb[y * stride:(y + 1) * stride] for y in range(height))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 6))
+            + chunk(b"IEND", b""))
+
+
+def encode_jpeg(width, height, rgb, quality=JPEG_QUALITY):
+    if Image is None:
+        raise ImportError("JPEG images require Pillow: pip install pillow")
+    out = io.BytesIO()
+    Image.frombytes("RGB", (width, height), rgb).save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+
+def available_formats(formats):
+    """Format yang bisa dibuat di lingkungan ini (JPEG butuh Pillow)."""
+    return [f for f in formats if f != "jpeg" or Image is not None]
+
+
+class ImageCache:
+    """Payload base64 per (resolusi, format, seed), di-encode sekali lalu dipakai ulang."""
+
+    def __init__(self):
+        self.payloads = {}
+
+    def get(self, width, height, fmt, seed=0):
+        key = (width, height, fmt, seed)
+        if key not in self.payloads:
+            rgb = synthetic_rgb(width, height, seed)
+            data = encode_png(width, height, rgb) if fmt == "png" else encode_jpeg(width, height, rgb)
+            self.payloads[key] = base64.b64encode(data).decode("ascii")
+        return self.payloads[key]
+
+    def images(self, width, height, fmt, count):
+        """`count` gambar berbeda (seed berbeda) dengan resolusi dan format yang sama."""
+        return [self.get(width, height, fmt, seed) for seed in range(count)]
@@ -0,0 +1,168 @@
+"""Live one-line dashboard for long benchmark runs.
+
+Producers (the scenario runner) only append events to a deque, which is
+atomic in CPython, so recording never takes a lock or waits for the
+display. A single display thread drains the events once a second and
+redraws a status line: in-flight requests, completed/failed, rolling
+tokens/sec, rolling p95 latency and ETA for the batch and the whole run.
+"""
+import collections
+import sys
+import threading
+import time
+
+from .metrics import percentile
+
+REFRESH_S = 1.0
+WINDOW_S = 10.0
+STARTED, DONE, BEGIN, END = range(4)
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}" if seconds >= 3600 else f"{seconds // 60}:{seconds % 60:02d}"
+
+
+class LiveDashboard:
+    """Dashboard terminal; panggil begin()/end() per batch, started()/finished() per request."""
+
+    def __init__(self, refresh=REFRESH_S, window=WINDOW_S, stream=None):
+        self.refresh = refresh
+        self.window = window
+        self.stream = stream or sys.stdout
+        self.events = collections.deque()
+        # State di bawah ini hanya disentuh thread display (consumer tunggal)
+        self.recent = collections.deque()  # (t, latency, tokens) sukses dalam jendela rolling
+        self.in_flight = 0
+        self.done = 0
+        self.failed = 0
+        self.total_done = 0
+        self.label = None
+        self.batch_size = 0
+        self.batch_started = None
+        self.last_draw = 0.0
+        self.planned = None
+        self.run_started = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- producer (tanpa lock) ---
+    def started(self, count=1):
+        self.events.append((time.perf_counter(), STARTED, count, 0, True))
+
+    def finished(self, latency, tokens=0, success=True):
+        self.events.append((time.perf_counter(), DONE, latency, tokens, success))
+
+    # --- kontrol ---
+    def plan(self, total_requests):
+        """Total request yang direncanakan untuk seluruh run (untuk ETA keseluruhan); None jika tidak diketahui."""
+        self.planned = total_requests
+
+    def begin(self, label, batch_size):
+        self.events.append((time.perf_counter(), BEGIN, label, batch_size, True))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="live-dashboard", daemon=True)
+            self._thread.start()
+
+    def end(self):
+        """Tutup batch: gambar status terakhir lalu hapus baris agar output berikutnya bersih."""
+        self.events.append((time.perf_counter(), END, None, 0, True))
+        self._wait_drained()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.refresh + 1)
+            self._thread = None
+
+    def _wait_drained(self):
+        deadline = time.perf_counter() + self.refresh + 1
+        while self.events and self._thread is not None and time.perf_counter() < deadline:
+            time.sleep(0.01)
+
+    # --- consumer ---
+    def _run(self):
+        drawn = False
+        while not self._stop.is_set():
+            ended = self.drain()
+            now = time.perf_counter()
+            if ended and drawn:
+                self.stream.write("\r\033[K")
+                self.stream.flush()
+                drawn = False
+            elif self.label is not None and now - self.last_draw >= self.refresh:
+                self.stream.write("\r\033[K" + self.render(now))
+                self.stream.flush()
+                self.last_draw, drawn = now, True
+            self._stop.wait(0.05)
+
+    def drain(self):
+        """Olah semua event yang menunggu; kembalikan True jika ada batch yang berakhir."""
+        ended = False
+        while self.events:
+            t, kind, a, b, success = self.events.popleft()
+            if kind == STARTED:
+                self.in_flight += a
+            elif kind == DONE:
+                self.in_flight -= 1
+                self.done += 1
+                self.total_done += 1
+                if success:
+                    self.recent.append((t, a, b))
+                else:
+                    self.failed += 1
+            elif kind == BEGIN:
+                # Gambar pertama setelah satu interval: batch pendek tidak berkedip
+                self.label, self.batch_size, self.batch_started, self.last_draw = a, b, t, t
+                self.in_flight = self.done = self.failed = 0
+                self.recent.clear()
+            elif kind == END:
+                self.label = None
+                ended = True
+        return ended
+
+    def snapshot(self, now):
+        while self.recent and self.recent[0][0] < now - self.window:
+            self.recent.popleft()
+        span = min(self.window, now - self.batch_started) if self.batch_started else self.window
+        tokens = sum(r[2] for r in self.recent)
+        rate = self.done / (now - self.batch_started) if self.batch_started and now > self.batch_started else 0.0
+        remaining = self.batch_size - self.done
+        batch_eta = remaining / rate if rate > 0 else None
+        run_eta = None
+        if self.planned and self.total_done:
+            run_eta = (now - self.run_started) * (self.planned - self.total_done) / self.total_done
+        return {
+            "in_flight": self.in_flight,
+            "done": self.done,
+            "failed": self.failed,
+            "tps": tokens / span if span > 0 else 0.0,
+            "p95": percentile([r[1] for r in self.recent], 95) if self.recent else None,
+            "batch_eta": batch_eta,
+            "run_eta": run_eta,
+        }
+
+    def render(self, now):
+        s = self.snapshot(now)
+        p95 = f"{s['p95']:.2f}s" if s['p95'] is not None else "-"
+        line = (f"[LIVE] {self.label} | in-flight {s['in_flight']} | done {s['done']}/{self.batch_size} "
+                f"(fail {s['failed']}) | {s['tps']:.1f} t/s | p95 {p95} ({self.window:.0f}s) | ETA {format_eta(s['batch_eta'])}")
+        if self.planned:
+            line += f" | run {self.total_done}/{self.planned}, ETA ~{format_eta(s['run_eta'])}"
+        return line
+
+
+def add_live_arguments(parser):
+    parser.add_argument("--no-live", action="store_true",
+                        help="Disable the live status line (it is off anyway when output is not a terminal)")
+
+
+def start_live(args, planned=None):
+    """LiveDashboard jika stdout adalah terminal dan tidak dimatikan, selain itu None."""
+    if args.no_live or not sys.stdout.isatty():
+        return None
+    live = LiveDashboard()
+    live.plan(planned)
+    return live
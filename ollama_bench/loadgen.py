@@ -0,0 +1,343 @@
+"""Asyncio load generator used by server-load-test-ollama.py.
+
+Every simulated user is a coroutine sharing one pooled AsyncOllamaClient,
+so a single process can keep thousands of requests in flight. Two drivers
+are provided: run_load_test (closed-loop burst of N users) and
+run_open_loop (requests issued on an arrival schedule).
+"""
+import asyncio
+import random
+import statistics
+import time
+
+from .balancer import EndpointPool
+from .client import AsyncOllamaClient, OllamaError
+from .metrics import get_metrics, is_token_chunk
+from .stats import BatchStats
+
+# Prompt yang cukup berat untuk memaksa GPU bekerja
+# Kita pakai prompt coding/reasoning agar processing time-nya nyata.
+PROMPT = "Write a python function to calculate fibonacci sequence up to n terms. Explain the logic briefly."
+
+DEFAULT_OPTIONS = {
+    "num_ctx": 4096,
+    "temperature": 0.7
+}
+
+REQUEST_TIMEOUT_S = 300 # Timeout panjang untuk antrian
+
+# Interval sampling jumlah request in-flight pada mode open-loop (detik)
+QUEUE_SAMPLE_INTERVAL_S = 1.0
+
+async def simulate_user_request(client, user_id, model_name, prompt=PROMPT, options=None,
+                                verbose=True, scheduled_time=None, images=None, stream=False):
+    """Fungsi ini mensimulasikan satu user.
+
+    Jika scheduled_time diberikan (mode open-loop), latency dihitung dari waktu
+    kirim yang dijadwalkan, bukan dari waktu request benar-benar keluar, agar
+    tidak terkena coordinated omission.
+    stream=True memakai respons streaming sehingga TTFT ikut terukur.
+    client boleh berupa EndpointPool: backend dipilih per request dan dicatat di result['backend'].
+    """
+    if isinstance(client, EndpointPool):
+        backend = client.acquire()
+        try:
+            result = await simulate_user_request(backend.client, user_id, model_name, prompt, options, verbose,
+                                                 scheduled_time, images, stream)
+        finally:
+            client.release(backend)
+        result["backend"] = backend.name
+        return result
+
+    if verbose:
+        print(f"   [User {user_id}] \U0001F680 Request sent... waiting for response...")
+    sent_time = time.perf_counter()
+    start_time = sent_time if scheduled_time is None else scheduled_time
+    
+    payload = {
+        "model": model_name,
+        "prompt": prompt,
+        "options": DEFAULT_OPTIONS if options is None else options
+    }
+    if images:
+        payload["images"] = images
+    
+    try:
+        # Kirim request lewat connection pool bersama
+        ttft = None
+        if stream:
+            data = None
+            async for chunk in client.generate_stream(payload):
+                if ttft is None and is_token_chunk(chunk):
+                    ttft = time.perf_counter() - sent_time
+                if chunk.get("done"):
+                    data = chunk
+            if data is None:
+                raise OllamaError("stream ended without a final chunk")
+        else:
+            data = await client.generate(payload)
+        
+        end_time = time.perf_counter()
+        total_duration = end_time - start_time
+        
+        # Ambil metrik
+        eval_count = data.get('eval_count', 0)
+        eval_duration_ns = data.get('eval_duration', 0)
+        
+        # Hitung T/s spesifik user ini
+        tps = 0
+        if eval_duration_ns > 0:
+            tps = eval_count / (eval_duration_ns / 1e9)
+        metrics = get_metrics(data)
+        # Sisa waktu di luar kerja server (load + prefill + decode) = antrian di server + jaringan
+        busy = metrics['load_time'] + metrics['prompt_eval_time'] + metrics['eval_time']
+            
+        return {
+            "success": True,
+            "user_id": user_id,
+            "model": model_name,
+            "duration": total_duration,
+            "tokens": eval_count,
+            "tps": tps,
+            # load_duration > 0 berarti model harus dimuat (swap/reload) untuk request ini
+            "load_time": data.get('load_duration', 0) / 1e9,
+            "prompt_tps": metrics['prompt_tps'],
+            "prefill_time": metrics['prompt_eval_time'],
+            "ttft": ttft,
+            "queue_wait": max(0.0, end_time - sent_time - busy),
+            "send_lag": sent_time - start_time,
+            "end_time": end_time
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "user_id": user_id,
+            "model": model_name,
+            "duration": time.perf_counter() - start_time,
+            "send_lag": sent_time - start_time,
+            "end_time": time.perf_counter(),
+            "error": str(e) or type(e).__name__
+        }
+
+def open_client(api_url, limit, limit_per_host=0, policy=None, seed=None):
+    """AsyncOllamaClient untuk satu URL, atau EndpointPool jika api_url berupa list endpoint."""
+    if isinstance(api_url, (list, tuple)):
+        return EndpointPool(api_url, policy or "round-robin", REQUEST_TIMEOUT_S, limit, limit_per_host, seed)
+    return AsyncOllamaClient(api_url, timeout=REQUEST_TIMEOUT_S, limit=limit, limit_per_host=limit_per_host)
+
+async def run_load_test(model_name, api_url, concurrent_users, prompt=PROMPT, verbose=True,
+                        pool_size=0, pool_per_host=0, on_result=None, policy=None, seed=None):
+    """Menjalankan semua user sebagai coroutine di atas satu connection pool.
+
+    api_url boleh berupa list endpoint; request dibagi sesuai policy (lihat ollama_bench.balancer).
+    on_result(result) dipanggil begitu satu request selesai (mis. untuk streaming ke coordinator).
+    Mengembalikan (results, BatchStats, connection_stats).
+    """
+    results = []
+    batch = BatchStats()
+
+    async with open_client(api_url, pool_size or concurrent_users, pool_per_host, policy, seed) as client:
+        batch.start()
+        tasks = [
+            asyncio.ensure_future(simulate_user_request(client, i+1, model_name, prompt, verbose=verbose))
+            for i in range(concurrent_users)
+        ]
+        for coro in asyncio.as_completed(tasks):
+            data = await coro
+            results.append(data)
+            batch.record(data['duration'], data.get('tokens', 0), data['success'])
+            if on_result is not None:
+                on_result(data)
+            if verbose:
+                status = "SUKSES" if data['success'] else "GAGAL"
+                print(f"   [User {data['user_id']}] Selesai. Status: {status} ({data.get('duration', 0):.2f}s)")
+        batch.stop()
+
+    return results, batch, client.connection_stats()
+
+def arrival_schedule(arrival, rate, duration, step_rate=0.0, step_interval=10.0, seed=None):
+    """Hasilkan offset waktu kirim (detik sejak start) untuk mode open-loop.
+
+    constant : jarak antar request tetap 1/rate.
+    poisson  : jarak antar request eksponensial dengan rata-rata 1/rate.
+    step     : rate naik sebesar step_rate setiap step_interval detik (ramp bertingkat).
+    """
+    rng = random.Random(seed)
+    offsets = []
+    t = 0.0
+    while True:
+        if arrival == "step":
+            current_rate = rate + step_rate * int(t // step_interval)
+        else:
+            current_rate = rate
+        if current_rate <= 0:
+            raise ValueError("Arrival rate must be positive")
+        t += rng.expovariate(current_rate) if arrival == "poisson" else 1.0 / current_rate
+        if t >= duration:
+            return offsets
+        offsets.append(t)
+
+async def sample_in_flight(in_flight, samples, start, interval=QUEUE_SAMPLE_INTERVAL_S):
+    """Catat jumlah request yang belum selesai secara periodik (indikator antrian)."""
+    while True:
+        samples.append((time.perf_counter() - start, len(in_flight)))
+        await asyncio.sleep(interval)
+
+async def run_open_loop(model_name, api_url, offsets, prompt=PROMPT, verbose=False,
+                        pool_size=0, pool_per_host=0, on_result=None, policy=None, seed=None):
+    """Kirim request sesuai jadwal tanpa menunggu request sebelumnya selesai.
+
+    on_result(result) dipanggil begitu satu request selesai.
+    Mengembalikan (results, start, issue_end, in-flight samples, connection_stats).
+    """
+    in_flight = set()
+    samples = []
+
+    # Default limit=0: jangan antrikan request di sisi client, antrian harus terlihat di server
+    async with open_client(api_url, pool_size, pool_per_host, policy, seed) as client:
+        start = time.perf_counter()
+        sampler = asyncio.ensure_future(sample_in_flight(in_flight, samples, start))
+        tasks = []
+        for i, offset in enumerate(offsets):
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.ensure_future(
+                simulate_user_request(client, i+1, model_name, prompt, verbose=verbose, scheduled_time=scheduled)
+            )
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            if on_result is not None:
+                # Task yang dibatalkan (mis. worker dihentikan) tidak punya hasil
+                task.add_done_callback(lambda t: None if t.cancelled() else on_result(t.result()))
+            tasks.append(task)
+        issue_end = time.perf_counter() - start
+        results = list(await asyncio.gather(*tasks))
+        sampler.cancel()
+        samples.append((time.perf_counter() - start, 0))
+
+    return results, start, issue_end, samples, client.connection_stats()
+
+def queue_growth_rate(samples, until):
+    """Kemiringan (least squares) jumlah in-flight terhadap waktu selama fase pengiriman, dalam req/s."""
+    # Abaikan fase awal saat in-flight baru naik dari nol (bukan antrian)
+    warmup = min(until * 0.2, 10.0)
+    points = [(t, n) for t, n in samples if warmup <= t <= until]
+    if len(points) < 3:
+        return 0.0
+    mean_t = statistics.mean(t for t, _ in points)
+    mean_n = statistics.mean(n for _, n in points)
+    var_t = sum((t - mean_t) ** 2 for t, _ in points)
+    if var_t == 0:
+        return 0.0
+    return sum((t - mean_t) * (n - mean_n) for t, n in points) / var_t
+
+def print_open_loop_results(results, model_name, arrival, duration, start, issue_end, samples):
+    successful = [r for r in results if r['success']]
+    failed = [r for r in results if not r['success']]
+
+    offered_rps = len(results) / duration if duration > 0 else 0
+    last_end = max((r['end_time'] for r in results), default=start)
+    batch = batch_from_results(results, start, last_end)
+    elapsed = batch.wall_time
+    achieved_rps = len(successful) / elapsed if elapsed > 0 else 0
+    peak_in_flight = max((n for _, n in samples), default=0)
+    growth = queue_growth_rate(samples, issue_end)
+
+    print("\n" + "="*60)
+    print(f" HASIL LOAD TEST OPEN-LOOP ({arrival.upper()})")
+    print("="*60)
+    print(f" Model           : {model_name}")
+    print(f" Durasi kirim    : {duration:.1f} detik (selesai total {elapsed:.1f} detik)")
+    print(f" Sukses          : {len(successful)} / {len(results)}")
+    print(f" Gagal/Timeout   : {len(failed)}")
+    print("-" * 60)
+    print(f" OFFERED RPS (target)             : {offered_rps:.2f} req/s")
+    print(f" ACHIEVED RPS (selesai sukses)    : {achieved_rps:.2f} req/s")
+    print(f" PUNCAK REQUEST IN-FLIGHT         : {peak_in_flight}")
+    print(f" PERTUMBUHAN ANTRIAN              : {growth:+.2f} req/s")
+
+    if successful:
+        max_lag = max(r['send_lag'] for r in results)
+
+        print("-" * 60)
+        print_latency_percentiles(batch, label="LATENCY dari jadwal")
+        print(f" KETERLAMBATAN KIRIM CLIENT (max) : {max_lag * 1000:.1f} ms")
+        print(f" TOTAL SYSTEM THROUGHPUT          : {batch.throughput:.2f} tokens/sec")
+
+    if growth > 0.1 * offered_rps:
+        print("\n[WARN] Antrian terus bertambah: server sudah melewati titik saturasi pada rate ini.")
+
+    if failed:
+        print("\n[ERROR LOG]")
+        for f in failed[:20]:
+            print(f" Request {f['user_id']}: {f['error']}")
+        if len(failed) > 20:
+            print(f" ... dan {len(failed) - 20} error lainnya")
+    print("="*60)
+
+def raise_fd_limit(wanted):
+    """Naikkan batas file descriptor agar ribuan socket bisa dibuka sekaligus."""
+    try:
+        import resource
+    except ImportError:
+        return # Windows: tidak ada RLIMIT_NOFILE
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+    if soft != resource.RLIM_INFINITY and soft < target:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+
+def batch_from_results(results, started, finished):
+    """Bangun BatchStats dari hasil simulate_user_request dan jendela waktu batch."""
+    batch = BatchStats()
+    batch.start(at=started)
+    batch.stop(at=finished)
+    for r in results:
+        batch.record(r['duration'], r.get('tokens', 0), r['success'])
+    return batch
+
+def print_latency_percentiles(batch, label="WAKTU TUNGGU"):
+    lat = batch.latency
+    print(f" {label + ' p50':<33}: {lat.percentile(50):.2f} detik")
+    print(f" {label + ' p90':<33}: {lat.percentile(90):.2f} detik")
+    print(f" {label + ' p95':<33}: {lat.percentile(95):.2f} detik")
+    print(f" {label + ' p99':<33}: {lat.percentile(99):.2f} detik")
+    print(f" {label + ' TERLAMA (max)':<33}: {lat.max:.2f} detik")
+
+def print_results(results, model_name, concurrent_users, batch=None):
+    successful = [r for r in results if r['success']]
+    failed = [r for r in results if not r['success']]
+    if batch is None:
+        # Tanpa jendela batch eksplisit, anggap batch dimulai saat request pertama dikirim
+        first_start = min((r['end_time'] - r['duration'] for r in results), default=0.0)
+        last_end = max((r['end_time'] for r in results), default=0.0)
+        batch = batch_from_results(results, first_start, last_end)
+    
+    print("\n" + "="*60)
+    print(f" HASIL LOAD TEST: {concurrent_users} USERS SIMULTAN")
+    print("="*60)
+    print(f" Model           : {model_name}")
+    print(f" Sukses          : {len(successful)} / {len(results)}")
+    print(f" Gagal/Timeout   : {len(failed)}")
+    print(f" Durasi batch    : {batch.wall_time:.2f} detik (wall-clock client)")
+    print("-" * 60)
+    
+    if successful:
+        tokens_per_seconds = [r['tps'] for r in successful]
+        avg_tps = statistics.mean(tokens_per_seconds)
+
+        # Total System Throughput = total token sukses / jendela wall-clock batch
+        # (dari request pertama dikirim sampai response terakhir, termasuk request gagal)
+        print(f" RATA-RATA WAKTU TUNGGU (Latency) : {batch.latency.mean:.2f} detik")
+        print_latency_percentiles(batch)
+        print("-" * 60)
+        print(f" KECEPATAN PER USER (Avg Speed)   : {avg_tps:.2f} tokens/sec")
+        print(f" TOTAL SYSTEM THROUGHPUT          : {batch.throughput:.2f} tokens/sec")
+    
+    if failed:
+        print("\n[ERROR LOG]")
+        for f in failed:
+            print(f" User {f['user_id']}: {f['error']}")
+    print("="*60)
@@ -0,0 +1,130 @@
+"""Metric extraction from Ollama responses.
+
+Ollama reports durations in nanoseconds; everything returned here is in
+seconds or tokens per second.
+"""
+import time
+
+# Jeda antar token (detik) yang dianggap "stall" pada mode streaming
+STALL_THRESHOLD_S = 0.5
+
+
+def calculate_tps(data):
+    """Kecepatan generate (t/s) dan jumlah token output dari satu response."""
+    if not data: return 0, 0
+    eval_count = data.get('eval_count', 0)
+    eval_duration_ns = data.get('eval_duration', 0)
+    if eval_duration_ns > 0:
+        return eval_count / (eval_duration_ns / 1e9), eval_count
+    return 0, 0
+
+
+def get_metrics(res_json):
+    """Ekstrak metrik performa dari response final /api/generate atau /api/chat."""
+    if not res_json:
+        return None
+    eval_count = res_json.get('eval_count', 0)
+    eval_dur = res_json.get('eval_duration', 0) # ns
+    prompt_eval_count = res_json.get('prompt_eval_count', 0)
+    # Untuk model vision, prompt_eval_duration = waktu Vision Encoder memproses gambar
+    prompt_eval_dur = res_json.get('prompt_eval_duration', 0) # ns
+
+    # Kecepatan Generate (Menulis)
+    gen_tps = 0
+    if eval_dur > 0:
+        gen_tps = eval_count / (eval_dur / 1e9)
+
+    # Kecepatan Membaca (Prompt Processing)
+    prompt_tps = 0
+    if prompt_eval_dur > 0:
+        prompt_tps = prompt_eval_count / (prompt_eval_dur / 1e9)
+
+    return {
+        "gen_tps": gen_tps,
+        "prompt_tps": prompt_tps,
+        "prompt_eval_time": prompt_eval_dur / 1e9,
+        "eval_time": eval_dur / 1e9,
+        "load_time": res_json.get('load_duration', 0) / 1e9,
+        "latency": res_json.get('total_duration', 0) / 1e9,
+        "tokens_out": eval_count,
+        "tokens_in": prompt_eval_count
+    }
+
+
+def get_embed_metrics(res_json):
+    """Metrik /api/embed dengan kunci yang sama seperti get_metrics (token = token input).
+
+    /api/embed tidak melaporkan prompt_eval_duration; waktu server di luar load model
+    dipakai sebagai waktu proses, jadi gen_tps dan prompt_tps = token input per detik.
+    """
+    if not res_json:
+        return None
+    tokens = res_json.get('prompt_eval_count', 0)
+    load = res_json.get('load_duration', 0) / 1e9
+    total = res_json.get('total_duration', 0) / 1e9
+    busy = max(0.0, total - load)
+    tps = tokens / busy if busy > 0 else 0
+    return {
+        "gen_tps": tps,
+        "prompt_tps": tps,
+        "prompt_eval_time": busy,
+        "eval_time": 0.0,
+        "embed_time": busy,
+        "load_time": load,
+        "latency": total,
+        "tokens_out": tokens,
+        "tokens_in": tokens,
+        "embeddings": len(res_json.get('embeddings') or []),
+    }
+
+
+def is_token_chunk(chunk):
+    """True jika potongan stream membawa token (response, thinking, atau message chat)."""
+    # Model "thinking" (qwen3, deepseek-r1) mengalirkan token di field 'thinking'
+    if chunk.get("response") or chunk.get("thinking"):
+        return True
+    message = chunk.get("message") or {}
+    return bool(message.get("content") or message.get("thinking"))
+
+
+def collect_stream(chunks, text=None):
+    """Konsumsi potongan stream; kembalikan (potongan final, timestamp tiap token).
+
+    Jika `text` berupa list, potongan jawaban (response / message.content, tanpa
+    thinking) ditambahkan ke list itu, misalnya untuk meneruskan history chat.
+    """
+    token_times = []
+    final = None
+    for chunk in chunks:
+        if is_token_chunk(chunk):
+            token_times.append(time.perf_counter())
+            if text is not None:
+                text.append(chunk.get("response") or (chunk.get("message") or {}).get("content") or "")
+        if chunk.get("done"):
+            final = chunk
+    return final, token_times
+
+
+def percentile(values, pct):
+    """Percentile dengan interpolasi linear (pct 0-100)."""
+    if not values: return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def stream_stats(start_time, token_times, stall_threshold=STALL_THRESHOLD_S):
+    """Hitung TTFT, distribusi inter-token latency dan jumlah stall."""
+    if not token_times:
+        return {"ttft": 0.0, "itl_p50": 0.0, "itl_p95": 0.0, "itl_p99": 0.0, "itl_max": 0.0, "stalls": 0}
+    gaps = [b - a for a, b in zip(token_times, token_times[1:])]
+    return {
+        "ttft": token_times[0] - start_time,
+        "itl_p50": percentile(gaps, 50),
+        "itl_p95": percentile(gaps, 95),
+        "itl_p99": percentile(gaps, 99),
+        "itl_max": max(gaps) if gaps else 0.0,
+        "stalls": sum(1 for g in gaps if g > stall_threshold),
+    }
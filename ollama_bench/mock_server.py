@@ -0,0 +1,550 @@
+"""Stand-in Ollama server for hardware-free, deterministic harness runs.
+
+Implements the parts of the Ollama REST API the scripts use:
+
+    POST /api/generate     streaming (NDJSON) and non-streaming
+    POST /api/chat         streaming (NDJSON) and non-streaming
+    POST /api/embed        batched embeddings
+    POST /api/embeddings   legacy single-prompt embeddings
+    POST /api/show         model details (fixed architecture and layer count)
+    GET  /api/ps           loaded models
+    GET  /api/tags         known models
+    GET  /api/version
+    GET  /mock/stats       ground-truth counters kept by the mock itself
+
+Timing is simulated with real sleeps from a few knobs (token rate, prefill
+rate, parallel slots, queue limit, load time, failure injection) and the
+usual ``eval_count``/``eval_duration``/``prompt_eval_*``/``load_duration``
+fields are filled from the same numbers, so the harness's throughput math
+can be checked against known values.
+"""
+import base64
+import collections
+import hashlib
+import json
+import math
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Perkiraan kasar tokenizer: ~4 karakter per token
+CHARS_PER_TOKEN = 4
+DEFAULT_KEEP_ALIVE_S = 300
+# keep_alive negatif = resident selamanya; /api/ps Ollama melaporkan expires_at ~300 tahun lagi
+FOREVER_S = 300 * 365 * 86400
+DURATION_PART = re.compile(r"(\d+(?:\.\d*)?|\.\d+)(ns|us|µs|ms|s|m|h)")
+DURATION_UNITS = {"ns": 1e-9, "us": 1e-6, "µs": 1e-6, "ms": 1e-3, "s": 1, "m": 60, "h": 3600}
+# Encoder vision ala Qwen-VL: satu token per patch 28x28 piksel
+PATCH_PIXELS = 28 * 28
+# Jumlah layer yang dilaporkan /api/show (ukuran kelas 7-8B)
+MOCK_BLOCK_COUNT = 32
+WORDS = ("lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit")
+
+
+def count_tokens(text):
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN)) if text else 0
+
+
+def common_prefix_len(a, b):
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def parse_keep_alive(value):
+    """keep_alive Ollama dalam detik: angka (detik) atau durasi Go seperti '5m', '1h30m', '-1'.
+
+    Nilai negatif berarti model tidak pernah di-unload (inf); 0 berarti unload setelah request.
+    ValueError jika formatnya tidak dikenal.
+    """
+    if value is None:
+        return DEFAULT_KEEP_ALIVE_S
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"invalid keep_alive {value!r}")
+    if isinstance(value, str):
+        text = value.strip()
+        sign = -1 if text.startswith("-") else 1
+        body = text.lstrip("+-")
+        try:
+            seconds = float(body)  # string angka tanpa satuan = detik, seperti di Ollama
+        except ValueError:
+            parts = DURATION_PART.findall(body)
+            if not body or "".join(n + u for n, u in parts) != body:
+                raise ValueError(f"invalid keep_alive duration {value!r}")
+            seconds = sum(float(n) * DURATION_UNITS[u] for n, u in parts)
+        value = sign * seconds
+    return math.inf if value < 0 else float(value)
+
+
+def image_size(b64):
+    """(width, height) dari header PNG/JPEG base64, atau None kalau formatnya tidak dikenal."""
+    try:
+        data = base64.b64decode(b64)
+    except (ValueError, TypeError):
+        return None
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return struct.unpack(">II", data[16:24])
+    if data[:2] == b"\xff\xd8":
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                return None
+            marker, length = data[i + 1], struct.unpack(">H", data[i + 2:i + 4])[0]
+            # SOF0..SOF15 kecuali DHT (C4), JPG (C8), DAC (CC)
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack(">HH", data[i + 5:i + 9])
+                return width, height
+            i += 2 + length
+    return None
+
+
+def embed_vector(text, dim):
+    """Vektor hashing-trick yang deterministik: teks dengan kata yang sama akan mirip."""
+    vec = [0.0] * dim
+    for word in text.lower().split():
+        h = zlib.crc32(word.encode())
+        vec[h % dim] += 1.0 if (h >> 16) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+def iso_now(offset_s=0.0):
+    return (datetime.now(timezone.utc) + timedelta(seconds=offset_s)).isoformat()
+
+
+class ServerBusy(Exception):
+    pass
+
+
+class MockOllama:
+    """Simulated server state: loaded models, parallel slots, queue and counters."""
+
+    def __init__(self, token_rate=50.0, prefill_rate=1000.0, embed_rate=5000.0, parallel=4,
+                 max_queue=512, max_loaded=2, load_time=2.0, default_tokens=128, image_tokens=256,
+                 contention=0.0, fail_rate=0.0, stall_rate=0.0, stall_time=1.0, embed_dim=384,
+                 model_size_gb=20.0, seed=None, verbose=False):
+        self.token_rate = token_rate
+        self.prefill_rate = prefill_rate
+        self.embed_rate = embed_rate
+        self.parallel = parallel
+        self.max_queue = max_queue
+        self.max_loaded = max_loaded
+        self.load_time = load_time
+        self.default_tokens = default_tokens
+        self.image_tokens = image_tokens
+        self.contention = contention
+        self.fail_rate = fail_rate
+        self.stall_rate = stall_rate
+        self.stall_time = stall_time
+        self.embed_dim = embed_dim
+        self.model_size = int(model_size_gb * 1024 ** 3)
+        self.verbose = verbose
+
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        # Diberi sinyal saat request selesai, agar swap bisa menunggu model yang sedang dipakai
+        self.idle = threading.Condition(self.lock)
+        self.load_lock = threading.Lock()
+        self.slots = {}
+        self.active = collections.Counter()
+        self.waiting = 0
+        # model -> waktu kadaluarsa (monotonic); urutan = LRU
+        self.loaded = collections.OrderedDict()
+        self.known = set()
+        # Prompt terakhir per model untuk simulasi prompt (KV) cache
+        self.prompt_cache = collections.defaultdict(lambda: collections.deque(maxlen=max(1, parallel)))
+        self.stats = collections.Counter()
+
+    # --- model residency ---
+
+    def _slot(self, model):
+        with self.lock:
+            if model not in self.slots:
+                self.slots[model] = threading.Semaphore(self.parallel)
+            return self.slots[model]
+
+    def _expire(self):
+        now = time.monotonic()
+        for model, expires in list(self.loaded.items()):
+            if expires <= now and not self.active[model]:
+                del self.loaded[model]
+                self.stats["unloads"] += 1
+
+    def ensure_loaded(self, model, keep_alive_s):
+        """Muat model jika belum resident; kembalikan load_duration (detik)."""
+        # Jalur cepat tanpa load_lock: request untuk model yang sudah resident tidak ikut
+        # menunggu swap model lain (yang bisa sedang menunggu model ini idle)
+        with self.lock:
+            self._expire()
+            self.known.add(model)
+            if model in self.loaded:
+                self.loaded.move_to_end(model)
+                self.loaded[model] = time.monotonic() + keep_alive_s
+                return 0.0
+        with self.load_lock:
+            with self.lock:
+                self._expire()
+                if model in self.loaded:
+                    self.loaded.move_to_end(model)
+                    self.loaded[model] = time.monotonic() + keep_alive_s
+                    return 0.0
+                # Evict LRU model yang sedang tidak dipakai (OLLAMA_MAX_LOADED_MODELS);
+                # seperti scheduler Ollama, tunggu sampai ada model yang idle jika semuanya sibuk
+                while len(self.loaded) >= self.max_loaded:
+                    victim = next((m for m in self.loaded if not self.active[m]), None)
+                    if victim is None:
+                        self.idle.wait()
+                        self._expire()
+                        continue
+                    del self.loaded[victim]
+                    self.stats["evictions"] += 1
+            time.sleep(self.load_time)
+            with self.lock:
+                self.loaded[model] = time.monotonic() + keep_alive_s
+                self.stats["loads"] += 1
+            return self.load_time
+
+    def release(self, model, keep_alive_s):
+        with self.lock:
+            if keep_alive_s == 0 and model in self.loaded and not self.active[model]:
+                del self.loaded[model]
+                self.stats["unloads"] += 1
+
+    def unload(self, model):
+        with self.lock:
+            if model in self.loaded and not self.active[model]:
+                del self.loaded[model]
+                self.stats["unloads"] += 1
+
+    # --- request lifecycle ---
+
+    def admit(self, model):
+        """Ambil slot paralel untuk model; tolak jika antrian penuh (OLLAMA_MAX_QUEUE)."""
+        with self.lock:
+            self.stats["requests"] += 1
+            if self.rng.random() < self.fail_rate:
+                self.stats["injected_failures"] += 1
+                raise RuntimeError("mock: injected failure")
+            if self.waiting >= self.max_queue:
+                self.stats["rejected"] += 1
+                raise ServerBusy("server busy, please try again.  maximum pending requests exceeded")
+            self.waiting += 1
+        slot = self._slot(model)
+        slot.acquire()
+        with self.lock:
+            self.waiting -= 1
+            self.active[model] += 1
+        return slot
+
+    def finish(self, model, slot):
+        with self.lock:
+            self.active[model] -= 1
+            self.idle.notify_all()
+        slot.release()
+
+    def current_rate(self, model):
+        with self.lock:
+            busy = self.active[model]
+        return self.token_rate / (1.0 + self.contention * max(0, busy - 1))
+
+    def image_cost(self, b64):
+        """Token gambar: minimal image_tokens, naik dengan jumlah piksel untuk gambar besar."""
+        size = image_size(b64)
+        if size is None:
+            return self.image_tokens
+        return max(self.image_tokens, math.ceil(size[0] * size[1] / PATCH_PIXELS))
+
+    def prefill(self, model, prompt, num_ctx, images):
+        """Simulasi prompt processing; token yang prefix-nya sudah di cache tidak dihitung ulang."""
+        tokens = count_tokens(prompt)
+        if num_ctx:
+            tokens = min(tokens, num_ctx)
+        with self.lock:
+            cache = self.prompt_cache[model]
+            cached_chars = max((common_prefix_len(prompt, p) for p in cache), default=0)
+            cache.append(prompt)
+        cached = min(tokens, cached_chars // CHARS_PER_TOKEN)
+        evaluated = max(1, tokens - cached) + sum(self.image_cost(img) for img in images)
+        duration = evaluated / self.prefill_rate
+        time.sleep(duration)
+        with self.lock:
+            self.stats["prompt_tokens"] += evaluated
+            self.stats["cached_prompt_tokens"] += cached
+        return evaluated, duration
+
+    def decode(self, model, num_predict, emit=None):
+        """Hasilkan token; emit(teks) dipanggil per token saat streaming."""
+        n = self.default_tokens if num_predict is None or num_predict < 0 else num_predict
+        start = time.perf_counter()
+        deadline = start
+        for i in range(n):
+            deadline += 1.0 / self.current_rate(model)
+            if self.stall_rate and self.rng.random() < self.stall_rate:
+                deadline += self.stall_time
+                with self.lock:
+                    self.stats["stalls"] += 1
+            delay = deadline - time.perf_counter()
+            if emit is not None:
+                if delay > 0: time.sleep(delay)
+                emit(WORDS[i % len(WORDS)] + " ")
+        if emit is None:
+            delay = deadline - time.perf_counter()
+            if delay > 0: time.sleep(delay)
+        with self.lock:
+            self.stats["eval_tokens"] += n
+        return n, time.perf_counter() - start
+
+    def embed(self, model, inputs, keep_alive_s):
+        slot = self.admit(model)
+        try:
+            start = time.perf_counter()
+            load = self.ensure_loaded(model, keep_alive_s)
+            tokens = sum(count_tokens(t) for t in inputs)
+            time.sleep(tokens / self.embed_rate)
+            vectors = [embed_vector(t, self.embed_dim) for t in inputs]
+            with self.lock:
+                self.stats["embed_inputs"] += len(inputs)
+                self.stats["embed_tokens"] += tokens
+            return vectors, tokens, load, time.perf_counter() - start
+        finally:
+            self.finish(model, slot)
+            self.release(model, keep_alive_s)
+
+    def ps(self):
+        with self.lock:
+            self._expire()
+            now = time.monotonic()
+            return [
+                {
+                    "name": m, "model": m, "size": self.model_size, "size_vram": self.model_size,
+                    "digest": hashlib.sha256(m.encode()).hexdigest(),
+                    "expires_at": iso_now(min(expires - now, FOREVER_S)),
+                }
+                for m, expires in self.loaded.items()
+            ]
+
+    def tags(self):
+        with self.lock:
+            models = sorted(self.known)
+        return [
+            {
+                "name": m, "model": m, "size": self.model_size, "modified_at": iso_now(),
+                "digest": hashlib.sha256(m.encode()).hexdigest(),
+                "details": {"format": "gguf", "family": m.split(":")[0], "quantization_level": "Q4_K_M"},
+            }
+            for m in models
+        ]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockOllama/1.0"
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def log_message(self, fmt, *args):
+        if self.mock.verbose:
+            super().log_message(fmt, *args)
+
+    # --- response helpers ---
+
+    def send_json(self, obj, status=200):
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def write_chunk(self, obj):
+        data = (json.dumps(obj) + "\n").encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    # --- routing ---
+
+    def do_GET(self):
+        if self.path == "/api/ps":
+            self.send_json({"models": self.mock.ps()})
+        elif self.path == "/api/tags":
+            self.send_json({"models": self.mock.tags()})
+        elif self.path == "/api/version":
+            self.send_json({"version": "0.0.0-mock"})
+        elif self.path == "/mock/stats":
+            with self.mock.lock:
+                self.send_json(dict(self.mock.stats))
+        elif self.path == "/":
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            req = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self.send_json({"error": "invalid JSON body"}, 400)
+        if not req.get("model"):
+            return self.send_json({"error": "model is required"}, 400)
+
+        routes = {
+            "/api/generate": lambda: self.handle_completion(req, chat=False),
+            "/api/chat": lambda: self.handle_completion(req, chat=True),
+            "/api/embed": lambda: self.handle_embed(req),
+            "/api/embeddings": lambda: self.handle_embeddings(req),
+            "/api/show": lambda: self.handle_show(req),
+        }
+        handler = routes.get(self.path)
+        if handler is None:
+            return self.send_json({"error": "not found"}, 404)
+        try:
+            parse_keep_alive(req.get("keep_alive"))
+        except ValueError as e:
+            return self.send_json({"error": str(e)}, 400)
+        try:
+            handler()
+        except ServerBusy as e:
+            self.send_json({"error": str(e)}, 503)
+        except RuntimeError as e:
+            self.send_json({"error": str(e)}, 500)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    # --- handlers ---
+
+    def handle_completion(self, req, chat):
+        mock = self.mock
+        model = req["model"]
+        options = req.get("options") or {}
+        keep_alive_s = parse_keep_alive(req.get("keep_alive"))
+        stream = req.get("stream", True)
+
+        if chat:
+            messages = req.get("messages") or []
+            prompt = "\n".join(f"{m.get('role', 'user')}: {m.get('content', '')}" for m in messages)
+            images = [img for m in messages for img in (m.get("images") or [])]
+        else:
+            prompt = (req.get("system") or "") + (req.get("prompt") or "")
+            images = req.get("images") or []
+            # Ollama: prompt kosong + keep_alive=0 berarti unload model, prompt kosong lainnya hanya memuat model
+            if not req.get("prompt") and not images:
+                if keep_alive_s == 0:
+                    mock.unload(model)
+                    return self.send_json({"model": model, "created_at": iso_now(), "response": "",
+                                           "done": True, "done_reason": "unload"})
+                start = time.perf_counter()
+                load = mock.ensure_loaded(model, keep_alive_s)
+                return self.send_json({"model": model, "created_at": iso_now(), "response": "",
+                                       "done": True, "done_reason": "load",
+                                       "total_duration": int((time.perf_counter() - start) * 1e9),
+                                       "load_duration": int(load * 1e9)})
+
+        slot = mock.admit(model)
+        try:
+            start = time.perf_counter()
+            load = mock.ensure_loaded(model, keep_alive_s)
+            if stream:
+                self.start_stream()
+            prompt_tokens, prompt_dur = mock.prefill(model, prompt, options.get("num_ctx"), images)
+
+            def emit(text):
+                chunk = {"model": model, "created_at": iso_now(), "done": False}
+                if chat:
+                    chunk["message"] = {"role": "assistant", "content": text}
+                else:
+                    chunk["response"] = text
+                self.write_chunk(chunk)
+
+            num_predict = options.get("num_predict")
+            eval_count, eval_dur = mock.decode(model, num_predict, emit if stream else None)
+            total = time.perf_counter() - start
+        finally:
+            mock.finish(model, slot)
+            mock.release(model, keep_alive_s)
+
+        final = {
+            "model": model,
+            "created_at": iso_now(),
+            "done": True,
+            "done_reason": "length" if num_predict is not None and num_predict >= 0 else "stop",
+            "total_duration": int(total * 1e9),
+            "load_duration": int(load * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_dur * 1e9),
+            "eval_count": eval_count,
+            "eval_duration": int(eval_dur * 1e9),
+        }
+        # Saat streaming teks sudah dikirim per token; potongan final kosong seperti Ollama
+        content = "" if stream else " ".join(WORDS[i % len(WORDS)] for i in range(eval_count))
+        if chat:
+            final["message"] = {"role": "assistant", "content": content}
+        else:
+            final["response"] = content
+        if stream:
+            self.write_chunk(final)
+            self.end_stream()
+        else:
+            self.send_json(final)
+
+    def handle_embed(self, req):
+        inputs = req.get("input", "")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        vectors, tokens, load, total = self.mock.embed(req["model"], inputs, parse_keep_alive(req.get("keep_alive")))
+        self.send_json({
+            "model": req["model"],
+            "embeddings": vectors,
+            "total_duration": int(total * 1e9),
+            "load_duration": int(load * 1e9),
+            "prompt_eval_count": tokens,
+        })
+
+    def handle_show(self, req):
+        model = req["model"]
+        self.send_json({
+            "details": {"format": "gguf", "family": model.split(":")[0], "quantization_level": "Q4_K_M"},
+            "model_info": {"general.architecture": "llama", "llama.block_count": MOCK_BLOCK_COUNT},
+        })
+
+    def handle_embeddings(self, req):
+        vectors, _, _, _ = self.mock.embed(req["model"], [req.get("prompt", "")], parse_keep_alive(req.get("keep_alive")))
+        self.send_json({"embedding": vectors[0]})
+
+
+class MockOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, mock):
+        self.mock = mock
+        super().__init__(address, MockHandler)
+
+
+def start_in_thread(mock=None, host="127.0.0.1", port=0):
+    """Jalankan mock server di background thread; kembalikan (server, base_url '.../api')."""
+    server = MockOllamaServer((host, port), mock or MockOllama())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/api"
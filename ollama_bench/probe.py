@@ -0,0 +1,241 @@
+"""Continuous low-rate canary with a Prometheus /metrics endpoint.
+
+run_probe sends one simulate_user_request (streaming, so TTFT is known)
+every interval, forever or until a limit, and records the outcome in a
+small in-process registry. An HTTP thread serves the registry in the
+Prometheus text exposition format, so existing Prometheus/Alertmanager
+rules can scrape the canary like any other target.
+
+Exported series (label ``model``, plus ``endpoint`` when several endpoints
+are probed side by side, one probe loop each):
+
+    ollama_probe_ttft_seconds                 histogram
+    ollama_probe_decode_tokens_per_second     histogram
+    ollama_probe_prefill_tokens_per_second    histogram
+    ollama_probe_queue_wait_seconds           histogram
+    ollama_probe_request_duration_seconds     histogram
+    ollama_probe_requests_total{result}       counter (success / error)
+    ollama_probe_error_ratio                  gauge, errors in the last ERROR_WINDOW probes
+    ollama_probe_last_decode_tokens_per_second, ollama_probe_last_ttft_seconds  gauges
+    ollama_probe_last_success_timestamp_seconds                                gauge
+"""
+import asyncio
+import collections
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .client import AsyncOllamaClient
+from .loadgen import DEFAULT_OPTIONS, PROMPT, REQUEST_TIMEOUT_S, simulate_user_request
+
+DEFAULT_INTERVAL_S = 30.0
+DEFAULT_PORT = 9464
+# Batasi panjang jawaban: canary harus murah bagi server produksi
+PROBE_OPTIONS = dict(DEFAULT_OPTIONS, num_predict=128)
+ERROR_WINDOW = 20
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120)
+TPS_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 250, 500)
+PREFILL_BUCKETS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_value(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+class Histogram:
+    """Histogram kumulatif ala Prometheus untuk satu kombinasi label."""
+
+    def __init__(self, buckets):
+        self.bounds = tuple(buckets) + (math.inf,)
+        self.counts = [0] * len(self.bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, n in zip(self.bounds, self.counts):
+            cumulative += n
+            yield f"{name}_bucket{format_labels(dict(labels, le=format_value(bound)))} {cumulative}"
+        yield f"{name}_sum{format_labels(labels)} {format_value(self.sum)}"
+        yield f"{name}_count{format_labels(labels)} {self.count}"
+
+
+class MetricsRegistry:
+    """Registry kecil (histogram, counter, gauge) yang aman dibaca dari thread HTTP."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.meta = {}  # nama -> (tipe, help, buckets)
+        self.series = collections.OrderedDict()  # nama -> {label tuple: nilai atau Histogram}
+
+    def define(self, kind, name, help_text, buckets=None):
+        self.meta[name] = (kind, help_text, buckets)
+        self.series[name] = {}
+
+    def _key(self, labels):
+        return tuple(sorted(labels.items()))
+
+    def observe(self, name, value, **labels):
+        with self.lock:
+            series = self.series[name]
+            key = self._key(labels)
+            if key not in series:
+                series[key] = Histogram(self.meta[name][2])
+            series[key].observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        with self.lock:
+            series = self.series[name]
+            key = self._key(labels)
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.series[name][self._key(labels)] = value
+
+    def exposition(self):
+        """Seluruh metrik dalam format teks Prometheus 0.0.4."""
+        out = []
+        with self.lock:
+            for name, series in self.series.items():
+                kind, help_text, _ = self.meta[name]
+                out.append(f"# HELP {name} {help_text}")
+                out.append(f"# TYPE {name} {kind}")
+                for key, value in series.items():
+                    labels = dict(key)
+                    if kind == "histogram":
+                        out.extend(value.lines(name, labels))
+                    else:
+                        out.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        return "\n".join(out) + "\n"
+
+
+def probe_registry():
+    registry = MetricsRegistry()
+    registry.define("histogram", "ollama_probe_ttft_seconds", "Time to first token of probe requests",
+                    LATENCY_BUCKETS)
+    registry.define("histogram", "ollama_probe_decode_tokens_per_second", "Decode speed reported by Ollama",
+                    TPS_BUCKETS)
+    registry.define("histogram", "ollama_probe_prefill_tokens_per_second", "Prompt processing speed",
+                    PREFILL_BUCKETS)
+    registry.define("histogram", "ollama_probe_queue_wait_seconds",
+                    "Client latency not spent loading, prefilling or decoding (server queue + network)",
+                    LATENCY_BUCKETS)
+    registry.define("histogram", "ollama_probe_request_duration_seconds", "End-to-end probe request latency",
+                    LATENCY_BUCKETS)
+    registry.define("counter", "ollama_probe_requests_total", "Probe requests by result")
+    registry.define("gauge", "ollama_probe_error_ratio", f"Failed share of the last {ERROR_WINDOW} probes")
+    registry.define("gauge", "ollama_probe_last_ttft_seconds", "TTFT of the most recent successful probe")
+    registry.define("gauge", "ollama_probe_last_decode_tokens_per_second",
+                    "Decode speed of the most recent successful probe")
+    registry.define("gauge", "ollama_probe_last_success_timestamp_seconds",
+                    "Unix time of the most recent successful probe")
+    return registry
+
+
+def record_probe(registry, result, recent, endpoint=None):
+    """Masukkan satu hasil simulate_user_request ke registry; recent = deque sukses/gagal terakhir.
+
+    endpoint: nilai label ``endpoint`` jika beberapa endpoint di-probe sekaligus, selain itu None.
+    """
+    labels = {"model": result['model']}
+    if endpoint is not None:
+        labels["endpoint"] = endpoint
+    recent.append(result['success'])
+    registry.inc("ollama_probe_requests_total", result="success" if result['success'] else "error", **labels)
+    registry.set("ollama_probe_error_ratio", recent.count(False) / len(recent), **labels)
+    if not result['success']:
+        return
+    registry.observe("ollama_probe_request_duration_seconds", result['duration'], **labels)
+    registry.observe("ollama_probe_queue_wait_seconds", result['queue_wait'], **labels)
+    if result['ttft'] is not None:
+        registry.observe("ollama_probe_ttft_seconds", result['ttft'], **labels)
+        registry.set("ollama_probe_last_ttft_seconds", result['ttft'], **labels)
+    if result['tps'] > 0:
+        registry.observe("ollama_probe_decode_tokens_per_second", result['tps'], **labels)
+        registry.set("ollama_probe_last_decode_tokens_per_second", result['tps'], **labels)
+    if result['prompt_tps'] > 0:
+        registry.observe("ollama_probe_prefill_tokens_per_second", result['prompt_tps'], **labels)
+    registry.set("ollama_probe_last_success_timestamp_seconds", time.time(), **labels)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.exposition().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrape tiap 15 detik tidak perlu masuk log
+
+
+class MetricsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, registry):
+        self.registry = registry
+        super().__init__(address, MetricsHandler)
+
+
+def serve_metrics(registry, host="0.0.0.0", port=DEFAULT_PORT):
+    """Jalankan endpoint /metrics di background thread; kembalikan server (shutdown() untuk berhenti)."""
+    server = MetricsServer((host, port), registry)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+async def run_probe(model_name, api_url, registry, interval=DEFAULT_INTERVAL_S, limit=None, prompt=PROMPT,
+                    options=None, verbose=True, endpoint=None):
+    """Kirim satu probe per interval (berurutan, tidak pernah menumpuk) sampai limit atau dihentikan.
+
+    endpoint: label untuk metrik dan log saat beberapa run_probe berjalan bersamaan.
+    """
+    tag = f"Probe {endpoint} " if endpoint else "Probe "
+    recent = collections.deque(maxlen=ERROR_WINDOW)
+    sent = 0
+    async with AsyncOllamaClient(api_url, timeout=REQUEST_TIMEOUT_S, limit=1) as client:
+        next_at = time.perf_counter()
+        while limit is None or sent < limit:
+            sent += 1
+            result = await simulate_user_request(client, sent, model_name, prompt,
+                                                 PROBE_OPTIONS if options is None else options,
+                                                 verbose=False, stream=True)
+            record_probe(registry, result, recent, endpoint)
+            if verbose:
+                if result['success']:
+                    print(f"   [{tag}{sent}] OK {result['duration']:.2f}s | TTFT {result['ttft'] or 0:.2f}s | "
+                          f"decode {result['tps']:.1f} t/s | prefill {result['prompt_tps']:.0f} t/s | "
+                          f"queue {result['queue_wait']:.2f}s")
+                else:
+                    print(f"   [{tag}{sent}] ERROR after {result['duration']:.2f}s: {result['error']}")
+            # Jadwal tetap; jika probe lebih lama dari interval, probe berikutnya langsung dikirim
+            next_at = max(next_at + interval, time.perf_counter())
+            if limit is None or sent < limit:
+                await asyncio.sleep(next_at - time.perf_counter())
+    return sent
@@ -0,0 +1,26 @@
+"""Synthetic prompt text of a requested size.
+
+Sizes are approximate: English text tokenizes at roughly four characters per
+token, so scripts should report the server's prompt_eval_count rather than
+the requested size.
+"""
+import random
+
+CHARS_PER_TOKEN = 4
+
+WORDS = ("the system records every order shipment and invoice in a central ledger while regional teams review "
+         "exceptions each quarter and report delays to the operations board which then adjusts supplier "
+         "contracts budgets and staffing for the following period based on audited numbers").split()
+
+
+def filler_text(tokens, seed=0):
+    """Teks dokumen acak (deterministik per seed) dengan panjang ~tokens token."""
+    rng = random.Random(seed)
+    target = tokens * CHARS_PER_TOKEN
+    parts = []
+    size = 0
+    while size < target:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 16))).capitalize() + "."
+        parts.append(sentence)
+        size += len(sentence) + 1
+    return " ".join(parts)[:target]
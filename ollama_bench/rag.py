@@ -0,0 +1,130 @@
+"""Retrieval-augmented generation pipeline for the text suite.
+
+A synthetic policy corpus is embedded in batches through /api/embed into an
+in-memory cosine-similarity index (NumPy); each query is embedded, the top-k
+chunks are retrieved and stuffed into the generate prompt. Every stage is
+timed separately: embed, search, prefill (prompt_eval) and decode (eval).
+"""
+import random
+import time
+
+try:
+    import numpy as np
+except ImportError:  # RAG_FLOW dilewati tanpa numpy
+    np = None
+
+from .metrics import get_metrics
+
+TOPICS = [
+    "data retention", "remote work", "expense reimbursement", "incident response", "access control",
+    "vendor onboarding", "password rotation", "travel booking", "code review", "customer escalation",
+    "backup restore", "laptop encryption",
+]
+DEPARTMENTS = ["finance", "engineering", "legal", "sales", "support", "security", "operations", "hr"]
+FILLER = [
+    "Exceptions must be approved in writing by the department head.",
+    "Records are reviewed quarterly by the compliance team.",
+    "Violations are reported to the internal audit committee within five business days.",
+    "Employees acknowledge this policy during annual training.",
+    "Temporary contractors follow the same rules as permanent staff.",
+    "The policy owner publishes changes on the intranet with a two week notice period.",
+    "Requests are tracked in the ticketing system with a unique reference number.",
+    "Regional offices may add stricter local requirements.",
+]
+
+
+def build_corpus(n_docs, seed=0):
+    """Dokumen kebijakan sintetis (deterministik); tiap dokumen kira-kira 80-120 token."""
+    rng = random.Random(seed)
+    docs = []
+    for i in range(n_docs):
+        topic = TOPICS[i % len(TOPICS)]
+        dept = DEPARTMENTS[(i // len(TOPICS)) % len(DEPARTMENTS)]
+        limit = rng.choice([3, 7, 14, 30, 90, 365])
+        text = (f"Policy {i} for the {dept} department on {topic}: every {topic} request in {dept} "
+                f"must be completed within {limit} days and logged by the {dept} lead. "
+                + " ".join(rng.sample(FILLER, 3)))
+        docs.append(text)
+    return docs
+
+
+def build_queries(n_queries, seed=1):
+    """Pertanyaan user yang menyebut departemen dan topik dari korpus."""
+    rng = random.Random(seed)
+    return [f"How many days does the {rng.choice(DEPARTMENTS)} department have for {rng.choice(TOPICS)} requests?"
+            for _ in range(n_queries)]
+
+
+class VectorIndex:
+    """Indeks cosine similarity di memori: matriks float32 yang sudah dinormalisasi per baris."""
+
+    def __init__(self):
+        if np is None:
+            raise ImportError("VectorIndex requires numpy: pip install numpy")
+        self.vectors = None
+        self.docs = []
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, vectors, docs):
+        v = np.asarray(vectors, dtype=np.float32)
+        v /= np.maximum(np.linalg.norm(v, axis=1, keepdims=True), 1e-12)
+        self.vectors = v if self.vectors is None else np.vstack([self.vectors, v])
+        self.docs.extend(docs)
+
+    def search(self, vector, k=4):
+        """Top-k (dokumen, skor) berurutan dari skor tertinggi."""
+        q = np.asarray(vector, dtype=np.float32)
+        scores = self.vectors @ (q / max(float(np.linalg.norm(q)), 1e-12))
+        k = min(k, len(self.docs))
+        # argpartition O(n), lalu urutkan hanya k kandidat
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.docs[i], float(scores[i])) for i in top]
+
+
+def embed_corpus(client, model, docs, batch_size=32):
+    """Ingest korpus lewat /api/embed per batch; kembalikan (index, statistik ingest)."""
+    index = VectorIndex()
+    tokens = 0
+    start = time.perf_counter()
+    for i in range(0, len(docs), batch_size):
+        batch = docs[i:i + batch_size]
+        res = client.embed(model, batch)
+        index.add(res["embeddings"], batch)
+        tokens += res.get("prompt_eval_count", 0)
+    seconds = time.perf_counter() - start
+    return index, {
+        "docs": len(docs),
+        "batches": -(-len(docs) // batch_size),
+        "seconds": seconds,
+        "docs_per_s": len(docs) / seconds if seconds > 0 else 0.0,
+        "tokens_per_s": tokens / seconds if seconds > 0 else 0.0,
+        "dim": index.vectors.shape[1] if len(index) else 0,
+    }
+
+
+def rag_prompt(question, chunks):
+    context = "\n\n".join(f"[{n}] {doc}" for n, (doc, _) in enumerate(chunks, 1))
+    return (f"Answer the question using only the context below. Cite the chunk numbers you used.\n\n"
+            f"Context:\n{context}\n\nQuestion: {question}\nAnswer:")
+
+
+def rag_query(client, index, embed_model, model, question, top_k=4, options=None):
+    """Satu request RAG end-to-end; metrik get_metrics plus embed_time dan search_time."""
+    start = time.perf_counter()
+    vector = client.embed(embed_model, question)["embeddings"][0]
+    embed_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chunks = index.search(vector, top_k)
+    search_time = time.perf_counter() - start
+
+    payload = {"model": model, "prompt": rag_prompt(question, chunks)}
+    if options:
+        payload["options"] = options
+    m = get_metrics(client.generate(payload))
+    m["embed_time"] = embed_time
+    m["search_time"] = search_time
+    return m
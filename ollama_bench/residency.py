@@ -0,0 +1,103 @@
+"""Model residency helpers: unload, pin, cold-start timing and run ordering.
+
+Ollama keeps a model in memory for ``keep_alive`` after its last request
+and evicts other models when memory runs out, so the first request after a
+swap silently pays ``load_duration``. These helpers make loading explicit.
+"""
+import time
+
+from .metrics import get_metrics
+
+# load_duration di atas ini pada request "warm" dianggap reload (model sempat ter-evict)
+RELOAD_THRESHOLD_S = 0.25
+
+
+def model_name(model):
+    """Nama lengkap seperti di /api/ps ('llama3' -> 'llama3:latest')."""
+    return model if ":" in model else f"{model}:latest"
+
+
+def loaded_models(client):
+    """Model yang sedang resident menurut /api/ps, urut seperti yang dilaporkan server."""
+    return [m["name"] for m in client.get("ps").get("models", [])]
+
+
+def unload_model(client, model, timeout=60.0):
+    """Unload model (keep_alive=0) dan tunggu sampai hilang dari /api/ps."""
+    client.generate({"model": model, "keep_alive": 0})
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if model_name(model) not in loaded_models(client):
+            return True
+        time.sleep(0.5)
+    return False
+
+
+def load_model(client, model, keep_alive="30m", embed=False):
+    """Muat (dan pin) model dengan prompt/input kosong; kembalikan load_duration dalam detik.
+
+    Model embedding tidak mendukung /api/generate, jadi dimuat lewat /api/embed.
+    """
+    if embed:
+        data = client.embed(model, [], keep_alive=keep_alive)
+    else:
+        data = client.generate({"model": model, "keep_alive": keep_alive})
+    return data.get("load_duration", 0) / 1e9
+
+
+def measure_cold_start(client, model, prompt="Hi", keep_alive=None):
+    """Unload model lalu ukur request pertama, memisahkan waktu load dari inferensi."""
+    unloaded = unload_model(client, model)
+    payload = {"model": model, "prompt": prompt}
+    if keep_alive is not None:
+        payload["keep_alive"] = keep_alive
+    start = time.perf_counter()
+    data = client.generate(payload)
+    wall = time.perf_counter() - start
+    m = get_metrics(data)
+    return {
+        "model": model,
+        "cold": unloaded,
+        "cold_wall": wall,
+        "load_time": m["load_time"],
+        "inference_time": max(0.0, m["latency"] - m["load_time"]),
+        "gen_tps": m["gen_tps"],
+    }
+
+
+def plan_model_order(models, resident):
+    """Urutkan model agar swap minimal: yang sudah resident diukur lebih dulu.
+
+    Setiap model dijalankan dalam satu blok berurutan, jadi dengan urutan ini
+    tiap model paling banyak dimuat satu kali, dan model yang sudah ada di
+    memori tidak perlu dimuat ulang setelah ter-evict oleh model lain.
+    """
+    resident = [model_name(m) for m in resident]
+    first = [m for m in models if model_name(m) in resident]
+    first.sort(key=lambda m: resident.index(model_name(m)))
+    return first + [m for m in models if m not in first]
+
+
+def keep_alive_value(text):
+    """Argumen CLI keep_alive: angka dikirim sebagai detik (-1 = selamanya), selain itu durasi seperti '30m'."""
+    try:
+        return int(text)
+    except ValueError:
+        return text
+
+
+def add_keep_alive_argument(parser, default=None):
+    """--keep-alive untuk semua script; default None = default server."""
+    shown = "server default" if default is None else "%(default)s"
+    parser.add_argument("--keep-alive", type=keep_alive_value, default=default,
+                        help=f"keep_alive sent with every request, e.g. 30m or -1 to pin models (default: {shown})")
+
+
+def add_residency_arguments(parser):
+    add_keep_alive_argument(parser)
+    parser.add_argument("--cold-start", action="store_true",
+                        help="Unload each model first and measure its cold start (load time vs first inference)")
+    parser.add_argument("--unload-after", action="store_true",
+                        help="Unload each model after its scenarios so the next model loads without evictions")
+    parser.add_argument("--keep-order", action="store_true",
+                        help="Run models in the given order instead of starting with models already in memory")
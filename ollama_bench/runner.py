@@ -0,0 +1,183 @@
+"""Closed-loop scenario runner and console reporting for the suites."""
+import concurrent.futures
+import statistics
+import sys
+from datetime import datetime
+
+from .stats import BatchStats, timed
+from .telemetry import TELEMETRY_FIELDS
+
+# Kolom CSV standar untuk satu baris skenario (satu level concurrency)
+SCENARIO_FIELDS = [
+    'time', 'scenario', 'users', 'successes', 'failures',
+    'avg_tps', 'min_tps', 'max_tps', 'prompt_tps', 'prompt_eval_time', 'sys_throughput',
+    'latency', 'lat_p50', 'lat_p90', 'lat_p95', 'lat_p99', 'lat_max', 'wall_time', 'total_tokens',
+    'load_time', 'embed_time', 'search_time', 'eval_time',
+] + TELEMETRY_FIELDS
+
+# Tahap pipeline yang dirata-rata per skenario jika ada di hasil task (lihat ollama_bench.rag)
+STAGE_FIELDS = ['embed_time', 'search_time', 'eval_time']
+
+# Color codes
+GREEN = "\033[92m"
+YELLOW = "\033[93m"
+RED = "\033[91m"
+RESET = "\033[0m"
+
+STATUS_COLORS = {"PASS": GREEN, "WARN": YELLOW, "FAIL": RED, "CRITICAL": RED}
+
+
+def log(msg):
+    # Di terminal, hapus dulu baris status live (lihat ollama_bench.live) agar log tidak menempel
+    clear = "\r\033[K" if sys.stdout.isatty() else ""
+    print(f"{clear}[{datetime.now().strftime('%H:%M:%S')}] {msg}")
+
+
+def scenario_status(fail, users):
+    """PASS / WARN / FAIL / CRITICAL berdasarkan jumlah request gagal."""
+    status = "PASS"
+    if fail > 0:
+        status = "WARN"
+    if fail > (users * 0.2) and users > 1: # >20% failures
+        status = "FAIL"
+    if fail == users:
+        status = "CRITICAL"
+    return status
+
+
+def aggregate(name, concurrency, results, batch):
+    """Gabungkan metrik per-request (dari get_metrics) dan BatchStats menjadi satu baris skenario."""
+    lat = batch.latency
+    stat = {
+        'time': datetime.now().strftime('%H:%M:%S'),
+        'scenario': name,
+        'users': concurrency,
+        'successes': batch.successes,
+        'failures': batch.failures,
+        'avg_tps': 0.0,
+        'min_tps': 0.0,
+        'max_tps': 0.0,
+        'prompt_tps': 0.0,
+        'prompt_eval_time': 0.0,
+        # Total token yang diproduksi seluruh sistem per detik (wall-clock batch di client)
+        'sys_throughput': batch.throughput,
+        'latency': lat.mean,
+        'wall_time': batch.wall_time,
+        'total_tokens': batch.total_tokens,
+        # Waktu terlama yang dihabiskan server memuat model dalam batch ini (0 jika model sudah resident)
+        'load_time': 0.0,
+    }
+    stat.update({key: 0.0 for key in STAGE_FIELDS})
+    stat.update(lat.summary())
+    if results:
+        model_speeds = [r['gen_tps'] for r in results]
+        stat['avg_tps'] = statistics.mean(model_speeds)
+        stat['min_tps'] = min(model_speeds)
+        stat['max_tps'] = max(model_speeds)
+        stat['prompt_tps'] = statistics.mean([r['prompt_tps'] for r in results])
+        stat['prompt_eval_time'] = statistics.mean([r['prompt_eval_time'] for r in results])
+        stat['load_time'] = max(r.get('load_time', 0.0) for r in results)
+        for key in STAGE_FIELDS:
+            values = [r[key] for r in results if key in r]
+            if values:
+                stat[key] = statistics.mean(values)
+    return stat
+
+
+def print_scenario(stat):
+    print(f"   > Success/Fail         : {stat['successes']}/{stat['failures']}")
+    print(f"   > Avg Gen Speed (User) : {stat['avg_tps']:.2f} t/s")
+    print(f"   > Prompt Reading       : {stat['prompt_tps']:.2f} t/s ({stat['prompt_eval_time']:.2f} s)")
+    print(f"   > Latency p50/p95/p99  : {stat['lat_p50']:.2f}/{stat['lat_p95']:.2f}/{stat['lat_p99']:.2f} s (max {stat['lat_max']:.2f} s)")
+    if stat['embed_time'] > 0:
+        print(f"   > Stages (avg)         : embed {stat['embed_time'] * 1000:.1f} ms | search {stat['search_time'] * 1000:.2f} ms | "
+              f"prefill {stat['prompt_eval_time']:.2f} s | decode {stat['eval_time']:.2f} s")
+    print(f"   > Batch Wall Time      : {stat['wall_time']:.2f} s")
+    if stat['load_time'] > 0.1:
+        print(f"   > Model Load (max)     : {stat['load_time']:.2f} s (model was not resident)")
+    print(f"   > System Throughput    : {stat['sys_throughput']:.2f} t/s")
+    if stat.get('telemetry_samples'):
+        pressure = f", PSI {stat['mem_pressure']:.1f}%" if stat['mem_pressure'] is not None else ""
+        print(f"   > Host                 : CPU {stat['cpu_avg']:.0f}% (core max {stat['cpu_core_max']:.0f}%) | "
+              f"mem {stat['mem_used_pct']:.0f}% | swap {stat['swap_used_mb']:.0f} MB | RSS {stat['ollama_rss_mb']:.0f} MB{pressure}")
+    print("-" * 60)
+
+
+def run_scenario(name, func, concurrency, sink=None, telemetry=None, live=None):
+    """Jalankan func(user_id) secara bersamaan untuk `concurrency` user (closed-loop).
+
+    func mengembalikan dict dari get_metrics, atau None jika request gagal.
+    Hasil per-request yang sukses tetap tersedia di stat['results'] (tidak ditulis ke CSV).
+    telemetry: TelemetrySampler opsional; sampel selama batch digabung ke baris skenario.
+    live: LiveDashboard opsional; menerima event start/selesai per request selama batch.
+    """
+    log(f"--- RUNNING: {name} ({concurrency} Users) ---")
+    results = []
+
+    # Jendela batch diukur di sisi client: dari submit pertama sampai response terakhir
+    batch = BatchStats()
+    batch.start()
+    if live is not None:
+        live.begin(f"{name} @ {concurrency}u", concurrency)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(timed, func, i) for i in range(concurrency)]
+        if live is not None:
+            live.started(concurrency)
+        for f in concurrent.futures.as_completed(futures):
+            res, elapsed = f.result()
+            if res: results.append(res)
+            batch.record(elapsed, res['tokens_out'] if res else 0, success=bool(res))
+            if live is not None:
+                live.finished(elapsed, res['tokens_out'] if res else 0, success=bool(res))
+    batch.stop()
+    if live is not None:
+        live.end()
+
+    stat = aggregate(name, concurrency, results, batch)
+    if telemetry is not None:
+        stat.update(telemetry.summary(batch.started, batch.finished))
+    stat['results'] = results
+    if not results:
+        log("No results captured.")
+    print_scenario(stat)
+    if sink:
+        sink.write(stat)
+    return stat
+
+
+def print_config(title, config, width=60):
+    print("=" * width)
+    print(f"{title:^{width}}")
+    print("=" * width)
+    for label, value in config.items():
+        print(f" {label:<17}: {value}")
+    print("=" * width)
+
+
+def print_summary_table(all_stats, title, config, extra_columns=()):
+    """Tabel ringkasan akhir.
+
+    extra_columns: list of (header, key) yang ditampilkan sebelum kolom p95.
+    """
+    extra_width = sum(max(len(h), 8) + 3 for h, _ in extra_columns)
+    width = 98 + extra_width
+
+    # Print Configuration Block
+    print("")
+    print_config(f"{title} - CONFIGURATION", config, width)
+
+    print("\n" + "="*width)
+    print(f"{'FINAL SUMMARY REPORT':^{width}}")
+    print("="*width)
+    extra_header = "".join(f" | {h:<{max(len(h), 8)}}" for h, _ in extra_columns)
+    print(f"{'Scenario':<25} | {'Users':<6} | {'Pass':<5} | {'Fail':<5} | {'Avg TPS':<10}{extra_header} | {'Sys T/s':<10} | {'p95 Lat(s)':<10} | {'Status':<10}")
+    print("-" * width)
+
+    for stat in all_stats:
+        if not stat: continue
+
+        status = scenario_status(stat['failures'], stat['users'])
+        colored = f"{STATUS_COLORS[status]}{status}{RESET}"
+        extra = "".join(f" | {stat.get(key, 0.0):<{max(len(h), 8)}.2f}" for h, key in extra_columns)
+        print(f"{stat['scenario']:<25} | {stat['users']:<6} | {stat['successes']:<5} | {stat['failures']:<5} | {stat['avg_tps']:<10.2f}{extra} | {stat['sys_throughput']:<10.2f} | {stat['lat_p95']:<10.2f} | {colored}")
+    print("="*width + "\n")
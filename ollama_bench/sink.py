@@ -0,0 +1,39 @@
+"""CSV result sink shared by all scripts."""
+import csv
+import os
+
+
+class CsvSink:
+    """Append rows to a CSV file, writing the header once when the file is new.
+
+    Keys not in ``fieldnames`` are ignored, missing keys are left empty, so
+    one schema can hold rows from different scenario types.
+    """
+
+    def __init__(self, path, fieldnames):
+        self.path = path
+        self.fieldnames = list(fieldnames)
+
+    def write(self, row):
+        self.write_rows([row])
+
+    def write_rows(self, rows):
+        write_header = not os.path.exists(self.path)
+        with open(self.path, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.fieldnames, extrasaction='ignore')
+            if write_header: writer.writeheader()
+            writer.writerows(rows)
+
+
+class MultiSink:
+    """Write the same rows to several sinks (e.g. the CSV file and the result store); None is skipped."""
+
+    def __init__(self, *sinks):
+        self.sinks = [s for s in sinks if s is not None]
+
+    def write(self, row):
+        self.write_rows([row])
+
+    def write_rows(self, rows):
+        for sink in self.sinks:
+            sink.write_rows(rows)
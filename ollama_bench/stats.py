@@ -0,0 +1,235 @@
+"""Shared latency/throughput statistics for the benchmark scripts.
+
+All timestamps are taken on the client with time.perf_counter(), so the
+batch window covers every request (successful or not) from the first send
+to the last response.
+"""
+import math
+import random
+import statistics
+import time
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram for latencies in seconds.
+
+    Values are stored as integer microseconds in buckets whose width grows
+    with magnitude, keeping ``precision_bits`` significant bits (10 bits is
+    roughly 0.1% relative error). Memory stays bounded no matter how many
+    samples are recorded, and two histograms can be merged exactly.
+    """
+
+    def __init__(self, precision_bits=10):
+        self.precision_bits = precision_bits
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, units):
+        shift = max(0, units.bit_length() - self.precision_bits)
+        return (units >> shift) << shift
+
+    def _width(self, bucket):
+        return 1 << max(0, bucket.bit_length() - self.precision_bits)
+
+    def record(self, seconds, count=1):
+        units = max(0, int(round(seconds * 1e6)))
+        bucket = self._bucket(units)
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += count
+        self.total += seconds * count
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def merge(self, other):
+        """Tambahkan isi histogram lain (misal dari worker lain) ke histogram ini."""
+        if other.precision_bits != self.precision_bits:
+            raise ValueError("Cannot merge histograms with different precision")
+        for bucket, n in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + n
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, pct):
+        """Nilai latency (detik) pada persentil pct (0-100)."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(pct / 100.0 * self.count))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                value = (bucket + self._width(bucket) / 2.0) / 1e6
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self, prefix="lat_"):
+        out = {f"{prefix}p{p}": self.percentile(p) for p in PERCENTILES}
+        out[f"{prefix}max"] = self.max or 0.0
+        out[f"{prefix}mean"] = self.mean
+        return out
+
+
+class BatchStats:
+    """Client-side accounting for one batch of concurrent requests."""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.successes = 0
+        self.failures = 0
+        self.total_tokens = 0
+        self.started = None
+        self.finished = None
+
+    def start(self, at=None):
+        self.started = time.perf_counter() if at is None else at
+
+    def stop(self, at=None):
+        self.finished = time.perf_counter() if at is None else at
+
+    def record(self, latency, tokens=0, success=True):
+        if success:
+            self.successes += 1
+            self.total_tokens += tokens
+            self.latency.record(latency)
+        else:
+            self.failures += 1
+
+    @property
+    def requests(self):
+        return self.successes + self.failures
+
+    @property
+    def wall_time(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    @property
+    def throughput(self):
+        """Total token dari semua request sukses dibagi jendela wall-clock batch."""
+        return self.total_tokens / self.wall_time if self.wall_time > 0 else 0.0
+
+    def summary(self):
+        out = {
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "total_tokens": self.total_tokens,
+            "wall_time": self.wall_time,
+            "sys_throughput": self.throughput,
+        }
+        out.update(self.latency.summary())
+        return out
+
+
+def timed(func, *args):
+    """Panggil func(*args) dan kembalikan (hasil, latency client dalam detik)."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def reject_outliers(values, k=1.5):
+    """Buang sampel di luar pagar Tukey (Q1 - k*IQR, Q3 + k*IQR); butuh minimal 4 sampel."""
+    if len(values) < 4:
+        return list(values)
+    q1, _, q3 = statistics.quantiles(values, n=4, method='inclusive')
+    iqr = q3 - q1
+    lo, hi = q1 - k * iqr, q3 + k * iqr
+    return [v for v in values if lo <= v <= hi]
+
+
+def coefficient_of_variation(values):
+    """Standar deviasi / mean (0 jika kurang dari 2 sampel)."""
+    if len(values) < 2:
+        return 0.0
+    mean = statistics.mean(values)
+    return statistics.stdev(values) / mean if mean else 0.0
+
+
+def bootstrap_ci(groups, confidence=0.95, iterations=2000, seed=0):
+    """Confidence interval bootstrap untuk rata-rata dari rata-rata tiap grup.
+
+    groups: list of list sampel (misal sampel t/s per skenario). Resampling
+    dilakukan di dalam tiap grup, sehingga perbedaan antar skenario tidak
+    dianggap noise. Dengan satu grup ini sama dengan bootstrap biasa untuk mean.
+    """
+    groups = [g for g in groups if g]
+    if not groups:
+        return 0.0, 0.0
+    rng = random.Random(seed)
+    estimates = []
+    for _ in range(iterations):
+        means = [statistics.fmean(rng.choices(g, k=len(g))) for g in groups]
+        estimates.append(statistics.fmean(means))
+    estimates.sort()
+    alpha = (1 - confidence) / 2
+    lo = estimates[int(alpha * (iterations - 1))]
+    hi = estimates[int((1 - alpha) * (iterations - 1))]
+    return lo, hi
+
+
+def _exact_u_cdf(u, n1, n2):
+    """P(U <= u) tanpa ties: jumlah susunan rank dengan statistik U tertentu, dihitung dengan DP."""
+    # counts[j][k] = banyaknya susunan j elemen grup kedua (dengan i elemen grup pertama) yang menghasilkan U = k
+    counts = [[1] + [0] * (n1 * n2) for _ in range(n2 + 1)]
+    for i in range(1, n1 + 1):
+        new = [[0] * (n1 * n2 + 1) for _ in range(n2 + 1)]
+        new[0][0] = 1
+        for j in range(1, n2 + 1):
+            for k in range(i * j + 1):
+                # Elemen terbesar dari grup pertama (menang atas j elemen) atau dari grup kedua
+                new[j][k] = (counts[j][k - j] if k >= j else 0) + new[j - 1][k]
+        counts = new
+    total = sum(counts[n2])
+    return sum(counts[n2][:int(u) + 1]) / total
+
+
+def mann_whitney_u(a, b):
+    """Uji Mann-Whitney U dua sisi; kembalikan (U sampel a, p-value).
+
+    Tidak mengasumsikan distribusi normal, cocok untuk latency yang ekornya panjang.
+    Sampel kecil tanpa ties memakai distribusi eksak, selain itu aproksimasi normal
+    dengan koreksi ties dan kontinuitas.
+    """
+    n1, n2 = len(a), len(b)
+    if not n1 or not n2:
+        return 0.0, 1.0
+    pooled = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    ranks = [0.0] * len(pooled)
+    ties = []
+    i = 0
+    while i < len(pooled):
+        j = i
+        while j + 1 < len(pooled) and pooled[j + 1][0] == pooled[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        if j > i:
+            ties.append(j - i + 1)
+        i = j + 1
+    rank_a = sum(r for r, (_, group) in zip(ranks, pooled) if group == 0)
+    u = rank_a - n1 * (n1 + 1) / 2
+    mean_u = n1 * n2 / 2
+    if not ties and n1 + n2 <= 30:
+        tail = _exact_u_cdf(min(u, n1 * n2 - u), n1, n2)
+        return u, min(1.0, 2 * tail)
+    n = n1 + n2
+    var_u = n1 * n2 / 12 * ((n + 1) - sum(t ** 3 - t for t in ties) / (n * (n - 1)))
+    if var_u <= 0:
+        return u, 1.0
+    z = (abs(u - mean_u) - 0.5) / math.sqrt(var_u)
+    return u, min(1.0, math.erfc(max(z, 0.0) / math.sqrt(2)))
@@ -0,0 +1,338 @@
+"""Append-only SQLite result store shared by all scripts.
+
+One database holds every run: run metadata (host, git SHA, Ollama version,
+model digests, CLI options), one row per scenario (the CSV row as JSON) and
+the per-request samples behind it. Rows are only ever inserted, so the
+file can be copied around and queried across months of runs::
+
+    runs(id, started_at, script, host, git_sha, ollama_version, api_url, model, model_digests, options, source)
+    scenarios(run_id, ts, model, scenario, users, data)
+    samples(run_id, ts, model, scenario, users, trial, success, latency, ttft, gen_tps, ...)
+
+CSV files from earlier runs (``Result/``) can be imported with import_csv;
+they only carry scenario aggregates (or per-trial rows for benchmark-ollama).
+"""
+import csv
+import json
+import os
+import re
+import socket
+import sqlite3
+import subprocess
+import time
+from datetime import datetime, timedelta
+
+from .metrics import percentile
+from .residency import model_name
+
+DEFAULT_DB = "results.db"
+
+# Kolom numerik per request; nama lama dari CSV lama dipetakan lewat SAMPLE_ALIASES
+SAMPLE_FIELDS = [
+    'latency', 'ttft', 'gen_tps', 'prompt_tps', 'prompt_eval_time', 'eval_time', 'load_time',
+    'tokens_in', 'tokens_out',
+]
+SAMPLE_ALIASES = {'tps': 'gen_tps', 'tokens': 'tokens_out', 'prompt_tokens': 'tokens_in', 'duration': 'latency',
+                  'prefill_time': 'prompt_eval_time', 'img_proc_time': 'prompt_eval_time'}
+
+# Awalan nama file CSV -> script asal
+CSV_SCRIPTS = {
+    "benchmark_results_": "benchmark-ollama",
+    "text_benchmark_": "benchmark-text-suite-ollama",
+    "vision_benchmark_": "benchmark-vision-suite-ollama",
+    "embed_benchmark_": "benchmark-embed-suite-ollama",
+    "prefill_benchmark_": "benchmark-prefill-ollama",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    script TEXT NOT NULL,
+    host TEXT,
+    git_sha TEXT,
+    ollama_version TEXT,
+    api_url TEXT,
+    model TEXT,
+    model_digests TEXT,
+    options TEXT,
+    source TEXT UNIQUE
+);
+CREATE TABLE IF NOT EXISTS scenarios (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    ts REAL NOT NULL,
+    model TEXT,
+    scenario TEXT,
+    users INTEGER,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    ts REAL NOT NULL,
+    model TEXT,
+    scenario TEXT,
+    users INTEGER,
+    trial INTEGER,
+    success INTEGER NOT NULL DEFAULT 1,
+    latency REAL, ttft REAL, gen_tps REAL, prompt_tps REAL, prompt_eval_time REAL, eval_time REAL,
+    load_time REAL, tokens_in INTEGER, tokens_out INTEGER
+);
+CREATE INDEX IF NOT EXISTS samples_lookup ON samples(model, scenario, ts);
+CREATE INDEX IF NOT EXISTS scenarios_lookup ON scenarios(model, scenario, ts);
+"""
+
+
+def parse_since(text):
+    """'30d', '12h', '2w' (relatif terhadap sekarang) atau tanggal ISO -> epoch detik."""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([hdw])", text.strip())
+    if match:
+        hours = {"h": 1, "d": 24, "w": 24 * 7}[match.group(2)]
+        return time.time() - float(match.group(1)) * hours * 3600
+    return datetime.fromisoformat(text).timestamp()
+
+
+def git_sha():
+    """Commit harness yang sedang dipakai, atau None di luar git checkout."""
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() if out.returncode == 0 else None
+
+
+def server_metadata(client, models):
+    """(versi Ollama, {model: digest}) dari /api/version dan /api/tags; nilai yang gagal diambil dibiarkan kosong."""
+    version, digests = None, {}
+    try:
+        version = client.get("version").get("version")
+    except Exception:
+        pass
+    try:
+        tags = {model_name(m["name"]): m.get("digest") for m in client.get("tags").get("models", [])}
+        digests = {m: tags.get(model_name(m)) for m in models}
+    except Exception:
+        pass
+    return version, digests
+
+
+def to_number(value):
+    """Nilai CSV (string) -> int/float bila bisa, selain itu apa adanya."""
+    if not isinstance(value, str):
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def sample_values(row):
+    values = {}
+    for key, value in row.items():
+        key = SAMPLE_ALIASES.get(key, key)
+        if key in SAMPLE_FIELDS and value not in (None, ""):
+            values[key] = to_number(value)
+    return values
+
+
+class ResultStore:
+    """Koneksi ke database hasil; hanya INSERT, tidak pernah UPDATE/DELETE."""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def start_run(self, script, api_url=None, model=None, client=None, models=None, options=None,
+                  source=None, started_at=None):
+        """Catat run baru beserta metadata host/server; kembalikan RunRecorder untuk run tersebut.
+
+        Run hasil import (source diisi) tidak diberi host/git SHA mesin ini karena asalnya tidak diketahui.
+        """
+        models = list(models or ([model] if model else []))
+        version, digests = server_metadata(client, models) if client is not None else (None, {})
+        host, sha = (None, None) if source else (socket.gethostname(), git_sha())
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO runs (started_at, script, host, git_sha, ollama_version, api_url, model, model_digests,"
+                " options, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (started_at or time.time(), script, host, sha, version, api_url,
+                 model, json.dumps(digests), json.dumps(options or {}, default=str), source))
+        return RunRecorder(self, cur.lastrowid, model)
+
+    def imported(self, source):
+        return self.conn.execute("SELECT 1 FROM runs WHERE source = ?", (source,)).fetchone() is not None
+
+    def runs(self, limit=20):
+        return self.conn.execute(
+            "SELECT r.id, datetime(r.started_at, 'unixepoch', 'localtime'), r.script, r.model, r.host,"
+            " substr(r.git_sha, 1, 8), r.ollama_version,"
+            " (SELECT COUNT(*) FROM scenarios s WHERE s.run_id = r.id),"
+            " (SELECT COUNT(*) FROM samples s WHERE s.run_id = r.id)"
+            " FROM runs r ORDER BY r.started_at DESC, r.id DESC LIMIT ?", (limit,)).fetchall()
+
+    def run_rows(self, run_id):
+        """(baris skenario, sample sukses) satu run dalam bentuk dict, untuk perbandingan antar run."""
+        scenarios = []
+        for model, data in self.conn.execute("SELECT model, data FROM scenarios WHERE run_id = ? ORDER BY ts",
+                                             (run_id,)):
+            row = json.loads(data)
+            row["model"] = model
+            scenarios.append(row)
+        cur = self.conn.execute("SELECT * FROM samples WHERE run_id = ? AND success = 1 ORDER BY ts", (run_id,))
+        columns = [c[0] for c in cur.description]
+        return scenarios, [dict(zip(columns, row)) for row in cur]
+
+    def values(self, metric, table="samples", model=None, scenario=None, users=None, since=None, run_id=None,
+               group_by=None):
+        """Nilai `metric` yang cocok dengan filter, dikelompokkan: {grup: [nilai]}.
+
+        table="samples" membaca kolom per request; table="scenarios" membaca kolom CSV skenario
+        (misal avg_tps, lat_p95) yang tersimpan sebagai JSON. group_by: None, run, day, scenario, users, model.
+        """
+        if table == "samples":
+            if metric not in SAMPLE_FIELDS:
+                raise ValueError(f"unknown sample metric '{metric}', choose from {', '.join(SAMPLE_FIELDS)}")
+            column = f"t.{metric}"
+        else:
+            column = "json_extract(t.data, ?)"
+        groups = {
+            None: "'all'",
+            "run": "t.run_id",
+            "day": "date(t.ts, 'unixepoch', 'localtime')",
+            "scenario": "t.scenario",
+            "users": "t.users",
+            "model": "t.model",
+        }
+        sql = f"SELECT {groups[group_by]}, {column} FROM {table} t WHERE 1 = 1"
+        params = [f"$.{metric}"] if table == "scenarios" else []
+        if table == "samples":
+            sql += " AND t.success = 1"
+        for clause, value in (("t.model = ?", model and model_name(model)), ("t.scenario = ?", scenario),
+                              ("t.users = ?", users), ("t.ts >= ?", since), ("t.run_id = ?", run_id)):
+            if value is not None:
+                sql += f" AND {clause}"
+                params.append(value)
+        grouped = {}
+        for key, value in self.conn.execute(sql, params):
+            if value is not None:
+                grouped.setdefault(key, []).append(float(value))
+        return grouped
+
+    def percentile(self, metric, pct, **filters):
+        values = self.values(metric, **filters).get("all", [])
+        return percentile(values, pct) if values else None
+
+    def import_csv(self, path, model=None):
+        """Import satu CSV hasil lama sebagai run baru; kembalikan jumlah baris atau None jika dilewati."""
+        source = os.path.normpath(path)
+        if self.imported(source):
+            return None
+        name = os.path.basename(path)
+        script = next((s for prefix, s in CSV_SCRIPTS.items() if name.startswith(prefix)), None)
+        if script is None:
+            return None
+        # Waktu run dari nama file (..._YYYYMMDD_HHMM[SS].csv), cadangan: mtime file
+        stamp = re.search(r"_(\d{8})_(\d{4,6})\.csv$", name)
+        if stamp:
+            started = datetime.strptime(stamp.group(1) + stamp.group(2).ljust(6, "0"), "%Y%m%d%H%M%S")
+        else:
+            started = datetime.fromtimestamp(os.path.getmtime(path))
+        # Folder Result/<model>/ memakai '_' sebagai pengganti ':' (qwen3_30b -> qwen3:30b)
+        folder = os.path.basename(os.path.dirname(os.path.abspath(path)))
+        if model is None and script != "benchmark-ollama" and "_" in folder:
+            model = ":".join(folder.rsplit("_", 1))
+        with open(path, newline="") as f:
+            rows = [{k: to_number(v) for k, v in row.items()} for row in csv.DictReader(f)]
+        recorder = self.start_run(script, model=model, source=source, started_at=started.timestamp(),
+                                  options={"imported_from": source})
+        for row in rows:
+            ts = started.timestamp()
+            if isinstance(row.get("time"), str) and re.fullmatch(r"\d\d:\d\d:\d\d", row["time"]):
+                at = datetime.combine(started.date(), datetime.strptime(row["time"], "%H:%M:%S").time())
+                # Run yang melewati tengah malam
+                ts = (at if at >= started - timedelta(minutes=1) else at + timedelta(days=1)).timestamp()
+            if "img_proc_time" in row:
+                row["prompt_eval_time"] = row.pop("img_proc_time")
+            if "users" in row:
+                recorder.add_scenario(row, ts=ts)
+            else:
+                if "scenario" not in row and "num_ctx" in row:
+                    row["scenario"] = f"PREFILL_{row['num_ctx']}"
+                recorder.add_sample(row, ts=ts)
+        self.conn.commit()
+        return len(rows)
+
+
+class RunRecorder:
+    """Penulis baris untuk satu run; antarmukanya sama dengan CsvSink (write/write_rows).
+
+    Baris skenario dari run_scenario (punya 'results') disimpan ke tabel scenarios, dan hasil
+    per-request di stat['results'] ke tabel samples. Baris lain (satu trial benchmark-ollama,
+    satu request load tester) dianggap satu sample.
+    """
+
+    def __init__(self, store, run_id, model=None):
+        self.store = store
+        self.run_id = run_id
+        self.model = model
+
+    def write(self, row):
+        self.write_rows([row])
+
+    def write_rows(self, rows):
+        with self.store.conn:
+            for row in rows:
+                if "results" in row:
+                    self.add_scenario(row)
+                else:
+                    self.add_sample(row)
+
+    def add_scenario(self, stat, ts=None, model=None):
+        ts = ts or time.time()
+        m = model or stat.get("model") or self.model
+        model = model_name(m) if m else None
+        data = {k: v for k, v in stat.items() if k != "results"}
+        self.store.conn.execute(
+            "INSERT INTO scenarios (run_id, ts, model, scenario, users, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (self.run_id, ts, model, stat.get("scenario"), stat.get("users"), json.dumps(data, default=str)))
+        for result in stat.get("results", []):
+            self.add_sample(result, ts=ts, model=model, scenario=stat.get("scenario"), users=stat.get("users"))
+
+    def add_sample(self, row, ts=None, model=None, scenario=None, users=None, success=True):
+        values = sample_values(row)
+        m = model or row.get("model") or self.model
+        model = model_name(m) if m else None
+        columns = ["run_id", "ts", "model", "scenario", "users", "trial", "success"] + list(values)
+        params = [self.run_id, ts or time.time(), model, scenario or row.get("scenario"),
+                  users if users is not None else row.get("users"), row.get("trial"),
+                  int(row.get("success", success))] + list(values.values())
+        self.store.conn.execute(
+            f"INSERT INTO samples ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", params)
+
+
+def add_store_arguments(parser):
+    parser.add_argument("--store", default=DEFAULT_DB,
+                        help="SQLite result store that every run is appended to (default: %(default)s)")
+    parser.add_argument("--no-store", action="store_true", help="Only write the CSV, not the result store")
+
+
+def open_run(args, script, client, model=None, models=None):
+    """RunRecorder untuk run ini sesuai argumen CLI, atau None dengan --no-store / jika store gagal dibuka."""
+    if args.no_store:
+        return None
+    try:
+        store = ResultStore(args.store)
+        options = {k: v for k, v in vars(args).items() if k not in ("store", "no_store")}
+        return store.start_run(script, api_url=client.base_url, model=model, client=client, models=models,
+                               options=options)
+    except sqlite3.Error as e:
+        print(f"[WARN] Result store {args.store} unavailable: {e}")
+        return None
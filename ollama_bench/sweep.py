@@ -0,0 +1,109 @@
+"""Adaptive concurrency sweep: find the highest user count a scenario sustains.
+
+The sweep doubles the number of users until a level breaches the limits
+(status worse than allowed by scenario_status, or p95 latency above the
+SLO), then binary-searches between the last good and the first bad level.
+"""
+import time
+
+from .runner import log, run_scenario, scenario_status
+
+STATUS_ORDER = ["PASS", "WARN", "FAIL", "CRITICAL"]
+
+
+def breach_reason(stat, max_status="WARN", slo_p95=None):
+    """Alasan level ini dianggap gagal, atau None jika masih dalam batas."""
+    status = scenario_status(stat['failures'], stat['users'])
+    if STATUS_ORDER.index(status) > STATUS_ORDER.index(max_status):
+        return f"status {status} ({stat['failures']}/{stat['users']} failed)"
+    if slo_p95 is not None and stat['lat_p95'] > slo_p95:
+        return f"p95 {stat['lat_p95']:.2f}s > SLO {slo_p95:.2f}s"
+    return None
+
+
+def find_knee(runs, ratio=0.95):
+    """Level terkecil yang sudah mencapai `ratio` dari throughput tertinggi (titik throughput berhenti naik)."""
+    if not runs:
+        return None
+    best = max(r['sys_throughput'] for r in runs)
+    for r in sorted(runs, key=lambda r: r['users']):
+        if r['sys_throughput'] >= ratio * best:
+            return r
+    return None
+
+
+def sweep_concurrency(name, func, sink=None, start=1, max_users=256, max_status="WARN", slo_p95=None,
+                      resolution=0.1, cooldown=2.0, telemetry=None, live=None):
+    """Jalankan sweep untuk satu skenario; kembalikan ringkasan dan semua run-nya.
+
+    resolution: binary search berhenti saat (bad - good) <= max(1, good * resolution).
+    """
+    runs = {}
+
+    def probe(users):
+        if users not in runs:
+            stat = run_scenario(name, func, users, sink, telemetry, live)
+            stat['breach'] = breach_reason(stat, max_status, slo_p95)
+            runs[users] = stat
+            if stat['breach']:
+                log(f"   {name} @ {users} users: BREACH - {stat['breach']}")
+            time.sleep(cooldown)
+        return runs[users]
+
+    # 1. Exponential ramp
+    good, bad = 0, None
+    users = start
+    while users <= max_users:
+        if probe(users)['breach']:
+            bad = users
+            break
+        good = users
+        if users == max_users: break
+        users = min(users * 2, max_users)
+
+    # 2. Binary search antara level terakhir yang lolos dan level pertama yang gagal
+    if bad is not None and good > 0:
+        while bad - good > max(1, int(good * resolution)):
+            mid = (good + bad) // 2
+            if probe(mid)['breach']:
+                bad = mid
+            else:
+                good = mid
+
+    passing = [r for r in runs.values() if not r['breach']]
+    best = runs.get(good)
+    knee = find_knee(passing)
+    return {
+        "scenario": name,
+        "max_users": good,
+        "sys_throughput": best['sys_throughput'] if best else 0.0,
+        "lat_p95": best['lat_p95'] if best else 0.0,
+        "knee_users": knee['users'] if knee else 0,
+        "knee_throughput": knee['sys_throughput'] if knee else 0.0,
+        "first_breach": bad,
+        "breach": runs[bad]['breach'] if bad is not None else f"none up to {max_users} users",
+        "runs": [runs[u] for u in sorted(runs)],
+    }
+
+
+def print_sweep_summary(sweeps):
+    width = 110
+    print("\n" + "=" * width)
+    print(f"{'CONCURRENCY SWEEP - MAX SUSTAINABLE LOAD':^{width}}")
+    print("=" * width)
+    print(f"{'Scenario':<20} | {'Max Users':<9} | {'Sys T/s':<9} | {'p95 Lat(s)':<10} | {'Knee':<5} | {'Knee T/s':<9} | {'Stopped by'}")
+    print("-" * width)
+    for s in sweeps:
+        print(f"{s['scenario']:<20} | {s['max_users']:<9} | {s['sys_throughput']:<9.2f} | {s['lat_p95']:<10.2f} | "
+              f"{s['knee_users']:<5} | {s['knee_throughput']:<9.2f} | {s['breach']}")
+    print("=" * width)
+    print(" Max Users = highest concurrency within limits; Knee = smallest concurrency reaching 95% of peak throughput.\n")
+
+
+def add_sweep_arguments(parser, default_max):
+    parser.add_argument("--sweep", action="store_true",
+                        help="Find the maximum sustainable concurrency per scenario instead of fixed USER_LEVELS")
+    parser.add_argument("--max-users", type=int, default=default_max, help="Sweep: upper bound on users (default: %(default)s)")
+    parser.add_argument("--slo-p95", type=float, default=None, help="Sweep: p95 latency SLO in seconds (default: none)")
+    parser.add_argument("--max-status", choices=["PASS", "WARN"], default="WARN",
+                        help="Sweep: worst acceptable PASS/WARN/FAIL status (default: %(default)s)")
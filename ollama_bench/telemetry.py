@@ -0,0 +1,244 @@
+"""Background host telemetry sampled while a benchmark runs.
+
+A daemon thread records, at a fixed interval: CPU utilisation per core,
+RSS of the Ollama processes, memory use, swap, Linux memory pressure (PSI)
+and the models resident according to /api/ps. Scenario rows are joined
+with a summary of the samples taken inside their batch window.
+
+psutil is used when installed; on Linux the same numbers are read from
+/proc. Host metrics describe the machine running the benchmark, so they
+only reflect the server when Ollama runs on the same host.
+"""
+import os
+import statistics
+import threading
+import time
+from urllib.parse import urlparse
+
+from .client import OllamaClient
+
+try:
+    import psutil
+except ImportError:  # fallback ke /proc di Linux
+    psutil = None
+
+DEFAULT_INTERVAL_S = 1.0
+PROCESS_NAME = "ollama"
+PSI_MEMORY = "/proc/pressure/memory"
+
+# Kolom CSV yang ditambahkan ke baris skenario
+TELEMETRY_FIELDS = [
+    'cpu_avg', 'cpu_core_max', 'cpu_per_core', 'ollama_rss_mb', 'mem_used_pct', 'swap_used_mb',
+    'mem_pressure', 'ps_models', 'ps_vram_gb', 'telemetry_samples',
+]
+
+
+def read_proc_cpu():
+    """Counter (busy, total) per core dari /proc/stat."""
+    cores = []
+    with open("/proc/stat") as f:
+        for line in f:
+            if line.startswith("cpu") and line[3].isdigit():
+                values = [int(v) for v in line.split()[1:]]
+                idle = values[3] + (values[4] if len(values) > 4 else 0)  # idle + iowait
+                cores.append((sum(values) - idle, sum(values)))
+    return cores
+
+
+def read_proc_meminfo():
+    info = {}
+    with open("/proc/meminfo") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            info[key] = int(rest.split()[0]) * 1024
+    return info
+
+
+def read_proc_rss(name):
+    """Total RSS (byte) semua proses yang namanya diawali `name` (serve + runner)."""
+    total = 0
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/comm") as f:
+                if not f.read().strip().startswith(name):
+                    continue
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            continue  # proses sudah selesai
+    return total
+
+
+def read_memory_pressure():
+    """PSI 'some avg10' (% waktu ada task yang tertahan menunggu memori), None jika kernel tidak mendukung."""
+    try:
+        with open(PSI_MEMORY) as f:
+            for line in f:
+                if line.startswith("some"):
+                    return float(line.split()[1].split("=")[1])
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def is_local(api_url):
+    return urlparse(api_url if "://" in api_url else f"http://{api_url}").hostname in ("localhost", "127.0.0.1", "::1")
+
+
+class TelemetrySampler:
+    """Thread sampler; pakai sebagai context manager atau start()/stop()."""
+
+    def __init__(self, api_url=None, interval=DEFAULT_INTERVAL_S, process_name=PROCESS_NAME):
+        self.interval = interval
+        self.process_name = process_name
+        # Client sendiri dengan timeout pendek: /api/ps tidak boleh memakai pool benchmark
+        self.client = OllamaClient(api_url, timeout=2, pool_size=1) if api_url else None
+        self.samples = []
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_cpu = None
+        self.available = psutil is not None or os.path.exists("/proc/stat")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        if self.available and self._thread is None:
+            self.cpu_per_core()  # baseline; sampel pertama baru punya delta
+            self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 3)
+            self._thread = None
+            # Sampel penutup: run yang lebih pendek dari satu interval tetap punya data
+            self._run_once()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._run_once()
+
+    def _run_once(self):
+        try:
+            self.samples.append(self.sample())
+        except Exception as e:
+            if self.error is None:
+                print(f"[WARN] Telemetry sample failed: {e}")
+            self.error = str(e)
+
+    def cpu_per_core(self):
+        """Persen utilisasi per core sejak panggilan sebelumnya."""
+        if psutil is not None:
+            return psutil.cpu_percent(percpu=True)
+        now = read_proc_cpu()
+        last, self._last_cpu = self._last_cpu, now
+        if last is None:
+            return [0.0] * len(now)
+        return [100.0 * (b1 - b0) / (t1 - t0) if t1 > t0 else 0.0 for (b0, t0), (b1, t1) in zip(last, now)]
+
+    def memory(self):
+        """(RSS proses Ollama, persen memori terpakai, swap terpakai) dalam byte/persen."""
+        if psutil is not None:
+            rss = 0
+            for p in psutil.process_iter(["name", "memory_info"]):
+                if (p.info["name"] or "").startswith(self.process_name) and p.info["memory_info"]:
+                    rss += p.info["memory_info"].rss
+            return rss, psutil.virtual_memory().percent, psutil.swap_memory().used
+        info = read_proc_meminfo()
+        used_pct = 100.0 * (1 - info.get("MemAvailable", 0) / info["MemTotal"]) if info.get("MemTotal") else 0.0
+        return read_proc_rss(self.process_name), used_pct, info.get("SwapTotal", 0) - info.get("SwapFree", 0)
+
+    def residency(self):
+        """(nama model, total VRAM byte) dari /api/ps, atau (None, None) jika gagal."""
+        if self.client is None:
+            return None, None
+        try:
+            models = self.client.get("ps").get("models", [])
+        except Exception:
+            return None, None
+        return [m["name"] for m in models], sum(m.get("size_vram", 0) for m in models)
+
+    def sample(self):
+        rss, used_pct, swap = self.memory()
+        models, vram = self.residency()
+        return {
+            "t": time.perf_counter(),
+            "cpu": self.cpu_per_core(),
+            "rss": rss,
+            "mem_used_pct": used_pct,
+            "swap": swap,
+            "pressure": read_memory_pressure(),
+            "models": models,
+            "vram": vram,
+        }
+
+    def summary(self, start=None, end=None):
+        """Ringkasan sampel dalam jendela [start, end] (perf_counter) sebagai kolom TELEMETRY_FIELDS."""
+        samples = list(self.samples)
+        window = [s for s in samples if (start is None or s["t"] >= start) and (end is None or s["t"] <= end)]
+        if not window:
+            # Batch lebih pendek dari interval: pakai sampel terakhir sebelum batch selesai
+            window = [s for s in samples if end is None or s["t"] <= end][-1:]
+        if not window:
+            return {'telemetry_samples': 0}
+        per_core = [statistics.mean(core) for core in zip(*(s["cpu"] for s in window))]
+        pressures = [s["pressure"] for s in window if s["pressure"] is not None]
+        residency = [s for s in window if s["models"] is not None]
+        models = sorted({m for s in residency for m in s["models"]})
+        return {
+            'cpu_avg': statistics.mean(per_core) if per_core else 0.0,
+            'cpu_core_max': max((max(s["cpu"]) for s in window if s["cpu"]), default=0.0),
+            'cpu_per_core': ";".join(f"{c:.0f}" for c in per_core),
+            'ollama_rss_mb': max(s["rss"] for s in window) / 2**20,
+            'mem_used_pct': max(s["mem_used_pct"] for s in window),
+            'swap_used_mb': max(s["swap"] for s in window) / 2**20,
+            'mem_pressure': max(pressures) if pressures else None,
+            'ps_models': " ".join(models) if residency else None,
+            'ps_vram_gb': max(s["vram"] for s in residency) / 2**30 if residency else None,
+            'telemetry_samples': len(window),
+        }
+
+
+def add_telemetry_arguments(parser):
+    parser.add_argument("--telemetry-interval", type=float, default=DEFAULT_INTERVAL_S,
+                        help="Seconds between host telemetry samples (default: %(default)s)")
+    parser.add_argument("--no-telemetry", action="store_true", help="Do not sample host CPU/memory and /api/ps")
+    parser.add_argument("--telemetry-process", default=PROCESS_NAME,
+                        help="Process name prefix whose RSS is reported (default: %(default)s)")
+
+
+def start_telemetry(args, api_url):
+    """TelemetrySampler yang sudah berjalan sesuai argumen CLI, atau None jika dimatikan/tidak didukung."""
+    if args.no_telemetry:
+        return None
+    sampler = TelemetrySampler(api_url, args.telemetry_interval, args.telemetry_process)
+    if not sampler.available:
+        print("[WARN] Telemetry disabled: install psutil (pip install psutil) on non-Linux hosts")
+        return None
+    if not is_local(api_url):
+        print("[WARN] Ollama is remote: CPU/memory telemetry describes this client machine, /api/ps the server")
+    return sampler.start()
+
+
+def print_telemetry(summary, title="HOST TELEMETRY"):
+    if not summary or not summary.get('telemetry_samples'):
+        return
+    print(f"\n[{title}] ({summary['telemetry_samples']} samples)")
+    print(f" CPU             : avg {summary['cpu_avg']:.0f}%, busiest core {summary['cpu_core_max']:.0f}%")
+    print(f" Memory          : {summary['mem_used_pct']:.0f}% used (max), swap {summary['swap_used_mb']:.0f} MB, "
+          f"Ollama RSS {summary['ollama_rss_mb']:.0f} MB")
+    if summary['mem_pressure'] is not None:
+        print(f" Memory Pressure : {summary['mem_pressure']:.1f}% (PSI some avg10, max)")
+    if summary['ps_models'] is not None:
+        print(f" Resident Models : {summary['ps_models'] or '-'} ({summary['ps_vram_gb']:.1f} GB VRAM)")
@@ -0,0 +1,246 @@
+"""Replay a recorded JSONL request trace against Ollama.
+
+One JSON object per line::
+
+    {"timestamp": 1718000000.25, "model": "qwen3:30b", "prompt_tokens": 900, "num_predict": 256}
+    {"timestamp": "2025-06-10T08:00:01Z", "model": "qwen3-vl:30b", "prompt": "Describe this.", "images": 1}
+
+``timestamp`` is epoch seconds or ISO 8601; ``prompt`` may be replaced by
+``prompt_tokens`` (synthetic text of that size); ``images`` is a list of
+base64 strings or a count; ``class`` optionally names the request class.
+The file (plain or .gz) is read line by line while replaying and results
+are folded into per-class histograms, so multi-GB traces never sit in memory.
+"""
+import asyncio
+import gzip
+import json
+import random
+import time
+from datetime import datetime
+
+from .client import AsyncOllamaClient
+from .loadgen import DEFAULT_OPTIONS, REQUEST_TIMEOUT_S, simulate_user_request
+from .prompts import CHARS_PER_TOKEN, filler_text
+from .residency import RELOAD_THRESHOLD_S
+from .stats import BatchStats
+
+# PNG 1x1 untuk field "images" berupa angka (isi gambar tidak ada di trace)
+PLACEHOLDER_IMAGE = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+
+# Batas bucket token untuk nama kelas request otomatis
+TOKEN_BUCKETS = [128, 512, 2048, 8192, 32768]
+
+# Jumlah pesan error yang disimpan untuk laporan
+MAX_ERRORS = 20
+
+# Batas request yang berjalan bersamaan; record berikutnya baru dibaca setelah ada slot
+DEFAULT_MAX_IN_FLIGHT = 256
+
+
+def parse_timestamp(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+def bucket(tokens):
+    for limit in TOKEN_BUCKETS:
+        if tokens <= limit:
+            return f"<={limit}"
+    return f">{TOKEN_BUCKETS[-1]}"
+
+
+def read_trace(path, default_model=None):
+    """Generator record trace yang sudah dinormalisasi; baris kosong/rusak dilewati."""
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                raw = json.loads(line)
+                yield normalize_record(raw, line_no, default_model)
+            except (ValueError, TypeError, KeyError) as e:
+                print(f"[WARN] Trace line {line_no} skipped: {e}")
+
+
+def normalize_record(raw, line_no, default_model=None):
+    model = raw.get("model") or default_model
+    if not model:
+        raise KeyError("no model (add 'model' to the record or pass --model)")
+    prompt = raw.get("prompt")
+    prompt_tokens = raw.get("prompt_tokens", raw.get("prompt_length"))
+    if prompt is None:
+        # Seed per baris: prompt sintetis tidak saling berbagi prefix cache
+        prompt = filler_text(int(prompt_tokens or 64), seed=line_no)
+    elif prompt_tokens is None:
+        prompt_tokens = len(prompt) // CHARS_PER_TOKEN
+    images = raw.get("images") or []
+    if isinstance(images, int):
+        images = [PLACEHOLDER_IMAGE] * images
+    options = dict(DEFAULT_OPTIONS, **(raw.get("options") or {}))
+    if raw.get("num_predict") is not None:
+        options["num_predict"] = raw["num_predict"]
+    request_class = raw.get("class")
+    if not request_class:
+        # Kelas otomatis: model + bucket panjang prompt + bucket num_predict (+ jumlah gambar)
+        out = bucket(options["num_predict"]) if "num_predict" in options else "=any"
+        request_class = f"{model} in{bucket(int(prompt_tokens))} out{out}" + (f" img{len(images)}" if images else "")
+    return {
+        "line": line_no,
+        "timestamp": parse_timestamp(raw.get("timestamp")),
+        "model": model,
+        "prompt": prompt,
+        "images": images,
+        "options": options,
+        "class": request_class,
+    }
+
+
+def parse_mix(spec):
+    """'qwen3:30b=60,gemma3:27b=30,qwen3-vl:30b=10+image' -> [(model, bobot, pakai gambar)]."""
+    mix = []
+    for part in spec.split(","):
+        name, _, weight = part.strip().rpartition("=")
+        if not name:
+            raise ValueError(f"invalid mix entry '{part}', expected model=weight")
+        images = weight.endswith("+image")
+        weight = float(weight[:-len("+image")] if images else weight)
+        if weight <= 0:
+            raise ValueError(f"weight for {name} must be positive")
+        mix.append((name, weight, images))
+    return mix
+
+
+def mix_records(mix, offsets, prompt, num_predict=None, seed=None):
+    """Record sintetis berformat trace: model dipilih acak sesuai bobot, dikirim pada offset (detik)."""
+    rng = random.Random(seed)
+    models = [m for m, _, _ in mix]
+    weights = [w for _, w, _ in mix]
+    with_images = {m for m, _, images in mix if images}
+    for i, offset in enumerate(offsets, 1):
+        model = rng.choices(models, weights)[0]
+        raw = {"timestamp": offset, "model": model, "prompt": prompt, "class": model}
+        if model in with_images:
+            raw["images"] = 1
+        if num_predict is not None:
+            raw["num_predict"] = num_predict
+        yield normalize_record(raw, i)
+
+
+class ReplayStats:
+    """Agregat hasil replay per kelas request (histogram, bukan daftar hasil)."""
+
+    def __init__(self):
+        self.overall = BatchStats()
+        self.classes = {}
+        self.errors = []
+        self.max_lag = 0.0
+        # kelas -> [jumlah reload, total load time]; reload = load_duration > RELOAD_THRESHOLD_S
+        self.reloads = {}
+
+    def record(self, request_class, result):
+        batch = self.classes.get(request_class)
+        if batch is None:
+            batch = self.classes[request_class] = BatchStats()
+        for b in (batch, self.overall):
+            b.record(result['duration'], result.get('tokens', 0), result['success'])
+        self.max_lag = max(self.max_lag, result['send_lag'])
+        load = result.get('load_time', 0.0)
+        if load > RELOAD_THRESHOLD_S:
+            for key in (request_class, "ALL"):
+                entry = self.reloads.setdefault(key, [0, 0.0])
+                entry[0] += 1
+                entry[1] += load
+        if not result['success'] and len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"line {result['user_id']}: {result['error']}")
+
+
+async def replay_trace(records, api_url, speed=1.0, limit=None, verbose=False, pool_size=0, pool_per_host=0,
+                       max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """Kirim ulang record trace sesuai jarak timestamp aslinya dibagi `speed`.
+
+    speed=2 memutar trace dua kali lebih cepat; speed=0 mengirim semua secepat mungkin.
+    Paling banyak `max_in_flight` request berjalan bersamaan (juga batas koneksi jika pool_size=0).
+    Latency dihitung dari waktu kirim terjadwal (tanpa coordinated omission), jadi waktu
+    menunggu slot ikut terhitung.
+    Mengembalikan (ReplayStats, jumlah request, durasi kirim, connection_stats).
+    """
+    stats = ReplayStats()
+    in_flight = set()
+    slots = asyncio.Semaphore(max_in_flight)
+    sent = 0
+
+    async def issue(client, record, scheduled):
+        try:
+            result = await simulate_user_request(client, record["line"], record["model"], record["prompt"],
+                                                 record["options"], verbose=verbose, scheduled_time=scheduled,
+                                                 images=record["images"])
+            stats.record(record["class"], result)
+        finally:
+            slots.release()
+
+    async with AsyncOllamaClient(api_url, timeout=REQUEST_TIMEOUT_S, limit=pool_size or max_in_flight,
+                                 limit_per_host=pool_per_host) as client:
+        start = time.perf_counter()
+        stats.overall.start(at=start)
+        first_ts = None
+        for record in records:
+            if limit is not None and sent >= limit:
+                break
+            ts = record["timestamp"]
+            if first_ts is None and ts is not None:
+                first_ts = ts
+            offset = (ts - first_ts) / speed if speed > 0 and ts is not None else 0.0
+            scheduled = start + max(0.0, offset)
+            # Selalu yield (sleep(0) jika sudah telat) supaya task yang sudah dibuat sempat jalan
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            await slots.acquire()
+            task = asyncio.ensure_future(issue(client, record, scheduled))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            sent += 1
+        issue_time = time.perf_counter() - start
+        if in_flight:
+            await asyncio.gather(*list(in_flight))
+        stats.overall.stop()
+
+    return stats, sent, issue_time, client.connection_stats()
+
+
+def print_replay_results(stats, sent, issue_time, speed, title="TRACE REPLAY RESULTS"):
+    overall = stats.overall
+    width = 128
+    print("\n" + "=" * width)
+    print(f"{title:^{width}}")
+    print("=" * width)
+    print(f" Requests        : {sent} ({overall.successes} ok, {overall.failures} failed)")
+    print(f" Timing          : {'as fast as possible' if speed <= 0 else f'{speed}x original'}; "
+          f"issued over {issue_time:.1f}s, finished after {overall.wall_time:.1f}s")
+    print(f" Throughput      : {overall.throughput:.2f} tokens/sec, "
+          f"{overall.successes / overall.wall_time if overall.wall_time > 0 else 0:.2f} req/s")
+    print(f" Max send lag    : {stats.max_lag * 1000:.1f} ms (client could not keep up if this is large)")
+    print("-" * width)
+    print(f"{'Request Class':<40} | {'Reqs':<6} | {'Share':<6} | {'Fail':<5} | {'p50(s)':<7} | {'p95(s)':<7} | "
+          f"{'Max(s)':<7} | {'Tokens':<8} | {'Reloads':<7} | {'Load(s)':<7}")
+    print("-" * width)
+    rows = sorted(stats.classes.items(), key=lambda kv: kv[1].requests, reverse=True)
+    for name, b in rows + [("ALL", overall)]:
+        lat = b.latency
+        reloads, load = stats.reloads.get(name, (0, 0.0))
+        share = b.requests / overall.requests if overall.requests else 0.0
+        if name == "ALL":
+            print("-" * width)
+        print(f"{name[:40]:<40} | {b.requests:<6} | {share:<6.0%} | {b.failures:<5} | {lat.percentile(50):<7.2f} | "
+              f"{lat.percentile(95):<7.2f} | {lat.max or 0.0:<7.2f} | {b.total_tokens:<8} | {reloads:<7} | {load:<7.2f}")
+    print("=" * width)
+    print(f" Reloads = requests that paid a model load (load_duration > {RELOAD_THRESHOLD_S}s): a swap or an expired keep_alive.")
+    if stats.reloads.get("ALL", (0,))[0] > len(stats.classes):
+        print(" [WARN] Models are reloaded repeatedly: OLLAMA_MAX_LOADED_MODELS or memory is too small for this mix.")
+    if stats.errors:
+        print("\n[ERROR LOG]")
+        for e in stats.errors:
+            print(f" {e}")
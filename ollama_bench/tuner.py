@@ -0,0 +1,435 @@
+"""Option-space tuner: search model options for the fastest configuration.
+
+A configuration is one combination of Ollama model options (``num_ctx``,
+``num_batch``, ``num_gpu``, ``num_thread``, ...) plus ``parallel``, the
+number of concurrent client requests. Each configuration is measured by
+loading the model with those options (load time, and memory from
+/api/ps), then running rounds of ``parallel`` concurrent generate requests.
+
+    grid      every configuration gets the full number of rounds
+    halving   successive halving: every configuration gets one round, the
+              best 1/eta by Pareto rank advance with eta times the rounds,
+              until the survivors have the full number of rounds
+
+Without ``--space`` the space is derived per model from this machine:
+num_thread at the physical core count and two lower values, num_gpu from
+0 (CPU only) to every layer (``block_count`` from /api/show), next to a
+few num_ctx / num_batch values and 1 or 4 concurrent requests.
+
+The report marks the Pareto frontier over system throughput (higher),
+p95 latency (lower) and memory (lower): the fully measured configurations
+no other one beats on all three. Every measured round is appended to a
+JSONL cache keyed by server, model, options and prompt, so an interrupted
+search resumes where it stopped and a later search reuses what it can.
+"""
+import hashlib
+import itertools
+import json
+import math
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .client import OllamaError
+from .metrics import get_metrics, percentile
+from .residency import model_name, unload_model
+from .sink import CsvSink
+from .store import to_number
+
+try:
+    import psutil
+except ImportError:  # jumlah core fisik tidak diketahui, pakai os.cpu_count()
+    psutil = None
+
+# Ruang pencarian bawaan; num_thread dan num_gpu ditambahkan per model oleh default_space().
+# 'parallel' = request bersamaan dari client, bukan opsi Ollama
+DEFAULT_SPACE = {
+    "num_ctx": [2048, 4096, 8192],
+    "num_batch": [256, 512],
+    "parallel": [1, 4],
+}
+SEARCHES = ["grid", "halving"]
+DEFAULT_ROUNDS = 3
+DEFAULT_ETA = 2
+# Panjang jawaban tetap supaya throughput antar konfigurasi sebanding
+NUM_PREDICT = 256
+BASE_OPTIONS = {"temperature": 0.7, "num_predict": NUM_PREDICT}
+DEFAULT_CACHE = "tune_cache.jsonl"
+
+TUNE_FIELDS = [
+    "model", "config", "parallel", "rounds", "sys_tps", "gen_tps", "prompt_tps",
+    "lat_p50", "lat_p95", "mem_gb", "vram_gb", "load_time", "pareto", "error",
+]
+
+
+def parse_value(text):
+    """'4096' -> 4096, '0.5' -> 0.5, 'true' -> True, 'default' -> None (opsi tidak dikirim)."""
+    lowered = text.strip().lower()
+    if lowered == "default":
+        return None
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    return to_number(text.strip())
+
+
+def parse_space(specs):
+    """['num_ctx=2048,4096', 'parallel=1,4'] -> {'num_ctx': [2048, 4096], 'parallel': [1, 4]}.
+
+    Tanpa spec: {} (ruang bawaan dari hardware, dibuat per model oleh default_space).
+    """
+    if not specs:
+        return {}
+    space = {}
+    for spec in specs:
+        key, sep, values = spec.partition("=")
+        if not sep or not key.strip() or not values.strip():
+            raise ValueError(f"invalid --space '{spec}' (expected option=v1,v2,...)")
+        space[key.strip()] = [parse_value(v) for v in values.split(",") if v.strip()]
+    space.setdefault("parallel", [1])
+    if any(not isinstance(p, int) or p < 1 for p in space["parallel"]):
+        raise ValueError("parallel values must be positive integers")
+    return space
+
+
+def thread_values():
+    """Jumlah core fisik, setengahnya dan seperempatnya (Ollama default = core fisik)."""
+    cores = (psutil.cpu_count(logical=False) if psutil is not None else None) or os.cpu_count() or 1
+    return sorted({max(1, cores), max(1, cores // 2), max(1, cores // 4)}, reverse=True)
+
+
+def model_layers(client, model):
+    """Jumlah layer (block_count) model menurut /api/show, atau None jika tidak dilaporkan."""
+    try:
+        info = client.show(model).get("model_info") or {}
+    except Exception:
+        return None
+    return info.get(f"{info.get('general.architecture')}.block_count")
+
+
+def gpu_values(layers):
+    """num_gpu dari 0 (CPU saja) sampai semua layer; +1 karena Ollama juga menghitung layer output."""
+    return sorted({0, (layers + 1) // 2, layers + 1})
+
+
+def default_space(client, model):
+    """Ruang bawaan untuk satu model: DEFAULT_SPACE plus num_thread dan num_gpu dari hardware/model."""
+    space = {k: v for k, v in DEFAULT_SPACE.items() if k != "parallel"}
+    space["num_thread"] = thread_values()
+    layers = model_layers(client, model)
+    if layers:
+        space["num_gpu"] = gpu_values(layers)
+    else:
+        print(f"   [WARN] /api/show tidak melaporkan jumlah layer {model}; num_gpu tidak ikut dicari")
+    space["parallel"] = DEFAULT_SPACE["parallel"]
+    return space
+
+
+def configurations(space):
+    """Semua kombinasi ruang pencarian sebagai dict (opsi bernilai None dilewati)."""
+    keys = list(space)
+    for values in itertools.product(*(space[k] for k in keys)):
+        yield {k: v for k, v in zip(keys, values) if v is not None}
+
+
+def split_config(config):
+    """Konfigurasi -> (opsi Ollama, jumlah request bersamaan)."""
+    options = {k: v for k, v in config.items() if k != "parallel"}
+    return options, config.get("parallel", 1)
+
+
+def config_label(config):
+    return " ".join(f"{k}={v}" for k, v in config.items()) or "defaults"
+
+
+def cache_key(api_base, model, config, prompt):
+    options, parallel = split_config(config)
+    prompt_hash = hashlib.sha1(prompt.encode()).hexdigest()[:12]
+    return json.dumps({"url": api_base, "model": model_name(model), "options": dict(BASE_OPTIONS, **options),
+                       "parallel": parallel, "prompt": prompt_hash}, sort_keys=True)
+
+
+class TuneCache:
+    """Cache append-only (JSONL) berisi hasil load, ronde dan error per konfigurasi."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}  # key -> {"load": dict, "rounds": [list hasil], "error": str}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # baris terakhir bisa terpotong jika run sebelumnya dihentikan
+                    self._apply(record)
+
+    def _apply(self, record):
+        entry = self.get(record["key"])
+        if record["kind"] == "load":
+            entry["load"] = record["load"]
+        elif record["kind"] == "round":
+            entry["rounds"].append(record["results"])
+        elif record["kind"] == "error":
+            entry["error"] = record["error"]
+
+    def get(self, key):
+        return self.entries.setdefault(key, {"load": None, "rounds": [], "error": None})
+
+    def append(self, key, kind, **fields):
+        record = dict(fields, key=key, kind=kind)
+        self._apply(record)
+        if self.path:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+
+def request_once(client, model, prompt, options):
+    start = time.perf_counter()
+    try:
+        res = client.generate({"model": model, "prompt": prompt, "options": options})
+    except OllamaError as e:
+        return {"success": False, "error": str(e) or type(e).__name__, "latency": time.perf_counter() - start}
+    m = get_metrics(res)
+    return {"success": True, "latency": time.perf_counter() - start, "tokens": m["tokens_out"],
+            "gen_tps": m["gen_tps"], "prompt_tps": m["prompt_tps"]}
+
+
+def resident_memory(client, model):
+    """(size, size_vram) model dalam GB menurut /api/ps, atau (None, None)."""
+    try:
+        models = client.get("ps").get("models", [])
+    except Exception:
+        return None, None
+    for m in models:
+        if model_name(m.get("name", "")) == model_name(model):
+            return m.get("size", 0) / 1024 ** 3, m.get("size_vram", 0) / 1024 ** 3
+    return None, None
+
+
+class Tuner:
+    """Ukur konfigurasi satu model lewat cache; measure() hanya menjalankan ronde yang belum ada."""
+
+    def __init__(self, client, model, prompt, cache, verbose=True):
+        self.client = client
+        self.model = model
+        self.prompt = prompt
+        self.cache = cache
+        self.verbose = verbose
+        self.loaded = None  # key konfigurasi yang terakhir dimuat
+
+    def load(self, key, options):
+        """Request pendek agar model dimuat ulang dengan opsi ini; catat load time dan memori."""
+        res = self.client.generate({"model": self.model, "prompt": "Hi", "options": dict(options, num_predict=1)})
+        self.loaded = key
+        if self.cache.get(key)["load"] is None:
+            mem, vram = resident_memory(self.client, self.model)
+            self.cache.append(key, "load", load={"load_time": get_metrics(res)["load_time"], "mem_gb": mem,
+                                                 "vram_gb": vram})
+
+    def run_round(self, options, parallel):
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            start = time.perf_counter()
+            futures = [executor.submit(request_once, self.client, self.model, self.prompt, options)
+                       for _ in range(parallel)]
+            results = [f.result() for f in futures]
+        wall = time.perf_counter() - start
+        return [dict(r, wall=wall) for r in results]
+
+    def measure(self, config, rounds):
+        """Pastikan konfigurasi punya `rounds` ronde (atau error) lalu kembalikan ringkasannya."""
+        key = cache_key(self.client.base_url, self.model, config, self.prompt)
+        entry = self.cache.get(key)
+        missing = rounds - len(entry["rounds"])
+        if entry["error"] is None and missing > 0:
+            options, parallel = split_config(config)
+            options = dict(BASE_OPTIONS, **options)
+            if self.verbose:
+                cached = f", {len(entry['rounds'])} cached" if entry["rounds"] else ""
+                print(f"   > {config_label(config):<60} round {len(entry['rounds']) + 1}-{rounds}{cached}")
+            try:
+                if self.loaded != key:
+                    self.load(key, options)
+                for _ in range(missing):
+                    results = self.run_round(options, parallel)
+                    failed = [r for r in results if not r["success"]]
+                    if failed:
+                        raise OllamaError(f"{len(failed)}/{parallel} requests failed: {failed[0]['error']}")
+                    self.cache.append(key, "round", results=results)
+            except OllamaError as e:
+                # Mis. num_ctx terlalu besar untuk memori: konfigurasi dianggap tidak layak.
+                # Error koneksi tidak ditangkap: server mati bukan sifat konfigurasi
+                self.cache.append(key, "error", error=(str(e) or type(e).__name__)[:200])
+                self.loaded = None
+                if self.verbose:
+                    print(f"   [WARN] {config_label(config)}: {entry['error']}")
+        elif self.verbose:
+            status = "infeasible" if entry["error"] else f"{rounds} rounds"
+            print(f"   = {config_label(config):<60} cached ({status})")
+        return summarize(self.model, config, entry, rounds)
+
+
+def summarize(model, config, entry, rounds):
+    """Ringkasan konfigurasi dari `rounds` ronde pertama di cache."""
+    _, parallel = split_config(config)
+    row = {"model": model, "config": config_label(config), "parallel": parallel, "rounds": 0,
+           "error": entry["error"], "pareto": False}
+    load = entry["load"] or {}
+    row.update(load_time=load.get("load_time"), mem_gb=load.get("mem_gb"), vram_gb=load.get("vram_gb"))
+    used = entry["rounds"][:rounds]
+    if entry["error"] or not used:
+        return row
+    results = [r for results in used for r in results]
+    row.update(
+        rounds=len(used),
+        sys_tps=statistics.mean(sum(r["tokens"] for r in rs) / rs[0]["wall"] for rs in used),
+        gen_tps=statistics.mean(r["gen_tps"] for r in results),
+        prompt_tps=statistics.mean(r["prompt_tps"] for r in results),
+        lat_p50=percentile([r["latency"] for r in results], 50),
+        lat_p95=percentile([r["latency"] for r in results], 95),
+    )
+    return row
+
+
+def objectives(row):
+    """Tiga sasaran yang semuanya 'lebih kecil lebih baik'; memori tak diketahui dihitung 0."""
+    return (-row["sys_tps"], row["lat_p95"], row["mem_gb"] or 0.0)
+
+
+def dominates(a, b):
+    oa, ob = objectives(a), objectives(b)
+    return all(x <= y for x, y in zip(oa, ob)) and oa != ob
+
+
+def pareto_ranks(rows):
+    """Non-dominated sorting: rank 0 = frontier, rank 1 = frontier setelah rank 0 dibuang, dst."""
+    ranks = {}
+    remaining = list(range(len(rows)))
+    rank = 0
+    while remaining:
+        front = [i for i in remaining if not any(dominates(rows[j], rows[i]) for j in remaining if j != i)]
+        for i in front:
+            ranks[i] = rank
+        remaining = [i for i in remaining if i not in ranks]
+        rank += 1
+    return [ranks[i] for i in range(len(rows))]
+
+
+def mark_frontier(rows):
+    """Tandai frontier di antara konfigurasi dengan ronde terbanyak (hasil tahap awal halving lebih bising)."""
+    most = max((r["rounds"] for r in rows), default=0)
+    feasible = [r for r in rows if most and r["rounds"] == most]
+    for row, rank in zip(feasible, pareto_ranks(feasible)):
+        row["pareto"] = rank == 0
+    return rows
+
+
+def grid_search(tuner, configs, rounds):
+    return [tuner.measure(config, rounds) for config in configs]
+
+
+def successive_halving(tuner, configs, rounds, eta=DEFAULT_ETA):
+    """Mulai dengan satu ronde per konfigurasi; tiap tahap sisakan ceil(n/eta) terbaik dan kalikan ronde dengan eta."""
+    rows = {}
+    alive = list(range(len(configs)))
+    budget = 1
+    while len(alive) > 1 and budget < rounds:
+        print(f"   -- rung: {len(alive)} configs x {budget} round(s)")
+        for i in alive:
+            rows[i] = tuner.measure(configs[i], budget)
+        feasible = [i for i in alive if rows[i]["rounds"]]
+        ranks = pareto_ranks([rows[i] for i in feasible])
+        order = sorted(zip(ranks, feasible), key=lambda x: (x[0], -rows[x[1]]["sys_tps"]))
+        alive = [i for _, i in order[:math.ceil(len(alive) / eta)]]
+        budget *= eta
+    print(f"   -- final: {len(alive)} configs x {rounds} round(s)")
+    for i in alive:
+        rows[i] = tuner.measure(configs[i], rounds)
+    return [rows[i] for i in sorted(rows)]
+
+
+def print_tune_table(model, rows, search):
+    width = 146
+    print("\n" + "=" * width)
+    print(f" TUNING: {model} ({len(rows)} configs, {search}; * = Pareto frontier of throughput / p95 / memory)")
+    print("=" * width)
+    print(f"  {'Config':<60} | {'Rounds':<6} | {'Sys t/s':<8} | {'Gen t/s':<8} | {'Prefill':<8} | "
+          f"{'p50 (s)':<7} | {'p95 (s)':<7} | {'Mem GB':<6} | {'VRAM GB':<7} | Load (s)")
+    print("-" * width)
+    ok = sorted((r for r in rows if r["rounds"]), key=lambda r: (not r["pareto"], -r["sys_tps"]))
+    for r in ok:
+        mem = f"{r['mem_gb']:.1f}" if r["mem_gb"] is not None else "-"
+        vram = f"{r['vram_gb']:.1f}" if r["vram_gb"] is not None else "-"
+        load = f"{r['load_time']:.2f}" if r["load_time"] is not None else "-"
+        print(f"{'*' if r['pareto'] else ' '} {r['config'][:60]:<60} | {r['rounds']:<6} | {r['sys_tps']:<8.1f} | "
+              f"{r['gen_tps']:<8.1f} | {r['prompt_tps']:<8.0f} | {r['lat_p50']:<7.2f} | {r['lat_p95']:<7.2f} | "
+              f"{mem:<6} | {vram:<7} | {load}")
+    for r in rows:
+        if r["error"]:
+            print(f"  {r['config'][:60]:<60} | INFEASIBLE: {r['error'][:70]}")
+    print("-" * width)
+    if ok:
+        full = [r for r in ok if r["rounds"] == max(x["rounds"] for x in ok)]
+        fastest = max(full, key=lambda r: r["sys_tps"])
+        quickest = min(full, key=lambda r: r["lat_p95"])
+        print(f" Highest throughput : {fastest['config']} ({fastest['sys_tps']:.1f} t/s)")
+        print(f" Lowest p95 latency : {quickest['config']} ({quickest['lat_p95']:.2f}s)")
+        if any(r["mem_gb"] is not None for r in full):
+            smallest = min(full, key=lambda r: r["mem_gb"] if r["mem_gb"] is not None else math.inf)
+            print(f" Smallest footprint : {smallest['config']} ({smallest['mem_gb']:.1f} GB)")
+    print("=" * width)
+
+
+def run_tuning(client, models, prompt, space, search="grid", rounds=DEFAULT_ROUNDS, eta=DEFAULT_ETA,
+               cache_path=DEFAULT_CACHE, unload_after=False, verbose=True):
+    """Cari konfigurasi untuk tiap model; kembalikan semua baris ringkasan (dengan tanda frontier).
+
+    space kosong = ruang bawaan dari hardware per model (default_space).
+    """
+    cache = TuneCache(cache_path)
+    all_rows = []
+    for model in models:
+        model_space = space or default_space(client, model)
+        if not space:
+            print(f"   Space: {', '.join(f'{k}={v}' for k, v in model_space.items())}")
+        configs = list(configurations(model_space))
+        print(f"\n[{model.upper()}] Tuning {len(configs)} configs ({search}, up to {rounds} rounds)...")
+        tuner = Tuner(client, model, prompt, cache, verbose)
+        if search == "halving":
+            rows = successive_halving(tuner, configs, rounds, eta)
+        else:
+            rows = grid_search(tuner, configs, rounds)
+        mark_frontier(rows)
+        print_tune_table(model, rows, search)
+        all_rows.extend(rows)
+        if unload_after:
+            try:
+                unload_model(client, model)
+            except Exception as e:
+                print(f"   [WARN] Unload {model} gagal: {e}")
+    return all_rows
+
+
+def save_tuning(rows):
+    filename = f"tune_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    CsvSink(filename, TUNE_FIELDS).write_rows(rows)
+    return filename
+
+
+def add_tune_arguments(parser):
+    parser.add_argument("--tune", action="store_true",
+                        help="Search model options for the fastest configuration instead of running the scenarios")
+    parser.add_argument("--search", choices=SEARCHES,
+                        help="Grid search or successive halving (default: halving for the default space, "
+                             "grid with --space)")
+    parser.add_argument("--space", action="append", metavar="OPTION=V1,V2",
+                        help="Search space, repeatable, e.g. --space num_ctx=2048,8192 --space parallel=1,4; "
+                             "'default' leaves the option unset (default: num_ctx, num_batch, num_thread from the "
+                             "CPU cores, num_gpu from 0 to the model's layer count, parallel 1/4)")
+    parser.add_argument("--tune-rounds", type=int, default=DEFAULT_ROUNDS,
+                        help="Rounds per configuration; the survivors' budget with --search halving (default: %(default)s)")
+    parser.add_argument("--eta", type=int, default=DEFAULT_ETA,
+                        help="Successive halving keeps 1/eta of the configs per rung (default: %(default)s)")
+    parser.add_argument("--tune-cache", default=DEFAULT_CACHE,
+                        help="JSONL cache of measured rounds; rerunning resumes from it (default: %(default)s)")
@@ -0,0 +1,122 @@
+import os
+import sys
+import argparse
+
+from ollama_bench.compare import COMPARE_METRICS, DEFAULT_ALPHA, compare_runs, load_run, print_comparison
+from ollama_bench.metrics import percentile
+from ollama_bench.store import DEFAULT_DB, SAMPLE_FIELDS, ResultStore, parse_since
+
+GROUPS = ["run", "day", "scenario", "users", "model"]
+
+def cmd_import(store, args):
+    """Import CSV lama; folder ditelusuri rekursif, file yang sudah pernah diimport dilewati."""
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                paths.extend(os.path.join(root, f) for f in sorted(files) if f.endswith(".csv"))
+        else:
+            paths.append(path)
+    imported = 0
+    for path in paths:
+        rows = store.import_csv(path, args.model)
+        if rows is None:
+            print(f" skip   {path} (already imported or not a benchmark CSV)")
+            continue
+        imported += 1
+        print(f" import {path}: {rows} rows")
+    print(f"\n{imported} of {len(paths)} files imported into {store.path}")
+
+def cmd_runs(store, args):
+    rows = store.runs(args.limit)
+    print(f"{'ID':<5} | {'Started':<19} | {'Script':<30} | {'Model':<18} | {'Host':<14} | {'Git':<8} | "
+          f"{'Ollama':<10} | {'Scen':<5} | {'Samples'}")
+    print("-" * 135)
+    for run_id, started, script, model, host, sha, version, scenarios, samples in rows:
+        print(f"{run_id:<5} | {started:<19} | {script[:30]:<30} | {(model or '-')[:18]:<18} | {(host or '-')[:14]:<14} | "
+              f"{sha or '-':<8} | {(version or '-')[:10]:<10} | {scenarios:<5} | {samples}")
+
+def cmd_query(store, args):
+    table = "scenarios" if args.metric not in SAMPLE_FIELDS else "samples"
+    try:
+        since = parse_since(args.since) if args.since else None
+    except ValueError:
+        print(f"[ERROR] --since: expected e.g. 30d, 12h, 2w or an ISO date, got '{args.since}'")
+        sys.exit(1)
+    groups = store.values(args.metric, table=table, model=args.model, scenario=args.scenario, users=args.users,
+                          since=since, run_id=args.run, group_by=args.by)
+    if not groups:
+        print("No matching samples.")
+        return
+    label = args.by or "all"
+    pcts = args.pct
+    print(f"{args.metric} from {table}" + (f", model {args.model}" if args.model else "") +
+          (f", scenario {args.scenario}" if args.scenario else "") + (f", since {args.since}" if args.since else ""))
+    print(f"{label.capitalize():<20} | {'N':<6} | " + " | ".join(f"{f'p{p:g}':<9}" for p in pcts))
+    print("-" * (32 + 12 * len(pcts)))
+    for key in sorted(groups, key=str):
+        values = groups[key]
+        print(f"{str(key):<20} | {len(values):<6} | " + " | ".join(f"{percentile(values, p):<9.3f}" for p in pcts))
+
+def cmd_compare(store, args):
+    """Regression gate: exit 1 jika kandidat lebih lambat dari baseline (untuk CI / keputusan rollout)."""
+    try:
+        baseline = load_run(args.baseline, store)
+        candidate = load_run(args.candidate, store)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] {e}")
+        sys.exit(2)
+    threshold = args.threshold / 100
+    results, unmatched = compare_runs(baseline, candidate, threshold, args.alpha, args.metrics, args.scenario)
+    if not results:
+        print("[ERROR] The runs have no scenario/concurrency level in common.")
+        sys.exit(2)
+    if print_comparison(results, unmatched, baseline[0], candidate[0], threshold, args.alpha):
+        sys.exit(1)
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Import, query and compare runs in the benchmark result store")
+    parser.add_argument("--store", default=DEFAULT_DB, help="SQLite result store (default: %(default)s)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("import", help="Import existing result CSVs (files or folders such as Result/)")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--model", help="Model for CSVs without a model column (default: from the Result/<model>/ folder name)")
+
+    p = sub.add_parser("runs", help="List recent runs with their metadata")
+    p.add_argument("--limit", type=int, default=20)
+
+    p = sub.add_parser("query", help="Percentiles of a metric across runs")
+    p.add_argument("metric", help=f"Per-request metric ({', '.join(SAMPLE_FIELDS)}) or any scenario CSV column "
+                                  "(avg_tps, sys_throughput, lat_p95, ...)")
+    p.add_argument("--pct", type=float, nargs="+", default=[50, 95], help="Percentiles to report (default: %(default)s)")
+    p.add_argument("-m", "--model")
+    p.add_argument("--scenario")
+    p.add_argument("--users", type=int)
+    p.add_argument("--run", type=int, help="Only this run id")
+    p.add_argument("--since", help="Only results newer than this: 30d, 12h, 2w or an ISO date")
+    p.add_argument("--by", choices=GROUPS, help="Group results by run, day, scenario, users or model")
+
+    p = sub.add_parser("compare", help="Regression gate: compare a candidate run with a baseline, exit 1 on regressions")
+    p.add_argument("baseline", help="Baseline run id in the store, or a result CSV")
+    p.add_argument("candidate", help="Candidate run id in the store, or a result CSV")
+    p.add_argument("--threshold", type=float, default=5.0,
+                   help="Allowed slowdown in percent before a difference counts (default: %(default)s)")
+    p.add_argument("--alpha", type=float, default=DEFAULT_ALPHA,
+                   help="Significance level of the Mann-Whitney U test (default: %(default)s)")
+    p.add_argument("--metrics", nargs="+", choices=[m[0] for m in COMPARE_METRICS],
+                   help="Metrics to gate on (default: all available)")
+    p.add_argument("--scenario", help="Only compare this scenario, e.g. CODING_HEAVY")
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+    store = ResultStore(args.store)
+    try:
+        commands = {"import": cmd_import, "runs": cmd_runs, "query": cmd_query, "compare": cmd_compare}
+        commands[args.command](store, args)
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,138 +1,327 @@
-import requests
-import time
-import concurrent.futures
-import statistics
+import asyncio
 import argparse
+import os
+import subprocess
+import sys
 
-# Prompt yang cukup berat untuk memaksa GPU bekerja
-# Kita pakai prompt coding/reasoning agar processing time-nya nyata.
-PROMPT = "Write a python function to calculate fibonacci sequence up to n terms. Explain the logic briefly."
-
-def simulate_user_request(user_id, model_name, api_url):
-    """Fungsi ini mensimulasikan satu user."""
-    print(f"   [User {user_id}] \U0001F680 Request sent... waiting for response...")
-    start_time = time.time()
-    
-    payload = {
-        "model": model_name,
-        "prompt": PROMPT,
-        "stream": False,
-        "options": {
-            "num_ctx": 4096,
-            "temperature": 0.7
-        }
-    }
-    
-    try:
-        # Kirim request
-        response = requests.post(api_url, json=payload, timeout=300) # Timeout panjang untuk antrian
-        response.raise_for_status()
-        data = response.json()
-        
-        end_time = time.time()
-        total_duration = end_time - start_time
-        
-        # Ambil metrik
-        eval_count = data.get('eval_count', 0)
-        eval_duration_ns = data.get('eval_duration', 0)
-        
-        # Hitung T/s spesifik user ini
-        tps = 0
-        if eval_duration_ns > 0:
-            tps = eval_count / (eval_duration_ns / 1e9)
-            
-        return {
-            "success": True,
-            "user_id": user_id,
-            "duration": total_duration,
-            "tokens": eval_count,
-            "tps": tps
-        }
-
-    except Exception as e:
-        return {
-            "success": False,
-            "user_id": user_id,
-            "error": str(e)
-        }
-
-def print_results(results, model_name, concurrent_users):
-    successful = [r for r in results if r['success']]
-    failed = [r for r in results if not r['success']]
-    
-    print("\n" + "="*60)
-    print(f" HASIL LOAD TEST: {concurrent_users} USERS SIMULTAN")
-    print("="*60)
-    print(f" Model           : {model_name}")
-    print(f" Sukses          : {len(successful)} / {len(results)}")
-    print(f" Gagal/Timeout   : {len(failed)}")
-    print("-" * 60)
-    
-    if successful:
-        durations = [r['duration'] for r in successful]
-        tokens_per_seconds = [r['tps'] for r in successful]
-        total_tokens = sum([r['tokens'] for r in successful])
-        
-        avg_latency = statistics.mean(durations)
-        max_latency = max(durations)
-        min_latency = min(durations)
-        avg_tps = statistics.mean(tokens_per_seconds)
-        
-        # Total System Throughput (Total token yang diproduksi server per detik gabungan)
-        # Ini menunjukkan kekuatan asli Ryzen AI Max Anda
-        system_throughput = total_tokens / max_latency 
-
-        print(f" RATA-RATA WAKTU TUNGGU (Latency) : {avg_latency:.2f} detik")
-        print(f" WAKTU TUNGGU TERLAMA (Worst Case): {max_latency:.2f} detik")
-        print("-" * 60)
-        print(f" KECEPATAN PER USER (Avg Speed)   : {avg_tps:.2f} tokens/sec")
-        print(f" TOTAL SYSTEM THROUGHPUT          : {system_throughput:.2f} tokens/sec")
-    
-    if failed:
-        print("\n[ERROR LOG]")
-        for f in failed:
-            print(f" User {f['user_id']}: {f['error']}")
-    print("="*60)
+from ollama_bench import OllamaClient, add_pool_arguments, print_connection_stats
+from ollama_bench import client as ollama_client
+from ollama_bench.client import api_base, connection_summary
+from ollama_bench.balancer import POLICIES, print_backend_table
+from ollama_bench.distributed import (
+    DEFAULT_PORT as COORDINATOR_PORT, START_DELAY_S, merge_in_flight, merge_results, parse_address,
+    print_worker_table, run_coordinator, run_worker,
+)
+from ollama_bench.loadgen import (
+    PROMPT, arrival_schedule, batch_from_results, print_open_loop_results, print_results, raise_fd_limit,
+    run_load_test, run_open_loop,
+)
+from ollama_bench.probe import DEFAULT_INTERVAL_S, DEFAULT_PORT, probe_registry, run_probe, serve_metrics
+from ollama_bench.store import add_store_arguments, open_run
+from ollama_bench.telemetry import add_telemetry_arguments, print_telemetry, start_telemetry
+from ollama_bench.trace import (
+    DEFAULT_MAX_IN_FLIGHT, mix_records, parse_mix, print_replay_results, read_trace, replay_trace,
+)
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description="Ollama Server Load Tester")
     parser.add_argument("-m", "--model", default="qwen3-vl:30b", help="Model name (default: qwen3-vl:30b)")
     parser.add_argument("-u", "--users", type=int, default=10, help="Number of concurrent users (default: 10)")
     parser.add_argument("--url", default="http://localhost:11434/api/generate", help="Ollama API URL")
+    parser.add_argument("--endpoints", nargs="+", metavar="URL",
+                        help="Burst/open: spread requests over several Ollama replicas instead of --url; "
+                             "probe: probe each replica separately")
+    parser.add_argument("--policy", choices=POLICIES, default="round-robin",
+                        help="Endpoint selection with --endpoints (default: %(default)s)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Do not print a line per user (useful for thousands of users)")
+    parser.add_argument("--mode", choices=["burst", "open", "replay", "probe"], default="burst",
+                        help="burst: N users at once (closed-loop); open: issue requests at a target rate; "
+                             "replay: re-issue a recorded --trace; probe: low-rate canary with a Prometheus "
+                             "/metrics endpoint (default: %(default)s)")
+    parser.add_argument("--rate", type=float, default=1.0, help="Open-loop: target requests per second (default: %(default)s)")
+    parser.add_argument("--arrival", choices=["constant", "poisson", "step"], default="poisson",
+                        help="Open-loop: arrival process (default: %(default)s)")
+    parser.add_argument("--duration", type=float, default=60.0, help="Open-loop: seconds to keep issuing requests (default: %(default)s)")
+    parser.add_argument("--step-rate", type=float, default=0.5, help="Step arrival: RPS added every --step-interval (default: %(default)s)")
+    parser.add_argument("--step-interval", type=float, default=30.0, help="Step arrival: seconds per step (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for Poisson arrivals")
+    parser.add_argument("--trace", help="Replay: JSONL trace file (.jsonl or .jsonl.gz), read lazily")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay: timing scale, 2 = twice as fast, 0 = as fast as possible (default: %(default)s)")
+    parser.add_argument("--limit", type=int, default=None, help="Replay/probe: stop after this many requests")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="Replay and open-loop --mix: most requests outstanding at once; later records wait "
+                             "for a free slot (default: %(default)s)")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL_S,
+                        help="Probe: seconds between canary requests (default: %(default)s)")
+    parser.add_argument("--metrics-host", default="0.0.0.0", help="Probe: /metrics bind address (default: %(default)s)")
+    parser.add_argument("--metrics-port", type=int, default=DEFAULT_PORT,
+                        help="Probe: /metrics port (default: %(default)s)")
+    parser.add_argument("--mix", help="Burst/open: weighted model mix instead of --model, "
+                                      "e.g. 'qwen3:30b=60,gemma3:27b=30,qwen3-vl:30b=10+image' (+image sends an image)")
+    dist = parser.add_argument_group("distributed load generation (burst/open modes)")
+    dist.add_argument("--workers", type=int, default=0,
+                      help="Coordinator: split -u / --rate across this many worker processes or hosts")
+    dist.add_argument("--listen", default=f"0.0.0.0:{COORDINATOR_PORT}",
+                      help="Coordinator: address workers connect to (default: %(default)s)")
+    dist.add_argument("--spawn-workers", action="store_true",
+                      help="Coordinator: start the --workers as local processes (single-machine test)")
+    dist.add_argument("--start-delay", type=float, default=START_DELAY_S,
+                      help="Coordinator: seconds between the last worker joining and the synchronized start (default: %(default)s)")
+    dist.add_argument("--worker", metavar="HOST:PORT",
+                      help="Run as a worker for the coordinator at HOST:PORT; the scenario comes from the coordinator")
+    # 0 = otomatis: satu koneksi per user (burst) atau tanpa batas (open-loop)
+    add_pool_arguments(parser, default_size=0)
+    add_telemetry_arguments(parser)
+    add_store_arguments(parser)
     return parser.parse_args()
 
+def run_mix(args):
+    """Workload campuran beberapa model (burst atau open-loop) lewat mesin replay trace."""
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        print(f"[ERROR] --mix: {e}")
+        sys.exit(1)
+    if args.mode == "open":
+        offsets = arrival_schedule(args.arrival, args.rate, args.duration,
+                                   args.step_rate, args.step_interval, args.seed)
+    else:
+        offsets = [0.0] * args.users
+    total = sum(w for _, w, _ in mix)
+    print(f"--- MEMULAI MIXED WORKLOAD: {len(offsets)} REQUEST ---")
+    for model, weight, images in mix:
+        print(f"   {model:<30} {weight / total:>5.0%}{' (+image)' if images else ''}")
+    print("")
+    # Burst: semua user memang harus berjalan bersamaan
+    max_in_flight = args.max_in_flight if args.mode == "open" else len(offsets)
+    raise_fd_limit(min(len(offsets), max_in_flight) + 64)
+    stats, sent, issue_time, conn_stats = asyncio.run(
+        replay_trace(mix_records(mix, offsets, PROMPT, seed=args.seed), args.url, verbose=not args.quiet,
+                     pool_size=args.pool_size, pool_per_host=args.pool_per_host, max_in_flight=max_in_flight)
+    )
+    print_replay_results(stats, sent, issue_time, 1.0, title=f"MIXED WORKLOAD RESULTS ({args.mode.upper()})")
+    print_connection_stats(conn_stats)
+
 def main():
     args = parse_arguments()
+
+    if ollama_client.aiohttp is None:
+        print("[ERROR] Load tester membutuhkan aiohttp. Install dengan: pip install aiohttp")
+        sys.exit(1)
+
+    if args.worker:
+        # Worker: skenario, model dan URL datang dari coordinator
+        try:
+            asyncio.run(run_worker(args.worker, verbose=not args.quiet))
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] Worker: {e}")
+            sys.exit(1)
+        return
     
     print(f"--- KONFIGURASI ---")
-    print(f" Model           : {args.model}")
-    print(f" URL             : {args.url}")
-    print(f" Users           : {args.users}")
+    print(f" Model           : {args.mix or args.model}")
+    if args.endpoints:
+        policy = "" if args.mode == "probe" else f" (policy {args.policy})"
+        print(f" Endpoints       : {', '.join(args.endpoints)}{policy}")
+    else:
+        print(f" URL             : {args.url}")
+    if args.mode == "replay":
+        print(f" Mode            : trace replay ({args.trace}, speed {args.speed}x)")
+        print(f" Model default   : {args.model} (jika record tidak punya 'model')")
+    elif args.mode == "probe":
+        print(f" Mode            : probe (1 request / {args.interval}s, "
+              f"metrics on http://{args.metrics_host}:{args.metrics_port}/metrics)")
+    elif args.workers:
+        print(f" Mode            : distributed {args.mode}, {args.workers} workers (coordinator {args.listen})")
+        if args.mode == "open":
+            print(f" Rate            : {args.rate} req/s total ({args.arrival}, {args.duration}s)")
+        else:
+            print(f" Users           : {args.users} total")
+    elif args.mode == "open":
+        print(f" Mode            : open-loop ({args.arrival}, {args.rate} req/s, {args.duration}s)")
+        if args.arrival == "step":
+            print(f" Step            : +{args.step_rate} req/s setiap {args.step_interval}s")
+    else:
+        print(f" Users           : {args.users}")
     print("-------------------")
+
+    # Sampler jalan di thread terpisah selama seluruh load test (event loop tidak terganggu).
+    # Probe berjalan berhari-hari: sampel telemetry akan menumpuk tanpa batas, jadi tidak dipakai.
+    telemetry = start_telemetry(args, primary_url(args)) if args.mode != "probe" else None
+    try:
+        run(args)
+    finally:
+        if telemetry:
+            telemetry.stop()
+            print_telemetry(telemetry.summary(), "HOST TELEMETRY DURING LOAD TEST")
+
+def primary_url(args):
+    """URL untuk metadata server (/api/version, /api/ps): endpoint pertama jika --endpoints dipakai."""
+    return args.endpoints[0] if args.endpoints else args.url
+
+def target(args):
+    """Satu URL, atau list endpoint untuk load balancing di sisi client."""
+    return args.endpoints if args.endpoints else args.url
+
+def store_results(args, results, scenario, users):
+    """Simpan hasil per-request burst/open-loop ke result store (replay/mix hanya menyimpan histogram)."""
+    run = open_run(args, "server-load-test-ollama", OllamaClient(primary_url(args), timeout=5), args.model)
+    if run:
+        run.write_rows([dict(r, scenario=scenario, users=users) for r in results])
+        print(f" Result store     : run {run.run_id} in {args.store}")
+
+def probe(args):
+    """Canary 24/7: satu request per --interval, hasilnya diekspos di /metrics untuk Prometheus."""
+    registry = probe_registry()
+    try:
+        server = serve_metrics(registry, args.metrics_host, args.metrics_port)
+    except OSError as e:
+        print(f"[ERROR] Cannot listen on {args.metrics_host}:{args.metrics_port}: {e}")
+        sys.exit(1)
+    print(f"--- MEMULAI PROBE: scrape http://{args.metrics_host}:{args.metrics_port}/metrics (Ctrl+C untuk berhenti) ---\n")
+    async def probe_all():
+        # Dengan --endpoints: satu loop probe per endpoint, metrik diberi label endpoint
+        if not args.endpoints:
+            return await run_probe(args.model, args.url, registry, args.interval, args.limit, PROMPT,
+                                   verbose=not args.quiet)
+        sent = await asyncio.gather(*(run_probe(args.model, url, registry, args.interval, args.limit, PROMPT,
+                                                verbose=not args.quiet, endpoint=api_base(url))
+                                      for url in args.endpoints))
+        return sum(sent)
+
+    try:
+        sent = asyncio.run(probe_all())
+        print(f"\n{sent} probe selesai.")
+    except KeyboardInterrupt:
+        print("\nProbe dihentikan.")
+    finally:
+        server.shutdown()
+
+def spawn_workers(args, port):
+    """Jalankan worker sebagai proses lokal script ini (uji coordinator di satu mesin)."""
+    host, _ = parse_address(args.listen)
+    host = "127.0.0.1" if host in ("0.0.0.0", "") else host
+    command = [sys.executable, os.path.abspath(__file__), "--worker", f"{host}:{port}", "-q"]
+    return [subprocess.Popen(command) for _ in range(args.workers)]
+
+def distributed(args):
+    """Coordinator: bagi skenario ke --workers, mulai serentak, gabungkan sampel mentah jadi satu laporan."""
+    if args.mode not in ("burst", "open") or args.mix:
+        print("[ERROR] --workers supports --mode burst and --mode open without --mix")
+        sys.exit(1)
+    spec = {
+        "mode": args.mode, "model": args.model, "url": target(args), "policy": args.policy, "prompt": PROMPT,
+        "users": args.users,
+        "rate": args.rate, "arrival": args.arrival, "duration": args.duration, "step_rate": args.step_rate,
+        "step_interval": args.step_interval, "seed": args.seed,
+        "pool_size": args.pool_size, "pool_per_host": args.pool_per_host,
+    }
+    processes = []
+    on_listening = (lambda port: processes.extend(spawn_workers(args, port))) if args.spawn_workers else None
+    print(f"--- MEMULAI DISTRIBUTED {args.mode.upper()} ---")
+    try:
+        state = asyncio.run(run_coordinator(spec, args.workers, parse_address(args.listen, "0.0.0.0"),
+                                            args.start_delay, on_listening=on_listening, verbose=not args.quiet))
+    except (OSError, TimeoutError) as e:
+        print(f"[ERROR] Coordinator: {e}")
+        sys.exit(1)
+    finally:
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    results = merge_results(state)
+    print_worker_table(state)
+    conns = [w["done"]["conn"] for w in state if w["done"]]
+    wall = max((r['end_time'] for r in results), default=0.0)
+    if args.mode == "open":
+        issue_end = max((w["done"] or {}).get("issue_end", 0.0) for w in state)
+        print_open_loop_results(results, args.model, args.arrival, args.duration, 0.0, issue_end,
+                                merge_in_flight(state))
+        store_results(args, results, f"LOAD_OPEN_{args.arrival.upper()}", None)
+    else:
+        print_results(results, args.model, args.users, batch_from_results(results, 0.0, wall))
+        store_results(args, results, "LOAD_BURST", args.users)
+    if args.endpoints:
+        print_backend_table(results, args.policy, wall)
+    if conns:
+        print_connection_stats(connection_summary(sum(c["requests"] for c in conns),
+                                                  sum(c["new_connections"] for c in conns)))
+
+def run(args):
+    if args.workers:
+        distributed(args)
+        return
+
+    if args.mode == "probe":
+        probe(args)
+        return
+
+    if args.endpoints and (args.mode == "replay" or args.mix):
+        print("[ERROR] --endpoints supports --mode burst, open and probe, without --mix")
+        sys.exit(1)
+
+    if args.max_in_flight < 1:
+        print("[ERROR] --max-in-flight harus >= 1")
+        sys.exit(1)
+
+    if args.mode == "replay":
+        if not args.trace:
+            print("[ERROR] --mode replay membutuhkan --trace FILE")
+            sys.exit(1)
+        print(f"--- MEMULAI TRACE REPLAY ---\n")
+        raise_fd_limit(max(args.pool_size, args.max_in_flight) + 64)
+        stats, sent, issue_time, conn_stats = asyncio.run(
+            replay_trace(read_trace(args.trace, args.model), args.url, speed=args.speed, limit=args.limit,
+                         verbose=not args.quiet, pool_size=args.pool_size, pool_per_host=args.pool_per_host,
+                         max_in_flight=args.max_in_flight)
+        )
+        print_replay_results(stats, sent, issue_time, args.speed)
+        print_connection_stats(conn_stats)
+        return
+
+    if args.mix:
+        run_mix(args)
+        return
+
+    if args.mode == "open":
+        offsets = arrival_schedule(args.arrival, args.rate, args.duration,
+                                   args.step_rate, args.step_interval, args.seed)
+        print(f"--- MEMULAI OPEN-LOOP: {len(offsets)} REQUEST DALAM {args.duration}s ---\n")
+        raise_fd_limit(len(offsets) + 64)
+        results, start, issue_end, samples, conn_stats = asyncio.run(
+            run_open_loop(args.model, target(args), offsets, PROMPT, verbose=not args.quiet,
+                          pool_size=args.pool_size, pool_per_host=args.pool_per_host, policy=args.policy,
+                          seed=args.seed)
+        )
+        print_open_loop_results(results, args.model, args.arrival, args.duration, start, issue_end, samples)
+        if args.endpoints:
+            print_backend_table(results, args.policy, max((r['end_time'] for r in results), default=start) - start,
+                                conn_stats.get("backends"))
+        print_connection_stats(conn_stats)
+        store_results(args, results, f"LOAD_OPEN_{args.arrival.upper()}", None)
+        return
     
     print(f"--- MEMULAI SIMULASI SERANGAN {args.users} USER ---\n")
+
+    # Satu socket per user + cadangan untuk stdio/log
+    raise_fd_limit(args.users + 64)
     
-    results = []
-    
-    # Menggunakan ThreadPool untuk mengirim request bersamaan
+    # Semua user berjalan sebagai coroutine asyncio dalam satu proses (tanpa thread per user)
     print(f"   >>> Submitting {args.users} concurrent requests to server...")
-    with concurrent.futures.ThreadPoolExecutor(max_workers=args.users) as executor:
-        future_to_user = {
-            executor.submit(simulate_user_request, i+1, args.model, args.url): i
-            for i in range(args.users)
-        }
-        
-        for future in concurrent.futures.as_completed(future_to_user):
-            user_id = future_to_user[future]
-            try:
-                data = future.result()
-                results.append(data)
-                status = "SUKSES" if data['success'] else "GAGAL"
-                print(f"   [User {user_id}] Selesai. Status: {status} ({data.get('duration', 0):.2f}s)")
-            except Exception as exc:
-                print(f"   [User {user_id}] Exception: {exc}")
+    results, batch, conn_stats = asyncio.run(
+        run_load_test(args.model, target(args), args.users, PROMPT, verbose=not args.quiet,
+                      pool_size=args.pool_size, pool_per_host=args.pool_per_host, policy=args.policy, seed=args.seed)
+    )
 
-    print_results(results, args.model, args.users)
+    print_results(results, args.model, args.users, batch)
+    if args.endpoints:
+        print_backend_table(results, args.policy, batch.wall_time, conn_stats.get("backends"))
+    print_connection_stats(conn_stats)
+    store_results(args, results, "LOAD_BURST", args.users)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,97 @@
+"""Ground-truth checks for the mock Ollama server.
+
+The mock is what the harness is regression-tested against, so its timings
+must match its knobs: decode speed reported by get_metrics equals the
+configured token rate, TTFT follows the prefill rate, injected failures
+show up as failures, and keep_alive behaves like Ollama's.
+"""
+import time
+
+import pytest
+
+from ollama_bench import (
+    OllamaClient, OllamaError, collect_stream, get_metrics, run_scenario, scenario_status, stream_stats,
+)
+from ollama_bench.mock_server import MockOllama, start_in_thread
+from ollama_bench.residency import load_model, loaded_models
+
+
+@pytest.fixture
+def mock_client():
+    """Factory: mock_client(**knob MockOllama) -> OllamaClient ke mock server baru."""
+    servers = []
+
+    def start(**knobs):
+        knobs.setdefault("load_time", 0.0)
+        server, url = start_in_thread(MockOllama(**knobs))
+        servers.append(server)
+        return OllamaClient(url, timeout=30)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_gen_tps_matches_token_rate(mock_client):
+    client = mock_client(token_rate=200.0)
+    metrics = get_metrics(client.generate({"model": "m1", "prompt": "Hi", "options": {"num_predict": 60}}))
+    assert metrics["tokens_out"] == 60
+    assert metrics["gen_tps"] == pytest.approx(200.0, rel=0.1)
+
+
+@pytest.mark.parametrize("prefill_rate", [20000.0, 5000.0])
+def test_ttft_tracks_prefill_rate(mock_client, prefill_rate):
+    token_rate = 1000.0
+    client = mock_client(prefill_rate=prefill_rate, token_rate=token_rate)
+    # 16000 karakter ~ 4000 token prompt; prefix cache mock masih kosong
+    prompt = "x" * 16000
+    start = time.perf_counter()
+    final, token_times = collect_stream(client.generate_stream(
+        {"model": "m1", "prompt": prompt, "options": {"num_predict": 5}}))
+    ttft = stream_stats(start, token_times)["ttft"]
+    expected = final["prompt_eval_count"] / prefill_rate + 1.0 / token_rate
+    assert final["prompt_eval_count"] == 4000
+    assert ttft == pytest.approx(expected, abs=0.05)
+
+
+def test_fail_rate_one_is_reported_as_failures(mock_client):
+    client = mock_client(fail_rate=1.0)
+
+    def task(user_id):
+        try:
+            return get_metrics(client.generate({"model": "m1", "prompt": "Hi"}))
+        except OllamaError:
+            return None
+
+    stat = run_scenario("FAILING", task, 4)
+    assert stat["successes"] == 0
+    assert stat["failures"] == 4
+    assert scenario_status(stat["failures"], stat["users"]) == "CRITICAL"
+    with pytest.raises(OllamaError, match="HTTP 500"):
+        client.generate({"model": "m1", "prompt": "Hi"})
+
+
+@pytest.mark.parametrize("keep_alive", [-1, "-1", "-1m"])
+def test_negative_keep_alive_keeps_model_loaded(mock_client, keep_alive):
+    client = mock_client(load_time=0.2)
+    assert load_model(client, "m1", keep_alive) == pytest.approx(0.2, abs=0.05)
+    assert "m1" in loaded_models(client)
+    res = client.generate({"model": "m1", "prompt": "Hi", "keep_alive": keep_alive, "options": {"num_predict": 1}})
+    assert get_metrics(res)["load_time"] == 0.0
+    assert "m1" in loaded_models(client)
+
+
+def test_zero_keep_alive_unloads(mock_client):
+    client = mock_client()
+    load_model(client, "m1", "30m")
+    client.generate({"model": "m1", "prompt": "Hi", "keep_alive": 0, "options": {"num_predict": 1}})
+    assert "m1" not in loaded_models(client)
+
+
+def test_keep_alive_durations(mock_client):
+    client = mock_client()
+    load_model(client, "m1", "1h30m")
+    assert "m1" in loaded_models(client)
+    with pytest.raises(OllamaError, match="HTTP 400"):
+        load_model(client, "m1", "bogus")